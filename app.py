@@ -6,12 +6,49 @@ Tema Dark-Fantasy estilo Berserk refinado
 """
 
 import os
-from flask import Flask, render_template_string, request, redirect, url_for, flash, session, jsonify, get_flashed_messages
+from flask import Flask, request, redirect, url_for, flash, session, jsonify, get_flashed_messages, abort, send_from_directory, stream_with_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from markupsafe import escape
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from functools import wraps
+from urllib.parse import quote_plus
+import base64
+import bisect
+import click
+import cProfile
+import gzip
+import hashlib
+import io
+import re
 import secrets
 import json
+import logging
+import mimetypes
+import pstats
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
 
 
 # =============================================
@@ -20,12 +57,93 @@ import json
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(16))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///grimorio_berserk_premium.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///grimorio_berserk_premium.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Heroku e afins entregam postgres://, que o SQLAlchemy 1.4+ não aceita mais. Sem
+# driver explícito, usa o psycopg2 do requirements.txt (o padrão muda entre versões)
+for prefixo in ('postgres://', 'postgresql://'):
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith(prefixo):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql+psycopg2://' + app.config['SQLALCHEMY_DATABASE_URI'][len(prefixo):]
+# Pool de conexões do PostgreSQL. Cada worker do gunicorn tem o seu pool, então o
+# banco precisa aceitar workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) conexões
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Abaixo do idle timeout de proxies/PgBouncer, que derrubam conexões paradas
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+        'connect_args': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            'application_name': os.environ.get('DB_APPLICATION_NAME', 'grimorio'),
+            # Uma consulta travada não segura o worker (nem a conexão) para sempre
+            'options': f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))} "
+                       f"-c idle_in_transaction_session_timeout={int(os.environ.get('DB_IDLE_TRANSACAO_MS', 60000))}",
+        },
+    }
+app.config['PERSONAGENS_POR_PAGINA'] = int(os.environ.get('PERSONAGENS_POR_PAGINA', 24))
+app.config['PERSONAGENS_STREAM_LOTE'] = int(os.environ.get('PERSONAGENS_STREAM_LOTE', 100))
+app.config['BUSCA_RESULTADOS_POR_PAGINA'] = int(os.environ.get('BUSCA_RESULTADOS_POR_PAGINA', 20))
+# Máximo de objetivos criados por requisição em /adicionar_objetivos
+app.config['OBJETIVOS_LOTE_MAX'] = int(os.environ.get('OBJETIVOS_LOTE_MAX', 500))
+app.config['ASSETS_MAX_AGE'] = 365 * 24 * 3600
+# SQLite: WAL e pragmas de desempenho em cada conexão. A fila de escrita (opcional)
+# serializa os commits do processo numa thread e junta os que chegam juntos num só
+app.config['SQLITE_OTIMIZADO'] = os.environ.get('SQLITE_OTIMIZADO', '1').lower() in ('1', 'true', 'sim')
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_MMAP_BYTES'] = int(os.environ.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+app.config['SQLITE_CACHE_KIB'] = int(os.environ.get('SQLITE_CACHE_KIB', 64 * 1024))
+app.config['SQLITE_FILA_ESCRITA'] = os.environ.get('SQLITE_FILA_ESCRITA', '').lower() in ('1', 'true', 'sim')
+app.config['SQLITE_FILA_LOTE'] = int(os.environ.get('SQLITE_FILA_LOTE', 64))
+app.config['SQLITE_FILA_TIMEOUT'] = float(os.environ.get('SQLITE_FILA_TIMEOUT', 10))
+# Usa as cópias locais de Bootstrap/Font Awesome/fontes em static/vendor (flask vendorizar-assets)
+app.config['ASSETS_VENDORIZADOS'] = os.environ.get('ASSETS_VENDORIZADOS', '').lower() in ('1', 'true', 'sim')
+
+# Instrumentação: cabeçalho Server-Timing e uma linha de log JSON por requisição
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '1').lower() in ('1', 'true', 'sim')
+app.config['LOG_DESEMPENHO'] = os.environ.get('LOG_DESEMPENHO', '1').lower() in ('1', 'true', 'sim')
+# Diagnóstico de SQL (desenvolvimento/homologação): consultas lentas e N+1 por endpoint
+app.config['SQL_DIAGNOSTICO'] = os.environ.get('SQL_DIAGNOSTICO', '').lower() in ('1', 'true', 'sim')
+app.config['SQL_LENTO_MS'] = float(os.environ.get('SQL_LENTO_MS', 100))
+app.config['SQL_REPETICOES_LIMITE'] = int(os.environ.get('SQL_REPETICOES_LIMITE', 5))
+# Profiling de uma requisição com ?__profile=1 (cProfile) ou ?__profile=flamegraph,
+# só para os e-mails em PROFILER_ADMINS; relatórios também são salvos em PROFILER_DIR
+app.config['PROFILER_ATIVO'] = os.environ.get('PROFILER_ATIVO', '').lower() in ('1', 'true', 'sim')
+app.config['PROFILER_ADMINS'] = {email.strip() for email in os.environ.get('PROFILER_ADMINS', '').split(',') if email.strip()}
+app.config['PROFILER_DIR'] = os.environ.get('PROFILER_DIR', '')
+app.config['PROFILER_INTERVALO_MS'] = float(os.environ.get('PROFILER_INTERVALO_MS', 1))
+# Se definido, /metrics exige "Authorization: Bearer <token>"
+app.config['METRICAS_TOKEN'] = os.environ.get('METRICAS_TOKEN', '')
+
+# Compressão das respostas dinâmicas (gzip/brotli negociados pelo Accept-Encoding)
+app.config['COMPRESSAO_NIVEL_GZIP'] = int(os.environ.get('COMPRESSAO_NIVEL_GZIP', 6))
+app.config['COMPRESSAO_NIVEL_BROTLI'] = int(os.environ.get('COMPRESSAO_NIVEL_BROTLI', 5))
+app.config['COMPRESSAO_MIN_BYTES'] = int(os.environ.get('COMPRESSAO_MIN_BYTES', 1024))
+
+# Cache do menu lateral (fragmento HTML por usuário)
+app.config['MENU_LATERAL_CACHE_MAX_BYTES'] = int(os.environ.get('MENU_LATERAL_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+app.config['MENU_LATERAL_CACHE_TTL'] = int(os.environ.get('MENU_LATERAL_CACHE_TTL', 60))
+
+# Índice de prefixos do autocompletar (por usuário, em memória)
+app.config['AUTOCOMPLETAR_MAX_USUARIOS'] = int(os.environ.get('AUTOCOMPLETAR_MAX_USUARIOS', 1000))
+app.config['AUTOCOMPLETAR_TTL'] = int(os.environ.get('AUTOCOMPLETAR_TTL', 300))
 
 db = SQLAlchemy(app)
 
 
+def descartar_conexoes_herdadas():
+    # Depois de um fork (gunicorn --preload, multiprocessing) o filho não pode usar
+    # as conexões do pai: o socket seria compartilhado pelos dois processos. O pool
+    # é trocado por um vazio sem fechar as conexões, que continuam sendo do pai.
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=descartar_conexoes_herdadas)
+
+
 # =============================================
 # MODELOS DO BANCO DE DADOS
 # =============================================
@@ -41,6 +159,14 @@ class Usuario(db.Model):
     personagens = db.relationship('Personagem', backref='usuario', lazy=True, cascade='all, delete-orphan')
 
 
+personagem_tag = db.Table(
+    'personagem_tag',
+    db.Column('personagem_id', db.Integer, db.ForeignKey('personagem.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_personagem_tag_tag', 'tag_id', 'personagem_id'),
+)
+
+
 class Personagem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(200), nullable=False)
@@ -54,11 +180,30 @@ class Personagem(db.Model):
     imagem_url = db.Column(db.String(500))
     
     objetivos = db.relationship('Objetivo', backref='personagem', lazy=True, cascade='all, delete-orphan')
+    # Contadores mantidos pelas rotas de objetivos (ajustar_contadores_objetivos), para
+    # os cards não precisarem contar objetivos; flask verificar-contadores os confere
+    total_objetivos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    objetivos_concluidos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
-    tags = db.Column(db.String(300))
+    tags = db.relationship('Tag', secondary=personagem_tag, lazy=True, order_by='Tag.nome')
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_personagem_usuario_atualizacao', 'usuario_id', 'data_atualizacao'),
+        db.Index('ix_personagem_usuario_tipo', 'usuario_id', 'tipo'),
+    )
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'nome', name='uq_tag_usuario_nome'),
+    )
 
 
 class Objetivo(db.Model):
@@ -69,6 +214,35 @@ class Objetivo(db.Model):
     personagem_id = db.Column(db.Integer, db.ForeignKey('personagem.id'), nullable=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     data_conclusao = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_objetivo_personagem_concluido', 'personagem_id', 'concluido'),
+    )
+
+
+class EstatisticasUsuario(db.Model):
+    """
+    Contadores do dashboard por usuário, mantidos pelas rotas de escrita na mesma
+    transação (ajustar_estatisticas); flask reconstruir-estatisticas corrige desvios.
+    Atrasados dependem do relógio: o contador vale para os pendentes criados antes
+    de atrasados_corte, e proximo_atraso diz a partir de quando ele fica velho.
+    versao sobe a cada escrita do usuário: com atrasados_corte, identifica o
+    conteúdo das páginas (ETag e cache do menu lateral) sem contar nada.
+    """
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    total_personagens = db.Column(db.Integer, nullable=False, default=0)
+    soma_prioridade = db.Column(db.Integer, nullable=False, default=0)
+    total_objetivos = db.Column(db.Integer, nullable=False, default=0)
+    objetivos_concluidos = db.Column(db.Integer, nullable=False, default=0)
+    objetivos_atrasados = db.Column(db.Integer, nullable=False, default=0)
+    atrasados_corte = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    proximo_atraso = db.Column(db.DateTime)
+    versao = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def objetivos_ativos(self):
+        return self.total_objetivos - self.objetivos_concluidos
 
 
 class NotaRapida(db.Model):
@@ -79,6 +253,391 @@ class NotaRapida(db.Model):
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_nota_rapida_usuario_atualizacao', 'usuario_id', 'data_atualizacao'),
+    )
+
+
+# =============================================
+# INSTRUMENTAÇÃO (Server-Timing e log por requisição)
+# =============================================
+
+# Uma linha JSON por requisição: {"metodo", "caminho", "status", "total_ms", "sql_consultas", ...}
+log_desempenho = logging.getLogger('grimorio.desempenho')
+if app.config['LOG_DESEMPENHO'] and not log_desempenho.handlers:
+    log_desempenho.addHandler(logging.StreamHandler())
+    log_desempenho.setLevel(logging.INFO)
+    log_desempenho.propagate = False
+
+
+def metricas_requisicao():
+    # Métricas da requisição atual, ou None fora de uma requisição. Ficam no environ,
+    # e não em g, porque stream_with_context cria um g novo enquanto gera o corpo
+    if not has_request_context():
+        return None
+    return request.environ.get('grimorio.desempenho')
+
+
+def cronometrar(etapa):
+    """Soma o tempo gasto na função à etapa correspondente da requisição atual."""
+    def decorador(funcao):
+        @wraps(funcao)
+        def wrapper(*args, **kwargs):
+            metricas = metricas_requisicao()
+            if metricas is None:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                etapas = metricas['etapas']
+                etapas[etapa] = etapas.get(etapa, 0) + (time.perf_counter() - inicio) * 1000
+        return wrapper
+    return decorador
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def iniciar_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_sql', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def finalizar_sql(conn, cursor, statement, parameters, context, executemany):
+    duracao = (time.perf_counter() - conn.info['inicio_sql'].pop()) * 1000
+    metricas = metricas_requisicao()
+    if metricas is not None:
+        metricas['sql_consultas'] += 1
+        metricas['sql_ms'] += duracao
+    observar_sql(duracao)
+    if app.config['SQL_DIAGNOSTICO']:
+        diagnosticar_sql(statement, duracao, metricas)
+
+
+@event.listens_for(Engine, 'handle_error')
+def descartar_sql(contexto):
+    # Comando que falhou não passa por after_cursor_execute
+    if contexto.connection is not None and contexto.connection.info.get('inicio_sql'):
+        contexto.connection.info['inicio_sql'].pop()
+
+
+@app.before_request
+def iniciar_metricas():
+    request.environ['grimorio.desempenho'] = {'inicio': time.perf_counter(), 'sql_consultas': 0, 'sql_ms': 0.0, 'etapas': {}}
+
+
+def server_timing(metricas, total_ms):
+    partes = [
+        f'total;dur={total_ms:.1f}',
+        f'sql;dur={metricas["sql_ms"]:.1f};desc="{metricas["sql_consultas"]} consultas"',
+    ]
+    partes += [f'{etapa};dur={ms:.1f}' for etapa, ms in metricas['etapas'].items()]
+    return ', '.join(partes)
+
+
+@app.after_request
+def registrar_metricas(resposta):
+    # Registrado antes dos outros hooks, roda por último: o total inclui a compressão
+    metricas = metricas_requisicao()
+    if metricas is None:
+        return resposta
+    
+    # Em respostas em stream o cabeçalho sai antes do corpo; o log, no fim, cobre tudo
+    if app.config['SERVER_TIMING']:
+        resposta.headers['Server-Timing'] = server_timing(metricas, (time.perf_counter() - metricas['inicio']) * 1000)
+    
+    registro = {'metodo': request.method, 'caminho': request.path, 'endpoint': request.endpoint}
+    
+    def registrar():
+        registro.update(
+            status=resposta.status_code,
+            total_ms=round((time.perf_counter() - metricas['inicio']) * 1000, 2),
+            sql_consultas=metricas['sql_consultas'],
+            sql_ms=round(metricas['sql_ms'], 2),
+            etapas={etapa: round(ms, 2) for etapa, ms in metricas['etapas'].items()},
+        )
+        log_desempenho.info(json.dumps(registro, ensure_ascii=False))
+        observar_requisicao(registro)
+        if app.config['SQL_DIAGNOSTICO']:
+            fechar_diagnostico_sql(registro, metricas)
+    
+    resposta.call_on_close(registrar)
+    return resposta
+
+
+# =============================================
+# MÉTRICAS PROMETHEUS (/metrics)
+# =============================================
+
+# Com vários workers do gunicorn, PROMETHEUS_MULTIPROC_DIR (definido em gunicorn.conf.py)
+# aponta para o diretório compartilhado onde cada processo grava suas séries
+if prometheus_client is not None:
+    METRICA_LATENCIA = prometheus_client.Histogram(
+        'grimorio_requisicao_duracao_segundos', 'Duração das requisições por endpoint',
+        ['endpoint', 'metodo', 'status']
+    )
+    METRICA_SQL_POR_REQUISICAO = prometheus_client.Histogram(
+        'grimorio_sql_consultas_por_requisicao', 'Comandos SQL executados por requisição',
+        ['endpoint'], buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+    )
+    METRICA_SQL_DURACAO = prometheus_client.Histogram(
+        'grimorio_sql_duracao_segundos', 'Duração de cada comando SQL',
+        ['endpoint'], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+    )
+    METRICA_CACHE = prometheus_client.Counter(
+        'grimorio_cache_consultas', 'Acertos e falhas dos caches em memória',
+        ['cache', 'resultado']
+    )
+    METRICA_POOL = prometheus_client.Gauge(
+        'grimorio_db_pool_conexoes', 'Conexões do pool do banco (abertas / em uso)',
+        ['estado'], multiprocess_mode='livesum'
+    )
+
+
+def endpoint_atual():
+    if not has_request_context():
+        return 'fora_de_requisicao'
+    return request.endpoint or 'nao_encontrado'
+
+
+def contar_cache(cache, resultado):
+    if prometheus_client is not None:
+        METRICA_CACHE.labels(cache, resultado).inc()
+
+
+def observar_sql(duracao_ms):
+    if prometheus_client is not None:
+        METRICA_SQL_DURACAO.labels(endpoint_atual()).observe(duracao_ms / 1000)
+
+
+def observar_requisicao(registro):
+    if prometheus_client is not None:
+        endpoint = registro['endpoint'] or 'nao_encontrado'
+        METRICA_LATENCIA.labels(endpoint, registro['metodo'], registro['status']).observe(registro['total_ms'] / 1000)
+        METRICA_SQL_POR_REQUISICAO.labels(endpoint).observe(registro['sql_consultas'])
+
+
+def contar_conexao(estado, delta):
+    if prometheus_client is not None:
+        METRICA_POOL.labels(estado).inc(delta)
+
+
+@event.listens_for(Pool, 'connect')
+def conexao_aberta(dbapi_connection, connection_record):
+    contar_conexao('abertas', 1)
+
+
+@event.listens_for(Pool, 'close')
+def conexao_fechada(dbapi_connection, connection_record):
+    contar_conexao('abertas', -1)
+
+
+@event.listens_for(Pool, 'checkout')
+def conexao_em_uso(dbapi_connection, connection_record, connection_proxy):
+    contar_conexao('em_uso', 1)
+
+
+@event.listens_for(Pool, 'checkin')
+def conexao_devolvida(dbapi_connection, connection_record):
+    contar_conexao('em_uso', -1)
+
+
+@app.route('/metrics')
+def metricas():
+    if prometheus_client is None:
+        abort(404)
+    
+    token = app.config['METRICAS_TOKEN']
+    if token and not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Soma as séries gravadas por todos os workers, não só as deste processo
+        registro = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = prometheus_client.REGISTRY
+    
+    return app.response_class(prometheus_client.generate_latest(registro),
+                              content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+# =============================================
+# DIAGNÓSTICO DE SQL (consultas lentas e N+1)
+# =============================================
+
+# Modo opcional para desenvolvimento/homologação: registra comandos acima de
+# SQL_LENTO_MS e o mesmo comando parametrizado repetido mais de
+# SQL_REPETICOES_LIMITE vezes numa requisição (N+1), agregando por endpoint
+log_sql = logging.getLogger('grimorio.sql')
+if app.config['SQL_DIAGNOSTICO'] and not log_sql.handlers:
+    log_sql.addHandler(logging.StreamHandler())
+    log_sql.setLevel(logging.INFO)
+    log_sql.propagate = False
+
+relatorio_sql = {}
+relatorio_sql_lock = threading.Lock()
+
+
+def resumir_sql(statement):
+    return ' '.join(statement.split())
+
+
+def relatorio_endpoint(endpoint):
+    # Chamar com relatorio_sql_lock adquirido
+    return relatorio_sql.setdefault(endpoint, {
+        'requisicoes': 0, 'max_consultas': 0, 'lentas': {}, 'repetidas': {}
+    })
+
+
+def diagnosticar_sql(statement, duracao_ms, metricas):
+    if metricas is not None:
+        comandos = metricas.setdefault('comandos', {})
+        comandos[statement] = comandos.get(statement, 0) + 1
+    
+    if duracao_ms < app.config['SQL_LENTO_MS']:
+        return
+    endpoint = endpoint_atual()
+    log_sql.warning(json.dumps({
+        'tipo': 'consulta_lenta', 'endpoint': endpoint,
+        'duracao_ms': round(duracao_ms, 2), 'sql': resumir_sql(statement)
+    }, ensure_ascii=False))
+    with relatorio_sql_lock:
+        lentas = relatorio_endpoint(endpoint)['lentas']
+        lenta = lentas.setdefault(resumir_sql(statement), {'vezes': 0, 'max_ms': 0})
+        lenta['vezes'] += 1
+        lenta['max_ms'] = max(lenta['max_ms'], round(duracao_ms, 2))
+
+
+def fechar_diagnostico_sql(registro, metricas):
+    endpoint = registro['endpoint'] or 'nao_encontrado'
+    repetidas = {
+        resumir_sql(statement): vezes for statement, vezes in metricas.get('comandos', {}).items()
+        if vezes > app.config['SQL_REPETICOES_LIMITE']
+    }
+    for sql, vezes in repetidas.items():
+        log_sql.warning(json.dumps({
+            'tipo': 'n_mais_1', 'endpoint': endpoint, 'caminho': registro['caminho'],
+            'repeticoes': vezes, 'sql': sql
+        }, ensure_ascii=False))
+    
+    with relatorio_sql_lock:
+        relatorio = relatorio_endpoint(endpoint)
+        relatorio['requisicoes'] += 1
+        relatorio['max_consultas'] = max(relatorio['max_consultas'], metricas['sql_consultas'])
+        for sql, vezes in repetidas.items():
+            relatorio['repetidas'][sql] = max(relatorio['repetidas'].get(sql, 0), vezes)
+
+
+@app.route('/diagnostico/sql')
+def diagnostico_sql():
+    # Relatório por endpoint deste processo; só existe com SQL_DIAGNOSTICO ligado
+    if not app.config['SQL_DIAGNOSTICO']:
+        abort(404)
+    with relatorio_sql_lock:
+        return jsonify(relatorio_sql)
+
+
+# =============================================
+# SQLITE (WAL, PRAGMAS E FILA DE ESCRITA)
+# =============================================
+
+@event.listens_for(Pool, 'connect')
+def configurar_sqlite(dbapi_connection, connection_record):
+    # Com WAL, leitores não esperam o escritor (e vice-versa); synchronous=NORMAL só
+    # sincroniza o disco nos checkpoints, o que no WAL continua sem corromper o banco
+    if not app.config['SQLITE_OTIMIZADO'] or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_BYTES']}")
+    cursor.execute(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_KIB']}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+class FilaEscrita:
+    """
+    Executa as escritas do processo numa thread só, juntando num commit as que
+    chegaram enquanto o commit anterior rodava. Cada tarefa é uma função sem
+    argumentos que altera db.session (a da thread escritora) e devolve um valor
+    simples: objetos do ORM ficariam presos à sessão dela.
+    """
+    
+    def __init__(self, lote_max, timeout):
+        self.lote_max = lote_max
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._fila = None
+        self._pid = None
+    
+    def executar(self, tarefa):
+        futuro = Future()
+        self._fila_do_processo().put((tarefa, futuro))
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            # Ainda na fila: cancelada, o escritor a descarta e o erro diz a verdade
+            if futuro.cancel():
+                raise
+            # Já está no lote em gravação: responder erro agora e gravar depois
+            # faria o cliente repetir uma escrita que vai acontecer
+            return futuro.result()
+    
+    def _fila_do_processo(self):
+        # Threads não sobrevivem ao fork: cada worker do gunicorn sobe a sua
+        with self._lock:
+            if self._pid != os.getpid():
+                self._fila = queue.Queue()
+                self._pid = os.getpid()
+                threading.Thread(target=self._escritor, args=(self._fila,), name='fila-escrita', daemon=True).start()
+            return self._fila
+    
+    def _escritor(self, fila):
+        with app.app_context():
+            while True:
+                lote = [fila.get()]
+                while len(lote) < self.lote_max:
+                    try:
+                        lote.append(fila.get_nowait())
+                    except queue.Empty:
+                        break
+                # Tarefas cujo chamador desistiu (timeout) não são gravadas
+                lote = [item for item in lote if item[1].set_running_or_notify_cancel()]
+                if lote:
+                    self._gravar(lote)
+                db.session.remove()
+    
+    def _gravar(self, lote):
+        try:
+            resultados = [tarefa() for tarefa, _ in lote]
+            db.session.commit()
+        except Exception as erro:
+            db.session.rollback()
+            if len(lote) == 1:
+                lote[0][1].set_exception(erro)
+            else:
+                # Uma tarefa com erro não derruba as outras do lote: refaz uma a uma
+                for item in lote:
+                    self._gravar([item])
+            return
+        for (_, futuro), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+
+fila_escrita = FilaEscrita(app.config['SQLITE_FILA_LOTE'], app.config['SQLITE_FILA_TIMEOUT']) \
+    if app.config['SQLITE_FILA_ESCRITA'] else None
+
+
+def gravar(tarefa):
+    """Executa tarefa e faz o commit, pela fila de escrita quando ela está ligada."""
+    if fila_escrita is not None:
+        return fila_escrita.executar(tarefa)
+    resultado = tarefa()
+    db.session.commit()
+    return resultado
 
 
 # =============================================
@@ -89,15 +648,15 @@ def get_flashed_messages_html():
     messages_html = []
     for category, message in get_flashed_messages(with_categories=True):
         icon = {
-            'success': 'check-circle',
-            'error': 'exclamation-circle',
-            'warning': 'exclamation-triangle',
-            'info': 'info-circle'
-        }.get(category, 'info-circle')
+            'success': 'fa-check-circle',
+            'error': 'fa-exclamation-circle',
+            'warning': 'fa-exclamation-triangle',
+            'info': 'fa-info-circle'
+        }.get(category, 'fa-info-circle')
         
         messages_html.append(f'''
             <div class="alert alert-{category}">
-                <i class="fas fa-{icon} me-2"></i>
+                <i class="fas {icon} me-2"></i>
                 {message}
                 <button class="alert-close">
                     <i class="fas fa-times"></i>
@@ -108,60 +667,548 @@ def get_flashed_messages_html():
     return ''.join(messages_html)
 
 
-def calcular_estatisticas(usuario_id):
-    personagens = Personagem.query.filter_by(usuario_id=usuario_id).all()
-    total_personagens = len(personagens)
+def separar_tags(tags):
+    return [tag.strip()[:100] for tag in (tags or '').split(',') if tag.strip()]
+
+
+def definir_tags(personagem, texto):
+    # Reaproveita as tags que o usuário já tem e cria só as novas
+    nomes = list(dict.fromkeys(separar_tags(texto)))
+    existentes = {}
+    if nomes:
+        existentes = {tag.nome: tag for tag in Tag.query.filter(
+            Tag.usuario_id == personagem.usuario_id, Tag.nome.in_(nomes)
+        )}
+    personagem.tags = [existentes.get(nome) or Tag(nome=nome, usuario_id=personagem.usuario_id) for nome in nomes]
+
+
+def tags_dos_personagens(usuario_id):
+    # Pares (personagem_id, nome da tag) de todos os personagens do usuário
+    return db.session.query(personagem_tag.c.personagem_id, Tag.nome)\
+        .join(Tag, Tag.id == personagem_tag.c.tag_id)\
+        .filter(Tag.usuario_id == usuario_id).all()
+
+
+def contagem_tags(usuario_id, limite=30):
+    # Nuvem de tags: uso de cada tag, calculado por GROUP BY sobre a associação
+    return db.session.query(Tag.nome, db.func.count(personagem_tag.c.personagem_id).label('quantidade'))\
+        .join(personagem_tag, personagem_tag.c.tag_id == Tag.id)\
+        .filter(Tag.usuario_id == usuario_id)\
+        .group_by(Tag.id, Tag.nome)\
+        .order_by(db.desc('quantidade'), Tag.nome)\
+        .limit(limite).all()
+
+
+def ajustar_contadores_objetivos(personagem_id, total=0, concluidos=0):
+    # UPDATE personagem SET total_objetivos = total_objetivos + :total ..., na transação
+    # da rota. data_atualizacao é repassada para o onupdate não contar como edição
+    Personagem.query.filter_by(id=personagem_id).update({
+        Personagem.total_objetivos: Personagem.total_objetivos + total,
+        Personagem.objetivos_concluidos: Personagem.objetivos_concluidos + concluidos,
+        Personagem.data_atualizacao: Personagem.data_atualizacao,
+    }, synchronize_session=False)
+
+
+def trocar_prioridade(personagem_id, nova):
+    # Compare-and-set: o UPDATE só vale se a prioridade ainda é a que foi lida, então
+    # o delta das estatísticas é sempre o do valor que esta escrita substituiu.
+    # Uma edição simultânea que ganhou a corrida só faz a leitura ser repetida
+    while True:
+        antiga = db.session.query(Personagem.prioridade).filter_by(id=personagem_id).scalar()
+        trocou = Personagem.query.filter_by(id=personagem_id, prioridade=antiga)\
+            .update({Personagem.prioridade: nova}, synchronize_session=False)
+        if trocou:
+            return nova - (antiga or 0)
+
+
+def alternar_objetivo(objetivo_id):
+    # UPDATE ... SET concluido = NOT concluido RETURNING: duas requisições simultâneas
+    # não leem o mesmo valor antigo, e os deltas dos contadores saem do que foi gravado
+    agora = datetime.utcnow()
+    return db.session.execute(
+        db.update(Objetivo)
+        .where(Objetivo.id == objetivo_id)
+        .values(concluido=db.not_(db.func.coalesce(Objetivo.concluido, False)),
+                data_conclusao=db.case((Objetivo.concluido == True, None), else_=agora))
+        .returning(Objetivo.concluido, Objetivo.data_criacao, Objetivo.personagem_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def apagar_objetivo(objetivo_id):
+    # DELETE ... RETURNING: só quem de fato apagou a linha desconta dos contadores
+    return db.session.execute(
+        db.delete(Objetivo)
+        .where(Objetivo.id == objetivo_id)
+        .returning(Objetivo.concluido, Objetivo.data_criacao, Objetivo.personagem_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def inserir_objetivos(personagem_id, objetivos, data_criacao, retornar_ids=False):
+    # Um INSERT para a lista toda (executemany / VALUES múltiplos), sem criar objetos
+    # do ORM; objetivos é uma lista de (descricao, prioridade). Contadores e
+    # estatísticas ficam com quem chama, que conhece o restante da transação
+    linhas = [{
+        'descricao': descricao,
+        'prioridade': prioridade,
+        'concluido': False,
+        'personagem_id': personagem_id,
+        'data_criacao': data_criacao,
+    } for descricao, prioridade in objetivos]
+    if not linhas:
+        return []
+    if retornar_ids:
+        return db.session.scalars(db.insert(Objetivo).returning(Objetivo.id), linhas).all()
+    db.session.execute(db.insert(Objetivo), linhas)
+    return []
+
+
+def contagens_reais_objetivos():
+    total = db.select(db.func.count(Objetivo.id))\
+        .where(Objetivo.personagem_id == Personagem.id)\
+        .correlate(Personagem).scalar_subquery()
+    concluidos = db.select(db.func.count(Objetivo.id))\
+        .where(Objetivo.personagem_id == Personagem.id, Objetivo.concluido == True)\
+        .correlate(Personagem).scalar_subquery()
+    return total, concluidos
+
+
+def verificar_contadores_objetivos(corrigir=False):
+    """
+    Compara total_objetivos/objetivos_concluidos de cada personagem com a contagem
+    real. Retorna [(id, total, concluidos, total_real, concluidos_real)] dos
+    divergentes; com corrigir=True, regrava esses personagens e faz o commit.
+    """
+    total, concluidos = contagens_reais_objetivos()
+    divergente = db.or_(Personagem.total_objetivos != total, Personagem.objetivos_concluidos != concluidos)
+    divergentes = db.session.query(
+        Personagem.id, Personagem.total_objetivos, Personagem.objetivos_concluidos, total, concluidos
+    ).filter(divergente).order_by(Personagem.id).all()
+    if corrigir and divergentes:
+        donos = db.select(Personagem.usuario_id).where(divergente)
+        EstatisticasUsuario.query.filter(EstatisticasUsuario.usuario_id.in_(donos)).update({
+            EstatisticasUsuario.versao: EstatisticasUsuario.versao + 1,
+            EstatisticasUsuario.atualizado_em: datetime.utcnow(),
+        }, synchronize_session=False)
+        Personagem.query.filter(divergente).update({
+            Personagem.total_objetivos: total,
+            Personagem.objetivos_concluidos: concluidos,
+            Personagem.data_atualizacao: Personagem.data_atualizacao,
+        }, synchronize_session=False)
+        db.session.commit()
+    return divergentes
+
+
+def renderizar_card_personagem(personagem):
+    return f'''
+    <div class="character-card">
+        <div class="character-cover">
+            {'<img src="' + personagem.imagem_url + '">' if personagem.imagem_url else '<i class="fas fa-user-circle"></i>'}
+        </div>
+        <div class="character-body">
+            <div class="character-header">
+                <h3 class="character-name">{personagem.nome}</h3>
+                <div class="dropdown">
+                    <button class="btn btn-icon btn-secondary">
+                        <i class="fas fa-ellipsis-v"></i>
+                    </button>
+                    <div class="dropdown-menu">
+                        <a href="/detalhes_personagem/{personagem.id}" class="dropdown-item">
+                            <i class="fas fa-eye"></i> Ver Detalhes
+                        </a>
+                        <a href="/editar_personagem/{personagem.id}" class="dropdown-item">
+                            <i class="fas fa-edit"></i> Editar
+                        </a>
+                        <a href="/excluir_personagem/{personagem.id}" class="dropdown-item" 
+                           onclick="return confirmDelete('Excluir {personagem.nome}?')">
+                            <i class="fas fa-trash"></i> Excluir
+                        </a>
+                    </div>
+                </div>
+            </div>
+            
+            <div class="character-meta">
+                <span class="character-type">{personagem.tipo}</span>
+                <span class="character-priority">
+                    <i class="fas fa-bolt"></i>
+                    Prioridade {personagem.prioridade}/10
+                </span>
+            </div>
+            
+            <p class="character-description">
+                {personagem.descricao[:150] if personagem.descricao else 'Sem descrição...'}
+            </p>
+            
+            <div class="priority-bar">
+                <div class="priority-fill" style="width: {personagem.prioridade * 10}%"></div>
+            </div>
+            
+            <div class="character-footer">
+                <div class="character-stats">
+                    <div class="character-stat">
+                        <span class="stat-number">{personagem.total_objetivos}</span>
+                        <span class="stat-label">Objetivos</span>
+                    </div>
+                    <div class="character-stat">
+                        <span class="stat-number">{personagem.objetivos_concluidos}</span>
+                        <span class="stat-label">Concluídos</span>
+                    </div>
+                </div>
+                <a href="/detalhes_personagem/{personagem.id}" class="btn btn-sm btn-primary">
+                    Ver Detalhes
+                </a>
+            </div>
+        </div>
+    </div>
+    '''
+
+
+def codificar_cursor(personagem):
+    valor = f"{personagem.data_atualizacao.isoformat()}|{personagem.id}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        data, personagem_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(data), int(personagem_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def consulta_personagens(usuario_id, tipo_filter='todos', tag=None):
+    query = Personagem.query.filter_by(usuario_id=usuario_id)
     
-    total_objetivos = 0
-    objetivos_ativos = 0
-    total_prioridade = 0
-    objetivos_concluidos = 0
+    if tipo_filter != 'todos':
+        query = query.filter_by(tipo=tipo_filter)
     
-    for personagem in personagens:
-        total_objetivos += len(personagem.objetivos)
-        total_prioridade += personagem.prioridade
-        
-        for objetivo in personagem.objetivos:
-            if objetivo.concluido:
-                objetivos_concluidos += 1
-            else:
-                objetivos_ativos += 1
+    if tag:
+        # Usa uq_tag_usuario_nome e ix_personagem_tag_tag em vez de varrer os personagens
+        query = query.join(personagem_tag, personagem_tag.c.personagem_id == Personagem.id)\
+            .join(Tag, Tag.id == personagem_tag.c.tag_id)\
+            .filter(Tag.usuario_id == usuario_id, Tag.nome == tag)
+    
+    return query
+
+
+def pagina_personagens(usuario_id, tipo_filter='todos', cursor=None, limite=None, tag=None):
+    # Paginação por cursor (keyset) em (data_atualizacao, id): o custo de cada
+    # página não depende de quantos personagens vieram antes dela
+    limite = limite or app.config['PERSONAGENS_POR_PAGINA']
+    query = consulta_personagens(usuario_id, tipo_filter, tag)
     
-    prioridade_media = total_prioridade / total_personagens if total_personagens > 0 else 0
+    posicao = decodificar_cursor(cursor) if cursor else None
+    if posicao:
+        data, personagem_id = posicao
+        query = query.filter(db.or_(
+            Personagem.data_atualizacao < data,
+            db.and_(Personagem.data_atualizacao == data, Personagem.id < personagem_id)
+        ))
     
-    objetivos_atrasados = 0
-    data_limite = datetime.utcnow() - timedelta(days=7)
+    personagens = query.order_by(Personagem.data_atualizacao.desc(), Personagem.id.desc())\
+        .limit(limite + 1).all()
+    
+    proximo_cursor = None
+    if len(personagens) > limite:
+        personagens = personagens[:limite]
+        proximo_cursor = codificar_cursor(personagens[-1])
+    
+    return personagens, proximo_cursor
+
+
+def cards_personagens_em_lotes(usuario_id, tipo_filter='todos', tag=None):
+    # Lê a biblioteca inteira em lotes (yield_per) e devolve o HTML de cada lote,
+    # sem nunca manter todos os personagens ou todo o HTML na memória
+    lote = app.config['PERSONAGENS_STREAM_LOTE']
+    personagens = consulta_personagens(usuario_id, tipo_filter, tag)\
+        .order_by(Personagem.data_atualizacao.desc(), Personagem.id.desc())\
+        .yield_per(lote)
     
+    cards = []
     for personagem in personagens:
-        for objetivo in personagem.objetivos:
-            if not objetivo.concluido and objetivo.data_criacao < data_limite:
-                objetivos_atrasados += 1
+        cards.append(renderizar_card_personagem(personagem))
+        if len(cards) == lote:
+            yield ''.join(cards)
+            cards = []
+    if cards:
+        yield ''.join(cards)
+
+
+def estatisticas_atuais(usuario_id):
+    # Uma leitura pela chave primária; os atrasados só são recontados quando
+    # algum objetivo pendente completou 7 dias desde a última contagem
+    estatisticas = EstatisticasUsuario.query.get(usuario_id)
+    if estatisticas is None:
+        # Usuário anterior à tabela ou inserido direto no banco
+        reconstruir_estatisticas([usuario_id])
+        estatisticas = EstatisticasUsuario.query.get(usuario_id)
+    
+    data_limite = datetime.utcnow() - timedelta(days=7)
+    if estatisticas.proximo_atraso is not None and estatisticas.proximo_atraso < data_limite:
+        gravar(lambda: recontar_atrasados(usuario_id, data_limite))
+        db.session.refresh(estatisticas)
+    # O identity map só guarda referências fracas; a sessão (uma por requisição)
+    # segura a linha para as leituras seguintes (ETag, menu, dashboard) não irem ao banco
+    db.session.info.setdefault('estatisticas', {})[usuario_id] = estatisticas
+    return estatisticas
+
+
+def chave_conteudo(estatisticas):
+    # Muda a cada escrita do usuário (versao) e quando os atrasados são recontados
+    return estatisticas.versao, estatisticas.atrasados_corte
+
+
+@cronometrar('estatisticas')
+def calcular_estatisticas(usuario_id):
+    estatisticas = estatisticas_atuais(usuario_id)
+    
+    total_personagens = estatisticas.total_personagens
+    prioridade_media = estatisticas.soma_prioridade / total_personagens if total_personagens > 0 else 0
     
     return {
         'total_personagens': total_personagens,
-        'total_objetivos': total_objetivos,
-        'objetivos_ativos': objetivos_ativos,
-        'objetivos_concluidos': objetivos_concluidos,
-        'objetivos_atrasados': objetivos_atrasados,
+        'total_objetivos': estatisticas.total_objetivos,
+        'objetivos_ativos': estatisticas.objetivos_ativos,
+        'objetivos_concluidos': estatisticas.objetivos_concluidos,
+        'objetivos_atrasados': estatisticas.objetivos_atrasados,
         'prioridade_media': round(prioridade_media, 1)
     }
 
 
+def ajustar_estatisticas(usuario_id, personagens=0, prioridade=0, objetivos=(), objetivos_do_personagem=None):
+    """
+    Soma a variação de uma escrita à linha de EstatisticasUsuario, na transação
+    da rota. objetivos é uma lista de (data_criacao, concluido, sinal), com sinal 1
+    para o objetivo que passa a contar e -1 para o que deixa de contar;
+    objetivos_do_personagem desconta todos os objetivos de um personagem que vai
+    ser excluído (chamar antes do delete). Um único UPDATE relativo, então
+    escritas simultâneas de outros workers não se sobrescrevem. Sempre sobe a
+    versao; escritas que não mexem nos contadores (notas) chamam sem variações.
+    """
+    e = EstatisticasUsuario
+    total = sum(sinal for _, _, sinal in objetivos)
+    concluidos = sum(sinal for _, concluido, sinal in objetivos if concluido)
+    # Um pendente conta como atrasado se foi criado antes do corte da linha
+    pendentes = {}
+    for data_criacao, concluido, sinal in objetivos:
+        if not concluido:
+            pendentes[data_criacao] = pendentes.get(data_criacao, 0) + sinal
+    atrasados = [db.case((e.atrasados_corte > data, sinal), else_=0) for data, sinal in pendentes.items() if sinal]
+    
+    if objetivos_do_personagem is not None:
+        def contar(*filtros):
+            return db.select(db.func.count(Objetivo.id))\
+                .where(Objetivo.personagem_id == objetivos_do_personagem, *filtros).scalar_subquery()
+        total = total - contar()
+        concluidos = concluidos - contar(Objetivo.concluido == True)
+        atrasados.append(-contar(Objetivo.concluido.is_not(True), Objetivo.data_criacao < e.atrasados_corte))
+    
+    valores = {e.versao: e.versao + 1, e.atualizado_em: datetime.utcnow()}
+    for coluna, delta in ((e.total_personagens, personagens), (e.soma_prioridade, prioridade),
+                          (e.total_objetivos, total), (e.objetivos_concluidos, concluidos)):
+        if isinstance(delta, int) and delta == 0:
+            continue
+        valores[coluna] = coluna + delta
+    if atrasados:
+        valores[e.objetivos_atrasados] = e.objetivos_atrasados + sum(atrasados[1:], atrasados[0])
+    
+    novos = [data for data, sinal in pendentes.items() if sinal > 0]
+    if novos:
+        # proximo_atraso só anda para trás aqui; adiantado, no máximo recontamos antes da hora
+        data = min(novos)
+        valores[e.proximo_atraso] = db.case(
+            (e.atrasados_corte > data, e.proximo_atraso),
+            (db.or_(e.proximo_atraso.is_(None), e.proximo_atraso > data), data),
+            else_=e.proximo_atraso
+        )
+    
+    e.query.filter_by(usuario_id=usuario_id).update(valores, synchronize_session=False)
+
+
+def recontar_atrasados(usuario_id, data_limite):
+    # Um UPDATE com subconsultas: não perde ajustes feitos entre a contagem e a gravação
+    pendentes = db.and_(
+        Objetivo.personagem_id.in_(db.select(Personagem.id).where(Personagem.usuario_id == usuario_id)),
+        Objetivo.concluido.is_not(True)
+    )
+    EstatisticasUsuario.query.filter_by(usuario_id=usuario_id).update({
+        EstatisticasUsuario.objetivos_atrasados: db.select(db.func.count(Objetivo.id))
+            .where(pendentes, Objetivo.data_criacao < data_limite).scalar_subquery(),
+        EstatisticasUsuario.proximo_atraso: db.select(db.func.min(Objetivo.data_criacao))
+            .where(pendentes, Objetivo.data_criacao >= data_limite).scalar_subquery(),
+        EstatisticasUsuario.atrasados_corte: data_limite,
+        EstatisticasUsuario.atualizado_em: datetime.utcnow(),
+    }, synchronize_session=False)
+
+
+def reconstruir_estatisticas(usuario_ids=None):
+    """
+    Recalcula EstatisticasUsuario a partir das tabelas, para todos os usuários ou
+    só para usuario_ids, e faz o commit. Retorna os ids cujas linhas faltavam ou
+    tinham algum contador divergente (atrasados são sempre recontados).
+    """
+    data_limite = datetime.utcnow() - timedelta(days=7)
+    
+    def do_usuario(consulta, coluna):
+        return consulta if usuario_ids is None else consulta.filter(coluna.in_(usuario_ids))
+    
+    personagens = {
+        usuario_id: (total, soma) for usuario_id, total, soma in do_usuario(db.session.query(
+            Personagem.usuario_id,
+            db.func.count(Personagem.id),
+            db.func.coalesce(db.func.sum(Personagem.prioridade), 0)
+        ), Personagem.usuario_id).group_by(Personagem.usuario_id)
+    }
+    pendente = Objetivo.concluido.is_not(True)
+    objetivos = {
+        linha[0]: linha[1:] for linha in do_usuario(db.session.query(
+            Personagem.usuario_id,
+            db.func.count(Objetivo.id),
+            db.func.coalesce(db.func.sum(db.case((Objetivo.concluido == True, 1), else_=0)), 0),
+            db.func.coalesce(db.func.sum(db.case((db.and_(pendente, Objetivo.data_criacao < data_limite), 1), else_=0)), 0),
+            db.func.min(db.case((db.and_(pendente, Objetivo.data_criacao >= data_limite), Objetivo.data_criacao)))
+        ).join(Personagem, Objetivo.personagem_id == Personagem.id), Personagem.usuario_id)
+        .group_by(Personagem.usuario_id)
+    }
+    existentes = {
+        linha.usuario_id: linha
+        for linha in do_usuario(EstatisticasUsuario.query, EstatisticasUsuario.usuario_id)
+    }
+    
+    corrigidos = []
+    for (usuario_id,) in do_usuario(db.session.query(Usuario.id), Usuario.id):
+        total_personagens, soma_prioridade = personagens.get(usuario_id, (0, 0))
+        total_objetivos, concluidos, atrasados, proximo = objetivos.get(usuario_id, (0, 0, 0, None))
+        contadores = {
+            'total_personagens': total_personagens,
+            'soma_prioridade': soma_prioridade,
+            'total_objetivos': total_objetivos,
+            'objetivos_concluidos': concluidos,
+        }
+        linha = existentes.get(usuario_id)
+        if linha is None:
+            linha = EstatisticasUsuario(usuario_id=usuario_id)
+            db.session.add(linha)
+            corrigidos.append(usuario_id)
+        elif any(getattr(linha, coluna) != valor for coluna, valor in contadores.items()):
+            linha.versao = (linha.versao or 0) + 1
+            corrigidos.append(usuario_id)
+        for coluna, valor in contadores.items():
+            setattr(linha, coluna, valor)
+        linha.objetivos_atrasados = atrasados
+        linha.atrasados_corte = data_limite
+        linha.proximo_atraso = proximo
+        linha.atualizado_em = datetime.utcnow()
+    
+    db.session.commit()
+    return corrigidos
+
+
+class CacheMenuLateral:
+    """
+    Cache LRU do menu lateral renderizado, por usuário.
+    Cada entrada guarda a chave_conteudo() do banco com que foi renderizada e só
+    é reaproveitada enquanto ela for a mesma, o que cobre as escritas feitas por
+    outros workers. O contador de versão local, incrementado pelas rotas de
+    escrita deste processo, descarta a entrada na hora e evita guardar um html
+    renderizado antes de uma escrita; o TTL só limita quanto tempo ela fica.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.tamanho_bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._entradas = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def obter(self, usuario_id, chave):
+        """
+        Retorna (html, versao): html é None numa falha, e versao é a do momento
+        da leitura, a ser passada para guardar() depois de renderizar.
+        """
+        with self._lock:
+            versao_atual = self._versoes.get(usuario_id, 0)
+            entrada = self._entradas.get(usuario_id)
+            if entrada is not None:
+                versao, chave_entrada, criado_em, html, _ = entrada
+                if versao == versao_atual and chave_entrada == chave and time.monotonic() - criado_em < self.ttl:
+                    self._entradas.move_to_end(usuario_id)
+                    self.acertos += 1
+                    contar_cache('menu_lateral', 'acerto')
+                    return html, versao_atual
+                self._remover(usuario_id)
+            self.falhas += 1
+            contar_cache('menu_lateral', 'falha')
+            return None, versao_atual
+
+    def guardar(self, usuario_id, html, versao, chave):
+        tamanho = sys.getsizeof(html)
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            # Uma escrita invalidou durante a renderização: o html já nasceu velho
+            if versao != self._versoes.get(usuario_id, 0):
+                return
+            self._remover(usuario_id)
+            self._entradas[usuario_id] = (versao, chave, time.monotonic(), html, tamanho)
+            self.tamanho_bytes += tamanho
+            while self.tamanho_bytes > self.max_bytes:
+                antigo = next(iter(self._entradas))
+                self._remover(antigo)
+
+    def invalidar(self, usuario_id):
+        with self._lock:
+            self._versoes[usuario_id] = self._versoes.get(usuario_id, 0) + 1
+            self._remover(usuario_id)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.tamanho_bytes = 0
+
+    def _remover(self, usuario_id):
+        entrada = self._entradas.pop(usuario_id, None)
+        if entrada is not None:
+            self.tamanho_bytes -= entrada[4]
+
+
+cache_menu_lateral = CacheMenuLateral(
+    app.config['MENU_LATERAL_CACHE_MAX_BYTES'],
+    app.config['MENU_LATERAL_CACHE_TTL']
+)
+
+
+def invalidar_menu_lateral(usuario_id):
+    cache_menu_lateral.invalidar(usuario_id)
+
+
+@cronometrar('menu_lateral')
 def criar_menu_lateral(usuario_id, active_page='dashboard'):
+    # O fragmento não depende de active_page, então a entrada é só do usuário.
+    # A chave vem da mesma linha que o ETag das páginas (lida uma vez por requisição)
+    chave = chave_conteudo(estatisticas_atuais(usuario_id))
+    menu_html, versao = cache_menu_lateral.obter(usuario_id, chave)
+    if menu_html is None:
+        menu_html = renderizar_menu_lateral(usuario_id)
+        cache_menu_lateral.guardar(usuario_id, menu_html, versao, chave)
+    return menu_html
+
+
+def renderizar_menu_lateral(usuario_id):
     estatisticas = calcular_estatisticas(usuario_id)
     
     personagens_recentes = Personagem.query.filter_by(usuario_id=usuario_id)\
         .order_by(Personagem.data_atualizacao.desc()).limit(5).all()
     
-    objetivos_pendentes = []
-    for personagem in Personagem.query.filter_by(usuario_id=usuario_id).all():
-        for objetivo in personagem.objetivos:
-            if not objetivo.concluido:
-                objetivos_pendentes.append((objetivo, personagem))
-                if len(objetivos_pendentes) >= 5:
-                    break
-        if len(objetivos_pendentes) >= 5:
-            break
+    # Uma consulta com LIMIT em vez de carregar personagem.objetivos de cada personagem
+    objetivos_pendentes = db.session.query(Objetivo, Personagem)\
+        .join(Personagem, Objetivo.personagem_id == Personagem.id)\
+        .filter(Personagem.usuario_id == usuario_id, Objetivo.concluido == False)\
+        .order_by(Personagem.id, Objetivo.id).limit(5).all()
     
     notas_rapidas = NotaRapida.query.filter_by(usuario_id=usuario_id)\
         .order_by(NotaRapida.data_atualizacao.desc()).limit(3).all()
@@ -343,6 +1390,7 @@ def criar_menu_lateral(usuario_id, active_page='dashboard'):
     return menu_html
 
 
+@cronometrar('navbar')
 def create_navbar(active_page='dashboard'):
     usuario_nome = session.get('usuario_nome', 'Criador')
     
@@ -433,1658 +1481,930 @@ def create_navbar(active_page='dashboard'):
 
 
 # =============================================
-# TEMPLATES HTML - DESIGN MODERNO
+# BUSCA TEXTUAL (SQLite FTS5 / PostgreSQL tsvector)
 # =============================================
 
-BASE_TEMPLATE = '''<!DOCTYPE html>
-<html lang="pt-br">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Grimório Berserk - Sistema de Personagens</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
-    <link href="https://fonts.googleapis.com/css2?family=Cinzel:wght@400;600;700&family=Inter:wght@300;400;500;600&display=swap" rel="stylesheet">
-    <style>
-        :root {
-            /* Cores principais */
-            --primary-dark: #0a0a0a;
-            --primary-darker: #050505;
-            --secondary-dark: #141414;
-            --tertiary-dark: #1a1a1a;
-            
-            /* Cores de destaque */
-            --blood-red: #8B0000;
-            --blood-dark: #5A0000;
-            --blood-light: #B22222;
-            --blood-glow: rgba(139, 0, 0, 0.3);
-            
-            /* Cores de texto */
-            --text-primary: #f5f1e8;
-            --text-secondary: #b8b5a8;
-            --text-muted: #8a877c;
-            
-            /* Cores de elementos UI */
-            --border-color: #2a2a2a;
-            --border-light: #3a3a3a;
-            --shadow-color: rgba(0, 0, 0, 0.5);
-            --overlay: rgba(0, 0, 0, 0.8);
-            
-            /* Gradientes */
-            --gradient-dark: linear-gradient(135deg, var(--primary-dark) 0%, var(--secondary-dark) 100%);
-            --gradient-blood: linear-gradient(135deg, var(--blood-red) 0%, var(--blood-dark) 100%);
-            
-            /* Espaçamentos */
-            --spacing-xs: 8px;
-            --spacing-sm: 12px;
-            --spacing-md: 16px;
-            --spacing-lg: 24px;
-            --spacing-xl: 32px;
-            --spacing-xxl: 48px;
-            
-            /* Bordas */
-            --radius-sm: 4px;
-            --radius-md: 8px;
-            --radius-lg: 12px;
-            --radius-xl: 16px;
-            --radius-full: 9999px;
-            
-            /* Transições */
-            --transition-fast: 0.15s ease;
-            --transition-normal: 0.3s ease;
-            --transition-slow: 0.5s ease;
-            
-            /* Sombras */
-            --shadow-sm: 0 2px 8px var(--shadow-color);
-            --shadow-md: 0 4px 16px var(--shadow-color);
-            --shadow-lg: 0 8px 32px var(--shadow-color);
-            --shadow-inner: inset 0 2px 4px rgba(0, 0, 0, 0.5);
-            --shadow-glow: 0 0 20px var(--blood-glow);
-        }
-        
-        /* Reset e estilos base */
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Inter', sans-serif;
-            background: var(--primary-dark);
-            color: var(--text-primary);
-            min-height: 100vh;
-            overflow-x: hidden;
-            line-height: 1.6;
-        }
-        
-        .berserk-font {
-            font-family: 'Cinzel', serif;
-        }
-        
-        .container-main {
-            padding: var(--spacing-md);
-            max-width: 1400px;
-            margin: 0 auto;
-            position: relative;
-        }
-        
-        /* ========== TYPOGRAPHY ========== */
-        h1, h2, h3, h4, h5, h6 {
-            font-family: 'Cinzel', serif;
-            font-weight: 700;
-            color: var(--text-primary);
-            margin-bottom: var(--spacing-md);
-        }
-        
-        h1 { font-size: 2.5rem; }
-        h2 { font-size: 2rem; }
-        h3 { font-size: 1.5rem; }
-        h4 { font-size: 1.25rem; }
-        h5 { font-size: 1.125rem; }
-        h6 { font-size: 1rem; }
-        
-        .text-blood { color: var(--blood-red) !important; }
-        .text-muted { color: var(--text-muted) !important; }
-        .text-gradient {
-            background: var(--gradient-blood);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-        }
-        
-        /* ========== NAVBAR ========== */
-        .navbar {
-            background: var(--secondary-dark);
-            border-bottom: 1px solid var(--border-color);
-            padding: 0 var(--spacing-lg);
-            position: sticky;
-            top: 0;
-            z-index: 1000;
-            backdrop-filter: blur(10px);
-        }
-        
-        .navbar-container {
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            height: 70px;
-        }
-        
-        .navbar-brand {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-md);
-        }
-        
-        .brand-logo {
-            width: 40px;
-            height: 40px;
-            background: var(--gradient-blood);
-            border-radius: var(--radius-md);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: white;
-            font-size: 1.5rem;
-        }
-        
-        .brand-text h1 {
-            font-size: 1.5rem;
-            margin: 0;
-            line-height: 1;
-            color: var(--blood-red);
-        }
-        
-        .brand-subtitle {
-            font-size: 0.75rem;
-            color: var(--text-muted);
-            margin: 0;
-        }
-        
-        .navbar-toggler {
-            display: none;
-            background: none;
-            border: none;
-            color: var(--text-primary);
-            font-size: 1.25rem;
-            cursor: pointer;
-            padding: var(--spacing-sm);
-        }
-        
-        .navbar-menu {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-lg);
-        }
-        
-        .nav-items {
-            display: flex;
-            gap: var(--spacing-sm);
-        }
-        
-        .nav-item {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            padding: var(--spacing-sm) var(--spacing-md);
-            color: var(--text-secondary);
-            text-decoration: none;
-            border-radius: var(--radius-md);
-            transition: all var(--transition-fast);
-            position: relative;
-        }
-        
-        .nav-item:hover {
-            background: var(--tertiary-dark);
-            color: var(--text-primary);
-        }
-        
-        .nav-item.active {
-            background: var(--gradient-blood);
-            color: white;
-            box-shadow: var(--shadow-glow);
-        }
-        
-        .nav-item i {
-            font-size: 1.1rem;
-        }
-        
-        .dropdown {
-            position: relative;
-        }
-        
-        .dropdown-menu {
-            position: absolute;
-            top: 100%;
-            left: 0;
-            background: var(--secondary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-md);
-            padding: var(--spacing-sm);
-            min-width: 200px;
-            display: none;
-            box-shadow: var(--shadow-lg);
-            z-index: 1001;
-        }
-        
-        .dropdown:hover .dropdown-menu {
-            display: block;
-        }
-        
-        .dropdown-item {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            padding: var(--spacing-sm) var(--spacing-md);
-            color: var(--text-secondary);
-            text-decoration: none;
-            border-radius: var(--radius-sm);
-            transition: all var(--transition-fast);
-        }
-        
-        .dropdown-item:hover {
-            background: var(--tertiary-dark);
-            color: var(--text-primary);
-        }
-        
-        .navbar-user {
-            position: relative;
-        }
-        
-        .user-profile {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            background: none;
-            border: none;
-            color: var(--text-primary);
-            padding: var(--spacing-sm);
-            border-radius: var(--radius-md);
-            cursor: pointer;
-            transition: all var(--transition-fast);
-        }
-        
-        .user-profile:hover {
-            background: var(--tertiary-dark);
-        }
-        
-        .user-avatar {
-            width: 36px;
-            height: 36px;
-            background: var(--tertiary-dark);
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        
-        .user-menu {
-            position: absolute;
-            top: 100%;
-            right: 0;
-            background: var(--secondary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-md);
-            padding: var(--spacing-sm);
-            min-width: 200px;
-            display: none;
-            box-shadow: var(--shadow-lg);
-        }
-        
-        .user-dropdown:hover .user-menu {
-            display: block;
-        }
-        
-        .user-menu-item {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            padding: var(--spacing-sm) var(--spacing-md);
-            color: var(--text-secondary);
-            text-decoration: none;
-            border-radius: var(--radius-sm);
-            transition: all var(--transition-fast);
-        }
-        
-        .user-menu-item:hover {
-            background: var(--tertiary-dark);
-            color: var(--text-primary);
-        }
-        
-        /* ========== SIDEBAR ========== */
-        .sidebar {
-            position: fixed;
-            top: 70px;
-            right: 0;
-            width: 320px;
-            height: calc(100vh - 70px);
-            background: var(--secondary-dark);
-            border-left: 1px solid var(--border-color);
-            padding: var(--spacing-lg);
-            overflow-y: auto;
-            transform: translateX(100%);
-            transition: transform var(--transition-normal);
-            z-index: 999;
-        }
-        
-        .sidebar.active {
-            transform: translateX(0);
-        }
-        
-        .sidebar-header {
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            margin-bottom: var(--spacing-lg);
-            padding-bottom: var(--spacing-md);
-            border-bottom: 1px solid var(--border-color);
-        }
-        
-        .sidebar-logo {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            color: var(--blood-red);
-            font-weight: 600;
-        }
-        
-        .sidebar-close {
-            background: none;
-            border: none;
-            color: var(--text-muted);
-            cursor: pointer;
-            padding: var(--spacing-sm);
-        }
-        
-        .sidebar-close:hover {
-            color: var(--text-primary);
-        }
-        
-        .sidebar-toggle {
-            position: fixed;
-            bottom: var(--spacing-lg);
-            right: var(--spacing-lg);
-            width: 56px;
-            height: 56px;
-            background: var(--gradient-blood);
-            border: none;
-            border-radius: 50%;
-            color: white;
-            font-size: 1.5rem;
-            cursor: pointer;
-            display: none;
-            align-items: center;
-            justify-content: center;
-            box-shadow: var(--shadow-lg);
-            z-index: 998;
-            transition: all var(--transition-normal);
-        }
-        
-        .sidebar-toggle:hover {
-            transform: scale(1.1);
-        }
-        
-        .sidebar-section {
-            margin-bottom: var(--spacing-xl);
-        }
-        
-        .section-title {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            color: var(--text-primary);
-            font-size: 0.875rem;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-            margin-bottom: var(--spacing-md);
-        }
-        
-        .section-title i {
-            color: var(--blood-red);
-        }
-        
-        .stats-grid {
-            display: grid;
-            grid-template-columns: repeat(2, 1fr);
-            gap: var(--spacing-sm);
-        }
-        
-        .stat-card.mini {
-            background: var(--tertiary-dark);
-            padding: var(--spacing-md);
-            border-radius: var(--radius-md);
-            text-align: center;
-            border: 1px solid var(--border-color);
-            transition: all var(--transition-fast);
-        }
-        
-        .stat-card.mini:hover {
-            border-color: var(--blood-red);
-            transform: translateY(-2px);
-        }
-        
-        .stat-card.mini .stat-value {
-            font-size: 1.5rem;
-            font-weight: bold;
-            color: var(--blood-red);
-            line-height: 1;
-        }
-        
-        .stat-card.mini .stat-label {
-            font-size: 0.75rem;
-            color: var(--text-muted);
-            margin-top: var(--spacing-xs);
-        }
-        
-        .quick-actions {
-            display: flex;
-            flex-direction: column;
-            gap: var(--spacing-sm);
-        }
-        
-        .quick-action {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            padding: var(--spacing-sm);
-            background: var(--tertiary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-md);
-            color: var(--text-secondary);
-            text-decoration: none;
-            transition: all var(--transition-fast);
-        }
-        
-        .quick-action:hover {
-            background: var(--gradient-blood);
-            color: white;
-            border-color: var(--blood-red);
-            transform: translateX(4px);
-        }
-        
-        .action-icon {
-            width: 36px;
-            height: 36px;
-            background: var(--secondary-dark);
-            border-radius: var(--radius-sm);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        
-        .recent-list, .objectives-list, .notes-list {
-            display: flex;
-            flex-direction: column;
-            gap: var(--spacing-sm);
-        }
-        
-        .recent-item, .objective-item, .note-item {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            padding: var(--spacing-sm);
-            background: var(--tertiary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-md);
-            transition: all var(--transition-fast);
-        }
-        
-        .recent-item {
-            text-decoration: none;
-            color: var(--text-secondary);
-        }
-        
-        .recent-item:hover {
-            background: var(--secondary-dark);
-            border-color: var(--blood-red);
-        }
-        
-        .recent-avatar {
-            width: 40px;
-            height: 40px;
-            background: var(--secondary-dark);
-            border-radius: var(--radius-md);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: var(--blood-red);
-            font-size: 1.25rem;
-        }
-        
-        .recent-info {
-            flex: 1;
-        }
-        
-        .recent-title {
-            display: block;
-            font-weight: 500;
-            color: var(--text-primary);
-        }
-        
-        .recent-subtitle {
-            display: block;
-            font-size: 0.75rem;
-            color: var(--text-muted);
-        }
-        
-        .recent-time {
-            color: var(--text-muted);
-            font-size: 0.75rem;
-        }
-        
-        .objective-item {
-            cursor: pointer;
-        }
-        
-        .objective-item.completed {
-            opacity: 0.7;
-        }
-        
-        .objective-check {
-            width: 24px;
-            height: 24px;
-            background: var(--secondary-dark);
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: var(--blood-red);
-        }
-        
-        .objective-item.completed .objective-check {
-            color: #28a745;
-        }
-        
-        .objective-content {
-            flex: 1;
-        }
-        
-        .objective-text {
-            display: block;
-            color: var(--text-primary);
-            font-size: 0.875rem;
-        }
-        
-        .objective-character {
-            display: block;
-            font-size: 0.75rem;
-            color: var(--text-muted);
-        }
-        
-        .note-item {
-            flex-direction: column;
-            align-items: stretch;
-            border-left: 4px solid var(--blood-red);
-        }
-        
-        .note-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: var(--spacing-xs);
-        }
-        
-        .note-title {
-            font-weight: 500;
-            color: var(--text-primary);
-        }
-        
-        .note-actions {
-            display: flex;
-            gap: var(--spacing-xs);
-        }
-        
-        .note-action {
-            background: none;
-            border: none;
-            color: var(--text-muted);
-            cursor: pointer;
-            padding: 2px;
-        }
-        
-        .note-action:hover {
-            color: var(--text-primary);
-        }
-        
-        .note-content {
-            font-size: 0.875rem;
-            color: var(--text-secondary);
-            margin-bottom: var(--spacing-xs);
-        }
-        
-        .note-time {
-            font-size: 0.75rem;
-            color: var(--text-muted);
-            display: flex;
-            align-items: center;
-            gap: 4px;
-        }
-        
-        .btn-add-note {
-            width: 100%;
-            padding: var(--spacing-sm);
-            background: var(--tertiary-dark);
-            border: 1px dashed var(--border-color);
-            border-radius: var(--radius-md);
-            color: var(--text-muted);
-            cursor: pointer;
-            transition: all var(--transition-fast);
-        }
-        
-        .btn-add-note:hover {
-            background: var(--secondary-dark);
-            border-color: var(--blood-red);
-            color: var(--text-primary);
-        }
-        
-        .sidebar-footer {
-            margin-top: auto;
-            padding-top: var(--spacing-lg);
-            border-top: 1px solid var(--border-color);
-        }
-        
-        .theme-toggle {
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            margin-bottom: var(--spacing-md);
-        }
-        
-        .switch {
-            position: relative;
-            display: inline-block;
-            width: 50px;
-            height: 24px;
-        }
-        
-        .switch input {
-            opacity: 0;
-            width: 0;
-            height: 0;
-        }
-        
-        .slider {
-            position: absolute;
-            cursor: pointer;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background-color: var(--border-color);
-            transition: var(--transition-normal);
-            border-radius: var(--radius-full);
-        }
-        
-        .slider:before {
-            position: absolute;
-            content: "";
-            height: 16px;
-            width: 16px;
-            left: 4px;
-            bottom: 4px;
-            background-color: var(--text-primary);
-            transition: var(--transition-normal);
-            border-radius: 50%;
-        }
-        
-        input:checked + .slider {
-            background-color: var(--blood-red);
-        }
-        
-        input:checked + .slider:before {
-            transform: translateX(26px);
-        }
-        
-        .sidebar-tags {
-            display: flex;
-            gap: var(--spacing-xs);
-            flex-wrap: wrap;
-        }
-        
-        .sidebar-tag {
-            padding: 4px 8px;
-            background: var(--tertiary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-full);
-            font-size: 0.75rem;
-            color: var(--text-muted);
-            cursor: pointer;
-            transition: all var(--transition-fast);
-        }
-        
-        .sidebar-tag:hover {
-            background: var(--blood-red);
-            color: white;
-            border-color: var(--blood-red);
-        }
-        
-        .empty-state {
-            text-align: center;
-            padding: var(--spacing-xl);
-            color: var(--text-muted);
-        }
-        
-        .empty-state i {
-            font-size: 2rem;
-            margin-bottom: var(--spacing-sm);
-            display: block;
-        }
-        
-        /* ========== MAIN CONTENT ========== */
-        .page-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: var(--spacing-xl);
-            padding-bottom: var(--spacing-md);
-            border-bottom: 1px solid var(--border-color);
-        }
-        
-        .page-title {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-md);
-        }
-        
-        .page-title i {
-            color: var(--blood-red);
-        }
-        
-        .page-actions {
-            display: flex;
-            gap: var(--spacing-sm);
-        }
-        
-        /* ========== CARDS ========== */
-        .card {
-            background: var(--secondary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-lg);
-            padding: var(--spacing-lg);
-            transition: all var(--transition-normal);
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .card:hover {
-            border-color: var(--border-light);
-            transform: translateY(-4px);
-            box-shadow: var(--shadow-lg);
-        }
-        
-        .card.glow {
-            border-color: var(--blood-red);
-            box-shadow: var(--shadow-glow);
-        }
-        
-        .card-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: var(--spacing-md);
-            padding-bottom: var(--spacing-sm);
-            border-bottom: 1px solid var(--border-color);
-        }
-        
-        .card-title {
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-sm);
-            color: var(--text-primary);
-            font-weight: 600;
-        }
-        
-        .card-title i {
-            color: var(--blood-red);
-        }
-        
-        /* ========== STATS CARDS ========== */
-        .stats-grid-large {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: var(--spacing-lg);
-            margin-bottom: var(--spacing-xl);
-        }
-        
-        .stat-card {
-            background: var(--secondary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-lg);
-            padding: var(--spacing-lg);
-            text-align: center;
-            transition: all var(--transition-normal);
-        }
-        
-        .stat-card:hover {
-            border-color: var(--blood-red);
-            transform: translateY(-4px);
-        }
-        
-        .stat-icon {
-            width: 60px;
-            height: 60px;
-            background: var(--gradient-blood);
-            border-radius: var(--radius-lg);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            margin: 0 auto var(--spacing-md);
-            color: white;
-            font-size: 1.5rem;
-        }
-        
-        .stat-value {
-            font-size: 2.5rem;
-            font-weight: bold;
-            color: var(--blood-red);
-            line-height: 1;
-            margin-bottom: var(--spacing-sm);
-        }
-        
-        .stat-description {
-            color: var(--text-muted);
-            font-size: 0.875rem;
-        }
-        
-        /* ========== BUTTONS ========== */
-        .btn {
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            gap: var(--spacing-sm);
-            padding: var(--spacing-sm) var(--spacing-lg);
-            border: none;
-            border-radius: var(--radius-md);
-            font-family: 'Inter', sans-serif;
-            font-weight: 500;
-            cursor: pointer;
-            transition: all var(--transition-fast);
-            text-decoration: none;
-        }
-        
-        .btn-primary {
-            background: var(--gradient-blood);
-            color: white;
-        }
-        
-        .btn-primary:hover {
-            transform: translateY(-2px);
-            box-shadow: var(--shadow-glow);
-        }
-        
-        .btn-secondary {
-            background: var(--tertiary-dark);
-            color: var(--text-primary);
-            border: 1px solid var(--border-color);
-        }
-        
-        .btn-secondary:hover {
-            background: var(--secondary-dark);
-            border-color: var(--border-light);
-        }
-        
-        .btn-outline {
-            background: transparent;
-            color: var(--text-primary);
-            border: 1px solid var(--border-color);
-        }
-        
-        .btn-outline:hover {
-            border-color: var(--blood-red);
-            color: var(--blood-red);
-        }
-        
-        .btn-sm {
-            padding: var(--spacing-xs) var(--spacing-md);
-            font-size: 0.875rem;
-        }
-        
-        .btn-lg {
-            padding: var(--spacing-md) var(--spacing-xl);
-            font-size: 1.125rem;
-        }
-        
-        .btn-icon {
-            width: 40px;
-            height: 40px;
-            padding: 0;
-            border-radius: var(--radius-md);
-        }
-        
-        /* ========== FORMS ========== */
-        .form-group {
-            margin-bottom: var(--spacing-lg);
-        }
-        
-        .form-label {
-            display: block;
-            margin-bottom: var(--spacing-sm);
-            color: var(--text-primary);
-            font-weight: 500;
-        }
-        
-        .form-control {
-            width: 100%;
-            padding: var(--spacing-sm) var(--spacing-md);
-            background: var(--tertiary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-md);
-            color: var(--text-primary);
-            font-family: 'Inter', sans-serif;
-            transition: all var(--transition-fast);
-        }
-        
-        .form-control:focus {
-            outline: none;
-            border-color: var(--blood-red);
-            box-shadow: 0 0 0 2px var(--blood-glow);
-        }
-        
-        .form-control::placeholder {
-            color: var(--text-muted);
-        }
-        
-        textarea.form-control {
-            min-height: 100px;
-            resize: vertical;
-        }
-        
-        select.form-control {
-            appearance: none;
-            background-image: url("data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' fill='%238B0000' viewBox='0 0 16 16'%3E%3Cpath d='M7.247 11.14 2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z'/%3E%3C/svg%3E");
-            background-repeat: no-repeat;
-            background-position: right 12px center;
-            background-size: 12px;
-            padding-right: 36px;
-        }
-        
-        /* ========== ALERTS ========== */
-        .alert {
-            display: flex;
-            align-items: center;
-            padding: var(--spacing-md);
-            background: var(--tertiary-dark);
-            border: 1px solid;
-            border-radius: var(--radius-md);
-            margin-bottom: var(--spacing-lg);
-            position: relative;
-        }
-        
-        .alert-success {
-            border-color: #28a745;
-            color: #d4edda;
-        }
-        
-        .alert-error {
-            border-color: #dc3545;
-            color: #f8d7da;
-        }
-        
-        .alert-warning {
-            border-color: #ffc107;
-            color: #fff3cd;
-        }
-        
-        .alert-info {
-            border-color: #17a2b8;
-            color: #d1ecf1;
-        }
-        
-        .alert-close {
-            margin-left: auto;
-            background: none;
-            border: none;
-            color: inherit;
-            cursor: pointer;
-            padding: 4px;
-        }
-        
-        /* ========== TABLES ========== */
-        .table-container {
-            background: var(--secondary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-lg);
-            overflow: hidden;
-        }
-        
-        .table {
-            width: 100%;
-            color: var(--text-primary);
-            border-collapse: collapse;
-        }
-        
-        .table th {
-            background: var(--tertiary-dark);
-            padding: var(--spacing-md);
-            text-align: left;
-            font-weight: 600;
-            border-bottom: 1px solid var(--border-color);
-        }
-        
-        .table td {
-            padding: var(--spacing-md);
-            border-bottom: 1px solid var(--border-color);
-        }
-        
-        .table tr:last-child td {
-            border-bottom: none;
-        }
-        
-        .table tr:hover {
-            background: var(--tertiary-dark);
-        }
-        
-        /* ========== CHARACTER CARDS ========== */
-        .characters-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(350px, 1fr));
-            gap: var(--spacing-lg);
-        }
-        
-        .character-card {
-            background: var(--secondary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-lg);
-            overflow: hidden;
-            transition: all var(--transition-normal);
-        }
-        
-        .character-card:hover {
-            transform: translateY(-4px);
-            border-color: var(--blood-red);
-            box-shadow: var(--shadow-lg);
-        }
-        
-        .character-cover {
-            height: 160px;
-            background: var(--tertiary-dark);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            border-bottom: 1px solid var(--border-color);
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .character-cover i {
-            font-size: 4rem;
-            color: var(--blood-red);
-            opacity: 0.5;
-        }
-        
-        .character-cover img {
-            width: 100%;
-            height: 100%;
-            object-fit: cover;
-        }
-        
-        .character-body {
-            padding: var(--spacing-lg);
-        }
-        
-        .character-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: flex-start;
-            margin-bottom: var(--spacing-md);
-        }
-        
-        .character-name {
-            font-size: 1.25rem;
-            font-weight: 600;
-            color: var(--text-primary);
-            margin: 0;
-        }
-        
-        .character-meta {
-            display: flex;
-            gap: var(--spacing-sm);
-            margin-bottom: var(--spacing-md);
-        }
-        
-        .character-type {
-            background: var(--tertiary-dark);
-            color: var(--blood-red);
-            padding: 4px 8px;
-            border-radius: var(--radius-full);
-            font-size: 0.75rem;
-            font-weight: 500;
-        }
-        
-        .character-priority {
-            display: inline-flex;
-            align-items: center;
-            gap: 4px;
-            background: var(--tertiary-dark);
-            color: var(--text-muted);
-            padding: 4px 8px;
-            border-radius: var(--radius-full);
-            font-size: 0.75rem;
-        }
-        
-        .character-priority i {
-            color: var(--blood-red);
-        }
-        
-        .character-description {
-            color: var(--text-secondary);
-            font-size: 0.875rem;
-            line-height: 1.5;
-            margin-bottom: var(--spacing-lg);
-            display: -webkit-box;
-            -webkit-line-clamp: 3;
-            -webkit-box-orient: vertical;
-            overflow: hidden;
-        }
-        
-        .character-footer {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding-top: var(--spacing-md);
-            border-top: 1px solid var(--border-color);
-        }
-        
-        .character-stats {
-            display: flex;
-            gap: var(--spacing-lg);
-        }
-        
-        .character-stat {
-            text-align: center;
-        }
-        
-        .stat-number {
-            display: block;
-            font-size: 1.25rem;
-            font-weight: bold;
-            color: var(--blood-red);
-        }
-        
-        .stat-label {
-            display: block;
-            font-size: 0.75rem;
-            color: var(--text-muted);
-        }
-        
-        /* ========== PRIORITY BAR ========== */
-        .priority-bar {
-            width: 100%;
-            height: 6px;
-            background: var(--tertiary-dark);
-            border-radius: var(--radius-full);
-            overflow: hidden;
-            margin: var(--spacing-md) 0;
-        }
-        
-        .priority-fill {
-            height: 100%;
-            background: var(--gradient-blood);
-            border-radius: var(--radius-full);
-            transition: width var(--transition-normal);
-        }
-        
-        .priority-circle {
-            width: 120px;
-            height: 120px;
-            border-radius: 50%;
-            border: 3px solid var(--blood-red);
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-            margin: var(--spacing-lg) auto;
-            background: var(--secondary-dark);
-            position: relative;
-        }
-        
-        .priority-value {
-            font-size: 2.5rem;
-            font-weight: bold;
-            color: var(--blood-red);
-        }
-        
-        .priority-label {
-            font-size: 0.875rem;
-            color: var(--text-muted);
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        
-        /* ========== OBJECTIVES ========== */
-        .objectives-list-full {
-            display: flex;
-            flex-direction: column;
-            gap: var(--spacing-sm);
-        }
-        
-        .objective-card {
-            background: var(--tertiary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-md);
-            padding: var(--spacing-md);
-            display: flex;
-            align-items: center;
-            gap: var(--spacing-md);
-            transition: all var(--transition-fast);
-        }
-        
-        .objective-card:hover {
-            border-color: var(--blood-red);
-            transform: translateX(4px);
-        }
-        
-        .objective-card.completed {
-            opacity: 0.7;
-            background: var(--secondary-dark);
-        }
-        
-        .objective-checkbox {
-            width: 24px;
-            height: 24px;
-            background: var(--secondary-dark);
-            border: 2px solid var(--border-color);
-            border-radius: var(--radius-sm);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            cursor: pointer;
-            transition: all var(--transition-fast);
-        }
-        
-        .objective-card.completed .objective-checkbox {
-            background: var(--blood-red);
-            border-color: var(--blood-red);
-        }
-        
-        .objective-checkbox i {
-            color: white;
-            font-size: 0.75rem;
-            opacity: 0;
-        }
-        
-        .objective-card.completed .objective-checkbox i {
-            opacity: 1;
-        }
-        
-        .objective-content-full {
-            flex: 1;
-        }
-        
-        .objective-description {
-            color: var(--text-primary);
-            margin-bottom: 4px;
-        }
-        
-        .objective-meta {
-            display: flex;
-            gap: var(--spacing-md);
-            font-size: 0.75rem;
-            color: var(--text-muted);
-        }
-        
-        .objective-actions {
-            display: flex;
-            gap: var(--spacing-xs);
-        }
-        
-        /* ========== TAGS ========== */
-        .tags-cloud {
-            display: flex;
-            flex-wrap: wrap;
-            gap: var(--spacing-xs);
-            margin-top: var(--spacing-md);
-        }
-        
-        .tag {
-            padding: 4px 12px;
-            background: var(--tertiary-dark);
-            border: 1px solid var(--border-color);
-            border-radius: var(--radius-full);
-            font-size: 0.875rem;
-            color: var(--text-secondary);
-            transition: all var(--transition-fast);
-        }
-        
-        .tag:hover {
-            background: var(--blood-red);
-            color: white;
-            border-color: var(--blood-red);
-        }
-        
-        /* ========== ANIMATIONS ========== */
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(20px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        
-        @keyframes slideIn {
-            from { transform: translateX(-20px); opacity: 0; }
-            to { transform: translateX(0); opacity: 1; }
-        }
-        
-        .fade-in {
-            animation: fadeIn 0.5s ease-out;
-        }
-        
-        .slide-in {
-            animation: slideIn 0.3s ease-out;
-        }
-        
-        /* ========== RESPONSIVE ========== */
-        @media (max-width: 1200px) {
-            .container-main {
-                padding: var(--spacing-md);
-            }
-            
-            .characters-grid {
-                grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-            }
-        }
-        
-        @media (max-width: 992px) {
-            .navbar-toggler {
-                display: block;
-            }
-            
-            .navbar-menu {
-                position: fixed;
-                top: 70px;
-                left: 0;
-                right: 0;
-                background: var(--secondary-dark);
-                border-bottom: 1px solid var(--border-color);
-                flex-direction: column;
-                padding: var(--spacing-lg);
-                display: none;
-                box-shadow: var(--shadow-lg);
-            }
-            
-            .navbar-menu.active {
-                display: flex;
-            }
-            
-            .nav-items {
-                flex-direction: column;
-                width: 100%;
-            }
-            
-            .nav-item {
-                width: 100%;
-                justify-content: flex-start;
-            }
-            
-            .sidebar-toggle {
-                display: flex;
-            }
-            
-            .sidebar {
-                top: 0;
-                height: 100vh;
-                width: 100%;
-                max-width: 400px;
-            }
-        }
-        
-        @media (max-width: 768px) {
-            .container-main {
-                padding: var(--spacing-sm);
-            }
-            
-            .page-header {
-                flex-direction: column;
-                align-items: flex-start;
-                gap: var(--spacing-md);
-            }
-            
-            .page-actions {
-                width: 100%;
-                justify-content: space-between;
-            }
-            
-            .stats-grid-large {
-                grid-template-columns: repeat(2, 1fr);
-            }
-            
-            .characters-grid {
-                grid-template-columns: 1fr;
-            }
-        }
-        
-        @media (max-width: 576px) {
-            .stats-grid-large {
-                grid-template-columns: 1fr;
-            }
-            
-            h1 { font-size: 2rem; }
-            h2 { font-size: 1.75rem; }
-            h3 { font-size: 1.5rem; }
-            
-            .stat-value {
-                font-size: 2rem;
-            }
-            
-            .character-cover {
-                height: 120px;
-            }
-        }
-        
-        /* ========== UTILITY CLASSES ========== */
-        .mb-0 { margin-bottom: 0 !important; }
-        .mb-1 { margin-bottom: var(--spacing-xs) !important; }
-        .mb-2 { margin-bottom: var(--spacing-sm) !important; }
-        .mb-3 { margin-bottom: var(--spacing-md) !important; }
-        .mb-4 { margin-bottom: var(--spacing-lg) !important; }
-        .mb-5 { margin-bottom: var(--spacing-xl) !important; }
-        
-        .mt-0 { margin-top: 0 !important; }
-        .mt-1 { margin-top: var(--spacing-xs) !important; }
-        .mt-2 { margin-top: var(--spacing-sm) !important; }
-        .mt-3 { margin-top: var(--spacing-md) !important; }
-        .mt-4 { margin-top: var(--spacing-lg) !important; }
-        .mt-5 { margin-top: var(--spacing-xl) !important; }
-        
-        .text-center { text-align: center !important; }
-        .text-right { text-align: right !important; }
-        
-        .d-flex { display: flex !important; }
-        .d-none { display: none !important; }
-        
-        .justify-between { justify-content: space-between !important; }
-        .align-center { align-items: center !important; }
-        
-        .w-100 { width: 100% !important; }
-        
-        .opacity-50 { opacity: 0.5 !important; }
-        .opacity-75 { opacity: 0.75 !important; }
-        
-        .cursor-pointer { cursor: pointer !important; }
-        
-        .scrollbar {
-            scrollbar-width: thin;
-            scrollbar-color: var(--blood-red) var(--tertiary-dark);
-        }
-        
-        .scrollbar::-webkit-scrollbar {
-            width: 8px;
-        }
-        
-        .scrollbar::-webkit-scrollbar-track {
-            background: var(--tertiary-dark);
-            border-radius: var(--radius-full);
-        }
-        
-        .scrollbar::-webkit-scrollbar-thumb {
-            background: var(--blood-red);
-            border-radius: var(--radius-full);
-        }
-        
-        .scrollbar::-webkit-scrollbar-thumb:hover {
-            background: var(--blood-light);
-        }
-    </style>
-</head>
-<body>
-    {{ navbar|safe }}
+# No SQLite, busca_fts é uma tabela virtual FTS5; no PostgreSQL, uma tabela comum
+# com a coluna gerada "documento" (tsvector) e um índice GIN. Nos dois, os
+# gatilhos mantêm as mesmas linhas a partir de BUSCA_FONTES.
+# Cada linha do índice tem rowid = id * 3 + origem (0 personagem, 1 objetivo,
+# 2 nota), o que permite apagar/atualizar pelo rowid sem varrer a tabela.
+# A coluna "usuario" guarda o token u<id> e restringe o MATCH ao dono; os
+# termos da busca ficam restritos a titulo e conteudo. "indexadas" são as colunas
+# da tabela de origem cujo UPDATE reindexa a linha (contadores, datas e
+# concluido não mexem no índice).
+BUSCA_ORIGENS = ('personagem', 'objetivo', 'nota_rapida')
+
+BUSCA_FONTES = {
+    'personagem': {
+        'rowid': "{r}.id * 3",
+        'titulo': "{r}.nome",
+        'conteudo': "coalesce({r}.tipo, '') || ' ' || coalesce({r}.descricao, '') || ' ' || "
+                    "coalesce({r}.historia, '') || ' ' || coalesce({r}.habilidades, '') || ' ' || "
+                    "coalesce({r}.notas, '') || ' ' || coalesce((SELECT {agregar}(tag.nome, ' ') "
+                    "FROM personagem_tag JOIN tag ON tag.id = personagem_tag.tag_id "
+                    "WHERE personagem_tag.personagem_id = {r}.id), '')",
+        'usuario': "'u' || {r}.usuario_id",
+        'personagem_id': "{r}.id",
+        'indexadas': "nome, tipo, descricao, historia, habilidades, notas, usuario_id",
+    },
+    'objetivo': {
+        'rowid': "{r}.id * 3 + 1",
+        'titulo': "{r}.descricao",
+        'conteudo': "''",
+        'usuario': "'u' || (SELECT usuario_id FROM personagem WHERE personagem.id = {r}.personagem_id)",
+        'personagem_id': "{r}.personagem_id",
+        'indexadas': "descricao, personagem_id",
+    },
+    'nota_rapida': {
+        'rowid': "{r}.id * 3 + 2",
+        'titulo': "{r}.titulo",
+        'conteudo': "coalesce({r}.conteudo, '')",
+        'usuario': "'u' || {r}.usuario_id",
+        'personagem_id': "NULL",
+        'indexadas': "titulo, conteudo, usuario_id",
+    },
+}
+
+BUSCA_COLUNAS = ('rowid', 'titulo', 'conteudo', 'usuario', 'personagem_id')
+
+
+# Tamanho máximo de texto indexado por coluna no PostgreSQL: um tsvector tem no máximo 1 MB
+BUSCA_PG_MAX_CARACTERES = 200000
+# Sem a extensão unaccent (nem sempre disponível), os acentos saem com translate();
+# normalizar_busca faz o mesmo com os termos da busca
+BUSCA_PG_ACENTOS = ('áàâãäåéèêëíìîïóòôõöúùûüçñýÿ', 'aaaaaaeeeeiiiiooooouuuucnyy')
+
+
+def busca_disponivel():
+    return db.engine.dialect.name in ('sqlite', 'postgresql')
+
+
+def busca_select(tabela, referencia):
+    fonte = BUSCA_FONTES[tabela]
+    agregar = 'string_agg' if db.engine.dialect.name == 'postgresql' else 'group_concat'
+    return ', '.join(fonte[coluna].format(r=referencia, agregar=agregar) for coluna in BUSCA_COLUNAS)
+
+
+def busca_ddl():
+    if db.engine.dialect.name == 'postgresql':
+        return busca_ddl_postgres()
+    # Os gatilhos são sempre recriados, para acompanhar mudanças em BUSCA_FONTES
+    comandos = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS busca_fts USING fts5("
+        "titulo, conteudo, usuario, personagem_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    ]
+    colunas = ', '.join(BUSCA_COLUNAS)
+    for tabela in BUSCA_FONTES:
+        rowid_antigo = BUSCA_FONTES[tabela]['rowid'].format(r='old')
+        comandos += [
+            f"DROP TRIGGER IF EXISTS busca_{tabela}_ai",
+            f"CREATE TRIGGER busca_{tabela}_ai AFTER INSERT ON {tabela} BEGIN "
+            f"INSERT INTO busca_fts({colunas}) VALUES ({busca_select(tabela, 'new')}); END",
+            f"DROP TRIGGER IF EXISTS busca_{tabela}_ad",
+            f"CREATE TRIGGER busca_{tabela}_ad AFTER DELETE ON {tabela} BEGIN "
+            f"DELETE FROM busca_fts WHERE rowid = {rowid_antigo}; END",
+            f"DROP TRIGGER IF EXISTS busca_{tabela}_au",
+            f"CREATE TRIGGER busca_{tabela}_au AFTER UPDATE OF {BUSCA_FONTES[tabela]['indexadas']} ON {tabela} BEGIN "
+            f"DELETE FROM busca_fts WHERE rowid = {rowid_antigo}; "
+            f"INSERT INTO busca_fts({colunas}) VALUES ({busca_select(tabela, 'new')}); END",
+        ]
+    # As tags entram no texto do personagem: mudanças na associação reindexam a linha dele
+    for evento, referencia in (('INSERT', 'new'), ('DELETE', 'old')):
+        comandos += [
+            f"DROP TRIGGER IF EXISTS busca_personagem_tag_{referencia}",
+            f"CREATE TRIGGER busca_personagem_tag_{referencia} AFTER {evento} ON personagem_tag BEGIN "
+            f"DELETE FROM busca_fts WHERE rowid = {referencia}.personagem_id * 3; "
+            f"INSERT INTO busca_fts({colunas}) SELECT {busca_select('personagem', 'personagem')} "
+            f"FROM personagem WHERE personagem.id = {referencia}.personagem_id; END",
+        ]
+    return comandos
+
+
+def busca_ddl_postgres():
+    # Mesmas linhas do FTS5; o rowid vira a chave primária e o tsvector é gerado pelo
+    # próprio banco (título com peso A, conteúdo com peso B). Funções e gatilhos são
+    # sempre recriados, para acompanhar mudanças em BUSCA_FONTES
+    colunas = ', '.join(BUSCA_COLUNAS)
+    com_acento, sem_acento = BUSCA_PG_ACENTOS
+    comandos = [
+        "CREATE OR REPLACE FUNCTION busca_normalizar(texto text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE AS "
+        f"$$ SELECT translate(lower(left(coalesce(texto, ''), {BUSCA_PG_MAX_CARACTERES})), "
+        f"'{com_acento}', '{sem_acento}') $$",
+        "CREATE TABLE IF NOT EXISTS busca_fts ("
+        "rowid bigint PRIMARY KEY, titulo text, conteudo text, usuario text NOT NULL, personagem_id integer, "
+        "documento tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', busca_normalizar(titulo)), 'A') || "
+        "setweight(to_tsvector('simple', busca_normalizar(conteudo)), 'B')) STORED)",
+        "CREATE INDEX IF NOT EXISTS ix_busca_fts_documento ON busca_fts USING gin (documento)",
+        "CREATE INDEX IF NOT EXISTS ix_busca_fts_usuario ON busca_fts (usuario)",
+    ]
+    for tabela, fonte in BUSCA_FONTES.items():
+        comandos += [
+            f"CREATE OR REPLACE FUNCTION busca_{tabela}_sincronizar() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+            f"IF TG_OP <> 'INSERT' THEN DELETE FROM busca_fts WHERE rowid = {fonte['rowid'].format(r='OLD')}; END IF; "
+            f"IF TG_OP <> 'DELETE' THEN INSERT INTO busca_fts({colunas}) VALUES ({busca_select(tabela, 'NEW')}); END IF; "
+            f"RETURN NULL; END $$",
+            f"DROP TRIGGER IF EXISTS busca_{tabela}_sincronizar ON {tabela}",
+            f"CREATE TRIGGER busca_{tabela}_sincronizar AFTER INSERT OR DELETE OR UPDATE OF {fonte['indexadas']} "
+            f"ON {tabela} FOR EACH ROW EXECUTE FUNCTION busca_{tabela}_sincronizar()",
+        ]
+    # As tags entram no texto do personagem: mudanças na associação reindexam a linha dele
+    comandos += [
+        "CREATE OR REPLACE FUNCTION busca_personagem_tag_sincronizar() RETURNS trigger LANGUAGE plpgsql AS $$ "
+        "DECLARE alterado integer; BEGIN "
+        "IF TG_OP = 'INSERT' THEN alterado = NEW.personagem_id; ELSE alterado = OLD.personagem_id; END IF; "
+        "DELETE FROM busca_fts WHERE rowid = alterado * 3; "
+        f"INSERT INTO busca_fts({colunas}) SELECT {busca_select('personagem', 'personagem')} "
+        "FROM personagem WHERE personagem.id = alterado; "
+        "RETURN NULL; END $$",
+        "DROP TRIGGER IF EXISTS busca_personagem_tag_sincronizar ON personagem_tag",
+        "CREATE TRIGGER busca_personagem_tag_sincronizar AFTER INSERT OR DELETE ON personagem_tag "
+        "FOR EACH ROW EXECUTE FUNCTION busca_personagem_tag_sincronizar()",
+    ]
+    return comandos
+
+
+def criar_indice_busca(reconstruir=False):
+    if not busca_disponivel():
+        return
     
-    <main class="container-main fade-in">
-        {{ content|safe }}
-    </main>
+    if db.engine.dialect.name == 'postgresql':
+        existia = db.session.execute(db.text("SELECT to_regclass('busca_fts') IS NOT NULL")).scalar()
+    else:
+        existia = db.session.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'busca_fts'"
+        )).first() is not None
     
-    {{ sidebar|safe }}
+    for comando in busca_ddl():
+        db.session.execute(db.text(comando))
+    db.session.commit()
     
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
-    <script>
-        // Funções globais
-        function toggleSidebar() {
-            const sidebar = document.querySelector('.sidebar');
-            const toggle = document.querySelector('.sidebar-toggle');
-            sidebar.classList.toggle('active');
-            
-            if (sidebar.classList.contains('active')) {
-                toggle.innerHTML = '<i class="fas fa-times"></i>';
-            } else {
-                toggle.innerHTML = '<i class="fas fa-bars"></i>';
-            }
-        }
-        
-        function toggleNavbar() {
-            const menu = document.getElementById('navbarMenu');
-            menu.classList.toggle('active');
-        }
-        
-        function toggleDarkMode() {
-            const toggle = document.getElementById('darkModeToggle');
-            document.body.classList.toggle('light-mode', !toggle.checked);
-        }
-        
-        function novaNotaRapida() {
-            const titulo = prompt('Título da nota:');
-            if (titulo) {
-                const conteudo = prompt('Conteúdo da nota:');
-                if (conteudo !== null) {
-                    fetch('/salvar_nota_rapida', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                        },
-                        body: JSON.stringify({
-                            titulo: titulo,
-                            conteudo: conteudo,
-                            cor: '#8B0000'
-                        })
-                    })
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            showToast('Nota salva com sucesso!', 'success');
-                            setTimeout(() => location.reload(), 1000);
-                        } else {
-                            showToast('Erro ao salvar nota: ' + data.message, 'error');
-                        }
-                    });
-                }
-            }
-        }
-        
-        function editarNota(notaId) {
-            const novoTitulo = prompt('Novo título:');
-            if (novoTitulo) {
-                const novoConteudo = prompt('Novo conteúdo:');
-                if (novoConteudo !== null) {
-                    alert('Funcionalidade de edição em desenvolvimento!');
-                }
-            }
-        }
-        
-        function excluirNota(notaId) {
-            if (confirm('Tem certeza que deseja excluir esta nota?')) {
-                fetch('/excluir_nota_rapida/' + notaId, {
-                    method: 'DELETE'
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        showToast('Nota excluída com sucesso!', 'success');
-                        setTimeout(() => location.reload(), 1000);
-                    } else {
-                        showToast('Erro ao excluir nota: ' + data.message, 'error');
-                    }
-                });
-            }
-        }
-        
-        function toggleObjetivoSidebar(objetivoId) {
-            fetch('/toggle_objetivo/' + objetivoId, {
-                method: 'POST'
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    setTimeout(() => location.reload(), 300);
-                }
-            });
-        }
-        
-        function gerarRelatorio() {
-            fetch('/gerar_relatorio')
-            .then(() => {
-                showToast('Relatório gerado com sucesso!', 'success');
-                setTimeout(() => location.reload(), 1000);
-            });
-        }
-        
-        function updatePriorityBars() {
-            const prioridade = document.getElementById('prioridade')?.value || 5;
-            const bar = document.getElementById('prioridade-bar');
-            if (bar) {
-                bar.style.width = (prioridade * 10) + '%';
-            }
-        }
-        
-        function showToast(message, type = 'info') {
-            // Implementação simplificada de toast
-            alert(`${type.toUpperCase()}: ${message}`);
-        }
-        
-        function confirmDelete(message) {
-            return confirm(message || 'Tem certeza que deseja excluir?');
-        }
-        
-        // Inicialização
-        document.addEventListener('DOMContentLoaded', function() {
-            updatePriorityBars();
-            
-            // Fechar alertas
-            document.querySelectorAll('.alert-close').forEach(button => {
-                button.addEventListener('click', function() {
-                    this.closest('.alert').style.display = 'none';
-                });
-            });
-            
-            // Fechar sidebar ao clicar fora (mobile)
-            document.addEventListener('click', function(event) {
-                const sidebar = document.querySelector('.sidebar');
-                const toggle = document.querySelector('.sidebar-toggle');
-                
-                if (window.innerWidth <= 992 && 
-                    sidebar.classList.contains('active') &&
-                    !sidebar.contains(event.target) &&
-                    !toggle.contains(event.target)) {
-                    toggleSidebar();
-                }
-            });
-            
-            // Adicionar animações de entrada
-            const cards = document.querySelectorAll('.card, .character-card, .stat-card');
-            cards.forEach((card, index) => {
-                card.style.animationDelay = `${index * 0.1}s`;
-                card.classList.add('fade-in');
-            });
-        });
-    </script>
+    if reconstruir or not existia:
+        reconstruir_indice_busca()
+
+
+def reconstruir_indice_busca():
+    colunas = ', '.join(BUSCA_COLUNAS)
+    db.session.execute(db.text("DELETE FROM busca_fts"))
+    for tabela in BUSCA_FONTES:
+        db.session.execute(db.text(
+            f"INSERT INTO busca_fts({colunas}) SELECT {busca_select(tabela, tabela)} FROM {tabela}"
+        ))
+    db.session.commit()
+
+
+def consulta_fts(termo):
+    # Cada palavra vira um prefixo entre aspas, o que neutraliza a sintaxe do FTS5
+    palavras = re.findall(r'\w+', termo)
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def destacar(texto):
+    # O FTS5 marca os trechos com \x02/\x03; o resto do texto é escapado
+    return str(escape(texto or '')).replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+
+def buscar_textos(usuario_id, termo, pagina=1, por_pagina=None):
+    """
+    Busca ranqueada (bm25 no SQLite, ts_rank no PostgreSQL) em personagens,
+    objetivos e notas rápidas do usuário.
+    Retorna (resultados, total); cada resultado é um dict com origem, id,
+    personagem_id, titulo e trecho já com os destaques em <mark>.
+    """
+    por_pagina = por_pagina or app.config['BUSCA_RESULTADOS_POR_PAGINA']
+    consulta = consulta_fts(termo)
+    if not consulta:
+        return [], 0
+    
+    if not busca_disponivel():
+        return buscar_textos_sem_fts(usuario_id, termo, pagina, por_pagina)
+    if db.engine.dialect.name == 'postgresql':
+        return buscar_textos_postgres(usuario_id, termo, pagina, por_pagina)
+    
+    parametros = {
+        # Os termos só casam com as colunas de texto, nunca com o token do dono
+        'consulta': f'usuario:"u{usuario_id}" AND {{titulo conteudo}} : ({consulta})',
+        'limite': por_pagina,
+        'deslocamento': (pagina - 1) * por_pagina,
+    }
+    
+    total = db.session.execute(db.text(
+        "SELECT count(*) FROM busca_fts WHERE busca_fts MATCH :consulta"
+    ), parametros).scalar()
+    
+    linhas = db.session.execute(db.text(
+        "SELECT rowid, personagem_id, "
+        "highlight(busca_fts, 0, char(2), char(3)), "
+        "snippet(busca_fts, 1, char(2), char(3), '…', 24) "
+        "FROM busca_fts WHERE busca_fts MATCH :consulta "
+        "ORDER BY bm25(busca_fts, 10.0, 1.0, 0.0) "
+        "LIMIT :limite OFFSET :deslocamento"
+    ), parametros).all()
+    
+    resultados = [{
+        'origem': BUSCA_ORIGENS[rowid % 3],
+        'id': rowid // 3,
+        'personagem_id': personagem_id,
+        'titulo': destacar(titulo),
+        'trecho': destacar(trecho),
+    } for rowid, personagem_id, titulo, trecho in linhas]
+    
+    return resultados, total
+
+
+def buscar_textos_postgres(usuario_id, termo, pagina, por_pagina):
+    # Mesma busca do FTS5: cada palavra vira um prefixo (to_tsquery com :*), todas
+    # obrigatórias, ranqueadas pelo título antes do conteúdo. O GIN resolve o @@
+    termos = tuple(dict.fromkeys(filter(None, (normalizar_busca(palavra) for palavra in re.findall(r'\w+', termo)))))
+    if not termos:
+        return [], 0
+    parametros = {
+        'usuario': f'u{usuario_id}',
+        'consulta': ' & '.join(f"'{palavra}':*" for palavra in termos),
+        'limite': por_pagina,
+        'deslocamento': (pagina - 1) * por_pagina,
+    }
+    filtro = "usuario = :usuario AND documento @@ to_tsquery('simple', :consulta)"
+    
+    total = db.session.execute(db.text(f"SELECT count(*) FROM busca_fts WHERE {filtro}"), parametros).scalar()
+    
+    linhas = db.session.execute(db.text(
+        "SELECT rowid, personagem_id, titulo, conteudo FROM busca_fts "
+        f"WHERE {filtro} "
+        "ORDER BY ts_rank(documento, to_tsquery('simple', :consulta)) DESC, rowid "
+        "LIMIT :limite OFFSET :deslocamento"
+    ), parametros).all()
+    
+    resultados = [{
+        'origem': BUSCA_ORIGENS[rowid % 3],
+        'id': rowid // 3,
+        'personagem_id': personagem_id,
+        'titulo': destacar(marcar_termos(titulo, termos)),
+        'trecho': destacar(marcar_termos(conteudo, termos, palavras=24)),
+    } for rowid, personagem_id, titulo, conteudo in linhas]
+    
+    return resultados, total
+
+
+def marcar_termos(texto, termos, palavras=None):
+    """
+    highlight()/snippet() do FTS5 para o PostgreSQL, em Python e só nas linhas da
+    página: marca com \x02/\x03 as palavras que começam por algum dos termos
+    (comparadas sem acento e sem maiúsculas). Com palavras, devolve só um trecho
+    desse tamanho a partir de perto da primeira ocorrência, com "…" nas pontas.
+    """
+    partes = re.split(r'(\w+)', (texto or '')[:BUSCA_PG_MAX_CARACTERES])
+    posicoes = range(1, len(partes), 2)  # as palavras ficam nas posições ímpares
+    if palavras is not None:
+        normalizadas = {}
+        primeira = next((
+            indice for indice, posicao in enumerate(posicoes)
+            if normalizadas.setdefault(partes[posicao], normalizar_busca(partes[posicao])).startswith(termos)
+        ), 0)
+        inicio = max(primeira - palavras // 4, 0)
+        fim = min(inicio + palavras, len(posicoes))
+        if inicio >= fim:
+            return ''
+        trecho = partes[posicoes[inicio]:posicoes[fim - 1] + 1]
+        return ('…' if inicio > 0 else '') + marcar_termos(''.join(trecho), termos) + ('…' if fim < len(posicoes) else '')
+    for posicao in posicoes:
+        if normalizar_busca(partes[posicao]).startswith(termos):
+            partes[posicao] = f'\x02{partes[posicao]}\x03'
+    return ''.join(partes)
+
+
+def buscar_textos_sem_fts(usuario_id, termo, pagina, por_pagina):
+    # Alternativa para bancos sem FTS5 nem tsvector: só personagens, sem ranking
+    padrao = '%' + re.sub(r'([\\%_])', r'\\\1', termo) + '%'
+    query = Personagem.query.filter(Personagem.usuario_id == usuario_id, db.or_(
+        Personagem.nome.ilike(padrao, escape='\\'),
+        Personagem.descricao.ilike(padrao, escape='\\'),
+        Personagem.tags.any(Tag.nome.ilike(padrao, escape='\\'))
+    ))
+    total = query.count()
+    personagens = query.order_by(Personagem.data_atualizacao.desc())\
+        .limit(por_pagina).offset((pagina - 1) * por_pagina).all()
+    
+    resultados = [{
+        'origem': 'personagem',
+        'id': personagem.id,
+        'personagem_id': personagem.id,
+        'titulo': str(escape(personagem.nome)),
+        'trecho': str(escape((personagem.descricao or '')[:150])),
+    } for personagem in personagens]
+    
+    return resultados, total
+
+
+# =============================================
+# AUTOCOMPLETAR (índice de prefixos em memória)
+# =============================================
+
+def normalizar_busca(texto):
+    # "Vilão" -> "vilao": remove acentos e ignora maiúsculas
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold().strip()
+
+
+class IndicePrefixos:
+    """
+    Índice de prefixos por usuário: uma lista ordenada de chaves normalizadas
+    consultada com bisect. Cada nome entra uma vez por palavra, para que
+    "grim" encontre "Vilão Grimório". É montado na primeira consulta do usuário
+    e atualizado pelas rotas que criam, editam ou excluem personagens.
+    As consultas da montagem rodam fora do lock; como no menu lateral, um
+    contador de versão por usuário impede guardar um índice montado antes de
+    uma escrita que ele não viu.
+    """
+
+    def __init__(self, max_usuarios, ttl):
+        self.max_usuarios = max_usuarios
+        self.ttl = ttl
+        self._usuarios = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def sugerir(self, usuario_id, prefixo, limite=8):
+        prefixo = normalizar_busca(prefixo)
+        if not prefixo:
+            return []
+        
+        with self._lock:
+            indice = self._em_cache(usuario_id)
+            versao = self._versoes.get(usuario_id, 0)
+        if indice is None:
+            indice = self._montar(usuario_id)
+            with self._lock:
+                self._guardar(usuario_id, indice, versao)
+        
+        with self._lock:
+            chaves = indice['chaves']
+            posicao = bisect.bisect_left(chaves, (prefixo,))
+            sugestoes = []
+            vistos = set()
+            while posicao < len(chaves) and len(sugestoes) < limite:
+                chave, tipo, referencia, rotulo = chaves[posicao]
+                if not chave.startswith(prefixo):
+                    break
+                if (tipo, referencia) not in vistos:
+                    vistos.add((tipo, referencia))
+                    sugestoes.append({'tipo': tipo, 'referencia': referencia, 'texto': rotulo})
+                posicao += 1
+            return sugestoes
+
+    def adicionar(self, usuario_id, personagem_id, nome, tags):
+        with self._lock:
+            indice = self._alterar(usuario_id)
+            if indice is not None:
+                self._inserir(indice, personagem_id, nome, tags)
+
+    def remover(self, usuario_id, personagem_id):
+        with self._lock:
+            indice = self._alterar(usuario_id)
+            if indice is not None:
+                self._retirar(indice, personagem_id)
+
+    def atualizar(self, usuario_id, personagem_id, nome, tags):
+        with self._lock:
+            indice = self._alterar(usuario_id)
+            if indice is not None:
+                self._retirar(indice, personagem_id)
+                self._inserir(indice, personagem_id, nome, tags)
+
+    def _alterar(self, usuario_id):
+        # Uma montagem em andamento já pode ter lido o banco de antes desta escrita
+        self._versoes[usuario_id] = self._versoes.get(usuario_id, 0) + 1
+        return self._usuarios.get(usuario_id)
+
+    def _em_cache(self, usuario_id):
+        indice = self._usuarios.get(usuario_id)
+        if indice is None or time.monotonic() - indice['criado_em'] >= self.ttl:
+            contar_cache('autocompletar', 'falha')
+            return None
+        contar_cache('autocompletar', 'acerto')
+        self._usuarios.move_to_end(usuario_id)
+        return indice
+
+    def _guardar(self, usuario_id, indice, versao):
+        # Montado antes de uma escrita: serve a esta consulta, mas não fica no cache
+        if versao != self._versoes.get(usuario_id, 0):
+            return
+        self._usuarios[usuario_id] = indice
+        self._usuarios.move_to_end(usuario_id)
+        while len(self._usuarios) > self.max_usuarios:
+            self._usuarios.popitem(last=False)
+
+    def _montar(self, usuario_id):
+        indice = {'chaves': [], 'personagens': {}, 'tags': {}, 'criado_em': time.monotonic()}
+        tags_por_personagem = {}
+        for personagem_id, tag in tags_dos_personagens(usuario_id):
+            tags_por_personagem.setdefault(personagem_id, []).append(tag)
+        linhas = db.session.query(Personagem.id, Personagem.nome).filter_by(usuario_id=usuario_id).all()
+        for personagem_id, nome in linhas:
+            tags = tags_por_personagem.get(personagem_id, [])
+            indice['chaves'].extend(self._chaves_personagem(personagem_id, nome))
+            indice['personagens'][personagem_id] = (nome, tags)
+            for tag in tags:
+                chave = self._chave_tag(tag)
+                indice['tags'][chave] = indice['tags'].get(chave, 0) + 1
+        indice['chaves'].extend(indice['tags'])
+        indice['chaves'].sort()
+        return indice
+
+    def _chaves_personagem(self, personagem_id, nome):
+        palavras = normalizar_busca(nome).split()
+        return {(' '.join(palavras[i:]), 'personagem', personagem_id, nome) for i in range(len(palavras))}
+
+    def _chave_tag(self, tag):
+        return (normalizar_busca(tag), 'tag', normalizar_busca(tag), tag)
+
+    def _contar_tag(self, indice, tag, delta):
+        chave = self._chave_tag(tag)
+        quantidade = indice['tags'].get(chave, 0) + delta
+        if quantidade > 0:
+            if chave not in indice['tags']:
+                bisect.insort(indice['chaves'], chave)
+            indice['tags'][chave] = quantidade
+        elif chave in indice['tags']:
+            del indice['tags'][chave]
+            self._descartar(indice, chave)
+
+    def _inserir(self, indice, personagem_id, nome, tags):
+        for chave in self._chaves_personagem(personagem_id, nome):
+            bisect.insort(indice['chaves'], chave)
+        indice['personagens'][personagem_id] = (nome, tags)
+        for tag in tags:
+            self._contar_tag(indice, tag, 1)
+
+    def _retirar(self, indice, personagem_id):
+        anterior = indice['personagens'].pop(personagem_id, None)
+        if anterior is None:
+            return
+        nome, tags = anterior
+        for chave in self._chaves_personagem(personagem_id, nome):
+            self._descartar(indice, chave)
+        for tag in tags:
+            self._contar_tag(indice, tag, -1)
+
+    def _descartar(self, indice, chave):
+        chaves = indice['chaves']
+        posicao = bisect.bisect_left(chaves, chave)
+        if posicao < len(chaves) and chaves[posicao] == chave:
+            del chaves[posicao]
+
+
+indice_autocompletar = IndicePrefixos(
+    app.config['AUTOCOMPLETAR_MAX_USUARIOS'],
+    app.config['AUTOCOMPLETAR_TTL']
+)
+
+
+# =============================================
+# ARQUIVOS ESTÁTICOS (CSS/JS com hash no nome)
+# =============================================
+
+def nome_com_hash(relativo, conteudo):
+    # "css/grimorio.css" -> "css/grimorio.<hash>.css" pelo conteúdo do arquivo
+    digest = hashlib.sha256(conteudo).hexdigest()[:12]
+    base, extensao = os.path.splitext(relativo)
+    return f'{base}.{digest}{extensao}'
+
+
+def gerar_manifesto_assets(pasta):
+    manifesto = {}
+    for raiz, _, arquivos in os.walk(pasta):
+        for arquivo in arquivos:
+            caminho = os.path.join(raiz, arquivo)
+            relativo = os.path.relpath(caminho, pasta).replace(os.sep, '/')
+            if relativo.endswith(('.gz', '.br')):
+                continue
+            with open(caminho, 'rb') as conteudo:
+                manifesto[relativo] = nome_com_hash(relativo, conteudo.read())
+    return manifesto
+
+
+MANIFESTO_ASSETS = gerar_manifesto_assets(app.static_folder)
+ASSETS_POR_HASH = {hash_nome: nome for nome, hash_nome in MANIFESTO_ASSETS.items()}
+
+
+def asset_url(nome):
+    return f'/assets/{MANIFESTO_ASSETS[nome]}'
+
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+
+@app.route('/assets/<path:arquivo>')
+def assets(arquivo):
+    # O nome muda sempre que o conteúdo muda, então o navegador pode guardar para sempre
+    nome = ASSETS_POR_HASH.get(arquivo)
+    imutavel = nome is not None
+    if nome is None and arquivo.startswith('vendor/') and arquivo in MANIFESTO_ASSETS:
+        # Caminho sem hash (CSS gerado por uma versão antiga de vendorizar-assets): o
+        # conteúdo muda quando o comando roda de novo, então o navegador revalida
+        nome = arquivo
+    if nome is None:
+        abort(404)
+    
+    codificacao = None
+    if nome.endswith(EXTENSOES_COMPRIMIVEIS):
+        codificacao = codificacao_aceita(codificacoes_disponiveis())
+    
+    corpo = None
+    if codificacao and arquivo + EXTENSOES_CODIFICACAO[codificacao] not in VARIANTES_COMPRIMIDAS:
+        corpo = variante_em_memoria(nome, codificacao)
+        if corpo is None:
+            codificacao = None
+    
+    if corpo is not None:
+        resposta = app.response_class(corpo, mimetype=mimetypes.guess_type(nome)[0])
+        resposta.set_etag(f'{MANIFESTO_ASSETS[nome]}-{codificacao}')
+        resposta.make_conditional(request)
+    elif codificacao:
+        resposta = send_from_directory(app.static_folder, arquivo + EXTENSOES_CODIFICACAO[codificacao],
+                                       mimetype=mimetypes.guess_type(nome)[0], max_age=app.config['ASSETS_MAX_AGE'])
+    else:
+        resposta = send_from_directory(app.static_folder, nome, max_age=app.config['ASSETS_MAX_AGE'])
+    if codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    resposta.vary.add('Accept-Encoding')
+    if imutavel:
+        resposta.headers['Cache-Control'] = f"public, max-age={app.config['ASSETS_MAX_AGE']}, immutable"
+    else:
+        resposta.headers['Cache-Control'] = 'public, no-cache'
+    return resposta
+
+
+# =============================================
+# COMPRESSÃO DAS RESPOSTAS (gzip / brotli)
+# =============================================
+
+# Tipos que valem a pena comprimir; imagens e fontes woff2 já vêm comprimidas
+TIPOS_COMPRIMIVEIS = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml',
+}
+EXTENSOES_COMPRIMIVEIS = ('.css', '.js', '.json', '.svg', '.txt', '.html')
+EXTENSOES_CODIFICACAO = {'br': '.br', 'gzip': '.gz'}
+
+
+def codificacoes_disponiveis():
+    # Ordem de preferência do servidor quando o cliente aceita as duas com o mesmo peso
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def codificacao_aceita(opcoes):
+    if not opcoes:
+        return None
+    return request.accept_encodings.best_match(opcoes)
+
+
+def comprimir(corpo, codificacao, nivel):
+    if codificacao == 'br':
+        return brotli.compress(corpo, quality=nivel)
+    return gzip.compress(corpo, compresslevel=nivel, mtime=0)
+
+
+def listar_variantes_comprimidas(pasta):
+    variantes = set()
+    for raiz, _, arquivos in os.walk(pasta):
+        for arquivo in arquivos:
+            if arquivo.endswith(tuple(EXTENSOES_CODIFICACAO.values())):
+                variantes.add(os.path.relpath(os.path.join(raiz, arquivo), pasta).replace(os.sep, '/'))
+    return variantes
+
+
+# Variantes .gz/.br gravadas com o nome com hash (flask comprimir-assets); nunca ficam desatualizadas
+VARIANTES_COMPRIMIDAS = listar_variantes_comprimidas(app.static_folder)
+
+# Nível máximo: cada asset é comprimido uma vez só, no deploy ou no primeiro acesso
+NIVEIS_ASSETS = {'gzip': 9, 'br': 11}
+
+# Sem as variantes em disco (o comando não rodou no build; no Heroku o release roda
+# em outro dyno e não altera o slug), cada worker comprime o asset no primeiro
+# pedido e guarda o resultado. São poucos arquivos e o nome com hash não muda
+_variantes_em_memoria = {}
+_variantes_lock = threading.Lock()
+
+
+def variante_em_memoria(nome, codificacao):
+    """Corpo comprimido do asset, ou None se a compressão não reduz o tamanho."""
+    chave = (nome, codificacao)
+    if chave not in _variantes_em_memoria:
+        with _variantes_lock:
+            if chave not in _variantes_em_memoria:
+                with open(os.path.join(app.static_folder, nome), 'rb') as arquivo:
+                    corpo = arquivo.read()
+                comprimido = comprimir(corpo, codificacao, NIVEIS_ASSETS[codificacao])
+                _variantes_em_memoria[chave] = comprimido if len(comprimido) < len(corpo) else None
+    return _variantes_em_memoria[chave]
+
+
+@app.cli.command('comprimir-assets')
+def comprimir_assets():
+    """Grava variantes .gz/.br dos assets com hash, no nível máximo, e remove as antigas."""
+    validas = set()
+    for nome, hash_nome in sorted(MANIFESTO_ASSETS.items()):
+        if not nome.endswith(EXTENSOES_COMPRIMIVEIS):
+            continue
+        with open(os.path.join(app.static_folder, nome), 'rb') as arquivo:
+            corpo = arquivo.read()
+        
+        tamanhos = []
+        for codificacao, nivel in NIVEIS_ASSETS.items():
+            if codificacao not in codificacoes_disponiveis():
+                continue
+            comprimido = comprimir(corpo, codificacao, nivel)
+            if len(comprimido) >= len(corpo):
+                continue
+            variante = hash_nome + EXTENSOES_CODIFICACAO[codificacao]
+            with open(os.path.join(app.static_folder, variante), 'wb') as arquivo:
+                arquivo.write(comprimido)
+            validas.add(variante)
+            tamanhos.append(f'{codificacao} {len(comprimido)}B')
+        print(f'✅ {hash_nome}: {len(corpo)}B -> {", ".join(tamanhos) or "sem ganho"}')
+    
+    for variante in listar_variantes_comprimidas(app.static_folder) - validas:
+        os.remove(os.path.join(app.static_folder, variante))
+        print(f'🗑️  {variante} (antiga)')
+    if brotli is None:
+        print('⚠️  Pacote brotli não instalado: só variantes .gz foram geradas')
+
+
+def comprimir_stream(partes, original, codificacao, nivel):
+    # Cada parte é comprimida e descarregada na hora (sync flush), para o
+    # navegador continuar recebendo o HTML aos pedaços
+    try:
+        if codificacao == 'br':
+            compressor = brotli.Compressor(quality=nivel)
+            for parte in partes:
+                yield compressor.process(parte) + compressor.flush()
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+            for parte in partes:
+                yield compressor.compress(parte) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+    finally:
+        if hasattr(original, 'close'):
+            original.close()
+
+
+@app.after_request
+def comprimir_resposta(resposta):
+    # Arquivos (send_file) passam direto; os assets usam as variantes em disco
+    if (resposta.status_code != 200 or resposta.direct_passthrough
+            or 'Content-Encoding' in resposta.headers
+            or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+        return resposta
+    
+    resposta.vary.add('Accept-Encoding')
+    if not resposta.is_streamed and len(resposta.get_data()) < app.config['COMPRESSAO_MIN_BYTES']:
+        return resposta
+    
+    codificacao = codificacao_aceita(codificacoes_disponiveis())
+    if codificacao is None:
+        return resposta
+    
+    nivel = app.config['COMPRESSAO_NIVEL_BROTLI' if codificacao == 'br' else 'COMPRESSAO_NIVEL_GZIP']
+    if resposta.is_streamed:
+        resposta.response = comprimir_stream(resposta.iter_encoded(), resposta.response, codificacao, nivel)
+        resposta.headers.pop('Content-Length', None)
+    else:
+        resposta.set_data(comprimir(resposta.get_data(), codificacao, nivel))
+    resposta.headers['Content-Encoding'] = codificacao
+    
+    # O corpo mudou de representação: o ETag forte vira fraco, como faz o nginx
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+    return resposta
+
+
+# =============================================
+# DEPENDÊNCIAS DE FRONT-END VENDORIZADAS
+# =============================================
+
+# Versões fixadas no nome da pasta. O conteúdo ainda pode mudar (o subconjunto do
+# Font Awesome depende dos ícones usados), então tudo é servido pelo nome com hash
+# e os CSS gerados apontam para as fontes também pelo nome com hash
+VENDOR_BOOTSTRAP = 'vendor/bootstrap-5.1.3'
+VENDOR_FONTAWESOME = 'vendor/fontawesome-6.0.0'
+VENDOR_FONTES = 'vendor/fontes'
+
+VENDOR_DOWNLOADS = {
+    f'{VENDOR_BOOTSTRAP}/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+    f'{VENDOR_BOOTSTRAP}/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+    f'{VENDOR_FONTAWESOME}/webfonts/fa-solid-900.woff2': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-solid-900.woff2',
+}
+FONTAWESOME_CSS_URL = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
+GOOGLE_FONTS_CSS_URL = 'https://fonts.googleapis.com/css2?family=Cinzel:wght@400;600;700&family=Inter:wght@300;400;500;600&display=swap'
+# Só baixamos os subconjuntos usados pelo português
+SUBCONJUNTOS_FONTES = ('latin', 'latin-ext')
+
+VENDOR_CSS = [
+    f'{VENDOR_BOOTSTRAP}/bootstrap.min.css',
+    f'{VENDOR_FONTAWESOME}/fontawesome.css',
+    f'{VENDOR_FONTES}/fontes.css',
+]
+VENDOR_JS = [f'{VENDOR_BOOTSTRAP}/bootstrap.bundle.min.js']
+
+# Modificadores do Font Awesome que não são ícones
+FONTAWESOME_MODIFICADORES = {'fa-2x', 'fa-3x', 'fa-solid'}
+
+FONTAWESOME_BASE_CSS = '''@font-face{font-family:"Font Awesome 6 Free";font-style:normal;font-weight:900;font-display:block;src:url(%(fonte)s) format("woff2")}
+.fa,.fas,.fa-solid{font-family:"Font Awesome 6 Free";font-weight:900;-moz-osx-font-smoothing:grayscale;-webkit-font-smoothing:antialiased;display:inline-block;font-style:normal;font-variant:normal;line-height:1;text-rendering:auto}
+.fa-2x{font-size:2em}.fa-3x{font-size:3em}
+'''
+
+
+def icones_usados():
+    # Ícones referenciados no app e no JS (os nomes sempre aparecem completos, "fa-...")
+    fontes = [os.path.abspath(__file__)]
+    pasta_js = os.path.join(app.static_folder, 'js')
+    fontes += [os.path.join(pasta_js, arquivo) for arquivo in os.listdir(pasta_js) if arquivo.endswith('.js')]
+    
+    icones = set()
+    for caminho in fontes:
+        with open(caminho, encoding='utf-8') as arquivo:
+            icones.update(re.findall(r'\bfa-[a-z0-9]+(?:-[a-z0-9]+)*', arquivo.read()))
+    return icones - FONTAWESOME_MODIFICADORES
+
+
+def subconjunto_fontawesome(css_completo, icones):
+    # Extrai do all.min.css só as regras ".fa-xxx:before{content:...}" dos ícones usados.
+    # Retorna o CSS sem a URL da fonte (%(fonte)s), que só é conhecida depois do subset
+    regras = []
+    codigos = set()
+    for seletores, conteudo in re.findall(r'([^{}]+)\{content:"(\\[0-9a-fA-F]+)"\}', css_completo):
+        nomes = [s.strip()[1:-len(':before')] for s in seletores.split(',') if s.strip().endswith(':before')]
+        usados = [nome for nome in nomes if nome in icones]
+        if usados:
+            regras.append(','.join(f'.{nome}:before' for nome in usados) + f'{{content:"{conteudo}"}}')
+            codigos.add(int(conteudo[1:], 16))
+    return FONTAWESOME_BASE_CSS + '\n'.join(regras) + '\n', codigos
+
+
+def reduzir_fonte(caminho, codigos):
+    # Remove da fonte os glifos não usados; fontTools e brotli são opcionais
+    try:
+        from fontTools import subset
+        import brotli  # noqa: F401 - necessário para gravar woff2
+    except ImportError:
+        return False
+    
+    opcoes = subset.Options()
+    opcoes.flavor = 'woff2'
+    fonte = subset.load_font(caminho, opcoes)
+    subsetter = subset.Subsetter(opcoes)
+    subsetter.populate(unicodes=codigos)
+    subsetter.subset(fonte)
+    subset.save_font(fonte, caminho, opcoes)
+    return True
+
+
+def baixar(url):
+    import urllib.request
+    # O Google Fonts só entrega woff2 para navegadores que ele reconhece
+    pedido = urllib.request.Request(url, headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+    })
+    with urllib.request.urlopen(pedido, timeout=30) as resposta:
+        return resposta.read()
+
+
+def gravar_vendor(nome, conteudo):
+    caminho = os.path.join(app.static_folder, *nome.split('/'))
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    return caminho
+
+
+def vendorizar_fontes():
+    # Reescreve o CSS do Google Fonts apontando para cópias locais "familia-versao-subconjunto.woff2"
+    css = baixar(GOOGLE_FONTS_CSS_URL).decode('utf-8')
+    blocos = []
+    baixadas = {}
+    for subconjunto, bloco in re.findall(r'/\* ([a-z-]+) \*/\s*(@font-face\s*\{[^}]*\})', css):
+        if subconjunto not in SUBCONJUNTOS_FONTES:
+            continue
+        url = re.search(r'url\((https://fonts\.gstatic\.com/s/([a-z0-9]+)/(v\d+)/[^)]+\.woff2)\)', bloco)
+        if url is None:
+            continue
+        endereco, familia, versao = url.groups()
+        arquivo = f'{familia}-{versao}-{subconjunto}.woff2'
+        if arquivo not in baixadas:
+            conteudo = baixar(endereco)
+            gravar_vendor(f'{VENDOR_FONTES}/{arquivo}', conteudo)
+            baixadas[arquivo] = nome_com_hash(arquivo, conteudo)
+        # O CSS fica em VENDOR_FONTES: a URL relativa é só o nome, com hash
+        blocos.append(f'/* {subconjunto} */\n' + bloco.replace(endereco, os.path.basename(baixadas[arquivo])))
+    
+    gravar_vendor(f'{VENDOR_FONTES}/fontes.css', ('\n'.join(blocos) + '\n').encode('utf-8'))
+    return list(baixadas)
+
+
+@app.cli.command('vendorizar-assets')
+def vendorizar_assets():
+    """Baixa Bootstrap, Font Awesome (só os ícones usados) e as fontes para static/vendor."""
+    for nome, url in VENDOR_DOWNLOADS.items():
+        gravar_vendor(nome, baixar(url))
+        print(f'✅ {nome}')
+    
+    icones = icones_usados()
+    css_fontawesome, codigos = subconjunto_fontawesome(baixar(FONTAWESOME_CSS_URL).decode('utf-8'), icones)
+    
+    fonte_icones = os.path.join(app.static_folder, *VENDOR_FONTAWESOME.split('/'), 'webfonts', 'fa-solid-900.woff2')
+    if reduzir_fonte(fonte_icones, codigos):
+        print(f'✅ fa-solid-900.woff2 reduzida para {os.path.getsize(fonte_icones) // 1024} KiB')
+    else:
+        print('⚠️  fontTools/brotli não instalados: fa-solid-900.woff2 mantida completa')
+    
+    # Um novo ícone muda a fonte, e com ela a URL: o navegador não fica com o subconjunto antigo
+    with open(fonte_icones, 'rb') as arquivo:
+        url_fonte = nome_com_hash('webfonts/fa-solid-900.woff2', arquivo.read())
+    css_fontawesome = css_fontawesome.replace('%(fonte)s', url_fonte)
+    gravar_vendor(f'{VENDOR_FONTAWESOME}/fontawesome.css', css_fontawesome.encode('utf-8'))
+    print(f'✅ {VENDOR_FONTAWESOME}/fontawesome.css ({len(codigos)} de {len(icones)} ícones encontrados)')
+    
+    for arquivo in vendorizar_fontes():
+        print(f'✅ {VENDOR_FONTES}/{arquivo}')
+    print('Defina ASSETS_VENDORIZADOS=1 e reinicie o app para usar as cópias locais.')
+
+
+def fontes_preload():
+    fontes = [nome for nome in MANIFESTO_ASSETS
+              if nome.startswith(VENDOR_FONTES + '/') and nome.endswith('-latin.woff2')]
+    return sorted(fontes) + [f'{VENDOR_FONTAWESOME}/webfonts/fa-solid-900.woff2']
+
+
+def usar_assets_vendorizados():
+    if not app.config['ASSETS_VENDORIZADOS']:
+        return False
+    faltando = [nome for nome in VENDOR_CSS + VENDOR_JS + fontes_preload() if nome not in MANIFESTO_ASSETS]
+    if faltando:
+        app.logger.warning('ASSETS_VENDORIZADOS ativo, mas faltam arquivos (rode "flask vendorizar-assets"): %s; usando CDNs',
+                           ', '.join(faltando))
+        return False
+    return True
+
+
+ASSETS_VENDORIZADOS = usar_assets_vendorizados()
+
+app.jinja_env.globals.update(
+    vendorizado=ASSETS_VENDORIZADOS,
+    vendor_css=VENDOR_CSS,
+    vendor_js=VENDOR_JS,
+    fontes_preload=fontes_preload() if ASSETS_VENDORIZADOS else [],
+)
+
+
+# =============================================
+# TEMPLATES HTML - DESIGN MODERNO
+# =============================================
+
+BASE_TEMPLATE = '''<!DOCTYPE html>
+<html lang="pt-br">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Grimório Berserk - Sistema de Personagens</title>
+{% if vendorizado %}
+    {% for fonte in fontes_preload %}
+    <link rel="preload" href="{{ asset_url(fonte) }}" as="font" type="font/woff2" crossorigin>
+    {% endfor %}
+    {% for css in vendor_css %}
+    <link href="{{ asset_url(css) }}" rel="stylesheet">
+    {% endfor %}
+{% else %}
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
+    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
+    <link href="https://fonts.googleapis.com/css2?family=Cinzel:wght@400;600;700&family=Inter:wght@300;400;500;600&display=swap" rel="stylesheet">
+{% endif %}
+    <link href="{{ asset_url('css/grimorio.css') }}" rel="stylesheet">
+</head>
+<body>
+    {{ navbar|safe }}
+    
+    <main class="container-main fade-in">
+        {{ content|safe }}
+    </main>
+    
+    {{ sidebar|safe }}
+    
+{% if vendorizado %}
+    {% for js in vendor_js %}
+    <script src="{{ asset_url(js) }}"></script>
+    {% endfor %}
+{% else %}
+    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
+{% endif %}
+    <script src="{{ asset_url('js/grimorio.js') }}"></script>
 </body>
 </html>'''
 
@@ -2136,80 +2456,6 @@ LOGIN_TEMPLATE = '''
         </div>
     </div>
 </div>
-
-<style>
-.auth-container {
-    min-height: 100vh;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    background: var(--primary-dark);
-    padding: var(--spacing-lg);
-}
-
-.auth-card {
-    background: var(--secondary-dark);
-    border: 1px solid var(--border-color);
-    border-radius: var(--radius-xl);
-    padding: var(--spacing-xxl);
-    width: 100%;
-    max-width: 400px;
-    box-shadow: var(--shadow-lg);
-}
-
-.auth-header {
-    text-align: center;
-    margin-bottom: var(--spacing-xl);
-}
-
-.auth-logo {
-    width: 80px;
-    height: 80px;
-    background: var(--gradient-blood);
-    border-radius: var(--radius-lg);
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    margin: 0 auto var(--spacing-lg);
-    color: white;
-    font-size: 2rem;
-}
-
-.auth-header h1 {
-    font-size: 2rem;
-    margin-bottom: var(--spacing-sm);
-    color: var(--blood-red);
-}
-
-.auth-subtitle {
-    color: var(--text-muted);
-    font-size: 0.875rem;
-}
-
-.auth-body {
-    margin-top: var(--spacing-xl);
-}
-
-.auth-divider {
-    display: flex;
-    align-items: center;
-    margin: var(--spacing-lg) 0;
-    color: var(--text-muted);
-}
-
-.auth-divider::before,
-.auth-divider::after {
-    content: '';
-    flex: 1;
-    height: 1px;
-    background: var(--border-color);
-}
-
-.auth-divider span {
-    padding: 0 var(--spacing-md);
-    font-size: 0.875rem;
-}
-</style>
 '''
 
 CADASTRO_TEMPLATE = '''
@@ -2277,6 +2523,247 @@ CADASTRO_TEMPLATE = '''
 </div>
 '''
 
+# O template base é compilado uma única vez. Conteúdo, navbar e menu lateral
+# entram como variáveis, então o HTML gerado não é reinterpretado pelo Jinja
+PAGINA_BASE = app.jinja_env.from_string(BASE_TEMPLATE)
+
+
+@cronometrar('template')
+def renderizar_pagina(content, navbar='', sidebar=''):
+    return PAGINA_BASE.render(content=content, navbar=navbar, sidebar=sidebar)
+
+
+MARCADOR_CONTEUDO = '<!-- conteudo-em-stream -->'
+
+
+def renderizar_pagina_em_stream(inicio, partes, fim='', navbar='', sidebar=''):
+    """
+    Resposta em stream: o topo da página (head, navbar e o começo do conteúdo)
+    sai na hora e cada item de "partes" é enviado assim que fica pronto.
+    """
+    topo, rodape = renderizar_pagina(MARCADOR_CONTEUDO, navbar=navbar, sidebar=sidebar).split(MARCADOR_CONTEUDO)
+    
+    def gerar():
+        yield topo + inicio
+        for parte in partes:
+            yield parte
+        yield fim + rodape
+    
+    return app.response_class(stream_with_context(gerar()), mimetype='text/html')
+
+
+# =============================================
+# GET CONDICIONAL (ETag / Last-Modified)
+# =============================================
+
+def calcular_versao_app():
+    # Muda a cada deploy: código das páginas, assets com hash e modo vendorizado
+    digest = hashlib.sha256()
+    with open(os.path.abspath(__file__), 'rb') as arquivo:
+        digest.update(arquivo.read())
+    digest.update(json.dumps(MANIFESTO_ASSETS, sort_keys=True).encode('utf-8'))
+    digest.update(str(ASSETS_VENDORIZADOS).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+VERSAO_APP = calcular_versao_app()
+
+
+def condicional(view):
+    """
+    Responde 304 antes de renderizar quando o navegador já tem a versão atual
+    da página. Só vale para usuários logados e sem mensagens flash pendentes.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'usuario_id' not in session or session.get('_flashes'):
+            return view(*args, **kwargs)
+        
+        # Uma leitura pela chave primária: a versão cobre as escritas e o corte
+        # dos atrasados cobre o que muda só com o tempo
+        estatisticas = estatisticas_atuais(session['usuario_id'])
+        etag = hashlib.sha256(repr((
+            VERSAO_APP, request.full_path, session['usuario_id'], session.get('usuario_nome'),
+            chave_conteudo(estatisticas)
+        )).encode('utf-8')).hexdigest()[:32]
+        ultima_modificacao = estatisticas.atualizado_em
+        
+        # Comparação fraca: a compressão transforma o ETag em W/"..."
+        if request.if_none_match.contains_weak(etag):
+            resposta = app.response_class(status=304)
+        else:
+            resposta = app.make_response(view(*args, **kwargs))
+            if resposta.status_code != 200:
+                return resposta
+        
+        resposta.set_etag(etag)
+        if ultima_modificacao:
+            resposta.last_modified = ultima_modificacao
+        # Conteúdo por usuário: o navegador guarda, mas sempre revalida
+        resposta.headers['Cache-Control'] = 'private, no-cache'
+        return resposta
+    return wrapper
+
+
+# =============================================
+# PROFILING SOB DEMANDA (?__profile=1)
+# =============================================
+
+class AmostradorPilhas:
+    """
+    Profiler por amostragem: outra thread lê a pilha da thread da requisição
+    em intervalos fixos e conta cada pilha (formato "collapsed stacks" do
+    flamegraph.pl / speedscope).
+    A thread amostradora só roda quando pega o GIL, e uma thread ocupada com
+    CPU só o solta a cada sys.getswitchinterval() (5 ms por padrão): esse é o
+    piso do intervalo real. Enquanto há amostrador ativo o switch interval
+    do processo desce para o intervalo pedido; abaixo de ~1 ms o custo de
+    percorrer as pilhas passa a pesar na própria requisição.
+    """
+
+    _ativos = 0
+    _switch_original = None
+    _lock_switch = threading.Lock()
+
+    def __init__(self, intervalo=0.001):
+        self.intervalo = intervalo
+        self.contagens = {}
+        self.amostras = 0
+        self._thread_alvo = threading.get_ident()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def iniciar(self):
+        cls = AmostradorPilhas
+        with cls._lock_switch:
+            if cls._ativos == 0:
+                cls._switch_original = sys.getswitchinterval()
+            cls._ativos += 1
+            sys.setswitchinterval(min(sys.getswitchinterval(), self.intervalo))
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+        cls = AmostradorPilhas
+        with cls._lock_switch:
+            cls._ativos -= 1
+            if cls._ativos == 0:
+                sys.setswitchinterval(cls._switch_original)
+
+    def _amostrar(self):
+        # Agenda fixa: o atraso para pegar o GIL numa amostra não empurra as seguintes
+        proxima = time.perf_counter() + self.intervalo
+        while not self._parar.wait(max(0, proxima - time.perf_counter())):
+            proxima = max(proxima + self.intervalo, time.perf_counter())
+            frame = sys._current_frames().get(self._thread_alvo)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})')
+                frame = frame.f_back
+            if pilha:
+                self.amostras += 1
+                chave = ';'.join(reversed(pilha))
+                self.contagens[chave] = self.contagens.get(chave, 0) + 1
+
+    def relatorio(self):
+        return ''.join(f'{pilha} {vezes}\n' for pilha, vezes in sorted(self.contagens.items()))
+
+
+lock_cprofile = threading.Lock()
+
+
+def pode_perfilar():
+    if not app.config['PROFILER_ATIVO'] or 'usuario_id' not in session:
+        return False
+    usuario = Usuario.query.get(session['usuario_id'])
+    return usuario is not None and usuario.email in app.config['PROFILER_ADMINS']
+
+
+@app.before_request
+def iniciar_profiler():
+    modo = request.args.get('__profile')
+    if not modo or not pode_perfilar():
+        return
+    
+    # __profile=1 usa o cProfile; __profile=flamegraph amostra pilhas
+    if modo == 'flamegraph':
+        profiler = AmostradorPilhas(app.config['PROFILER_INTERVALO_MS'] / 1000)
+        profiler.iniciar()
+    else:
+        # Desde o Python 3.12 o cProfile usa sys.monitoring, que aceita um profiler
+        # por processo: um segundo enable() falharia com "Another profiling tool is
+        # already active"
+        if not lock_cprofile.acquire(blocking=False):
+            return app.response_class(
+                'Outra requisição com ?__profile está usando o cProfile neste processo; '
+                'tente de novo quando ela terminar (ou use ?__profile=flamegraph).\n',
+                status=409, mimetype='text/plain'
+            )
+        profiler = cProfile.Profile()
+        profiler.enable()
+    request.environ['grimorio.profiler'] = (modo, profiler, time.perf_counter())
+
+
+def encerrar_profiler(modo, profiler):
+    if modo == 'flamegraph':
+        profiler.parar()
+    else:
+        profiler.disable()
+        lock_cprofile.release()
+
+
+@app.after_request
+def finalizar_profiler(resposta):
+    # Registrado depois dos outros hooks, roda logo após a view
+    perfil = request.environ.get('grimorio.profiler')
+    if perfil is None:
+        return resposta
+    
+    modo, profiler, inicio = perfil
+    if resposta.is_streamed:
+        resposta.get_data()  # gera o corpo em stream ainda sob o profiler
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    
+    del request.environ['grimorio.profiler']
+    encerrar_profiler(modo, profiler)
+    if modo == 'flamegraph':
+        relatorio = profiler.relatorio()
+        extensao = 'collapsed'
+    else:
+        saida = io.StringIO()
+        pstats.Stats(profiler, stream=saida).sort_stats('cumulative').print_stats(80)
+        relatorio = saida.getvalue()
+        extensao = 'txt'
+    
+    cabecalho = f'# {request.method} {request.full_path} -> {resposta.status_code} em {duracao_ms:.1f} ms\n'
+    if extensao == 'txt':
+        relatorio = cabecalho + relatorio
+    
+    if app.config['PROFILER_DIR']:
+        os.makedirs(app.config['PROFILER_DIR'], exist_ok=True)
+        nome = f"perfil-{request.endpoint}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}"
+        with open(os.path.join(app.config['PROFILER_DIR'], f'{nome}.{extensao}'), 'w', encoding='utf-8') as arquivo:
+            arquivo.write(relatorio)
+        if extensao == 'txt':
+            profiler.dump_stats(os.path.join(app.config['PROFILER_DIR'], f'{nome}.prof'))
+    
+    # A página é trocada pelo relatório; o collapsed fica sem cabeçalho para abrir direto no flamegraph
+    cabecalhos = {'X-Profile-Duracao-Ms': f'{duracao_ms:.1f}'}
+    if modo == 'flamegraph':
+        cabecalhos['X-Profile-Amostras'] = str(profiler.amostras)
+    return app.response_class(relatorio, mimetype='text/plain', headers=cabecalhos)
+
+
+@app.teardown_request
+def liberar_profiler(erro):
+    # A view levantou exceção antes do after_request: o profiler não pode ficar ligado
+    perfil = request.environ.pop('grimorio.profiler', None)
+    if perfil is not None:
+        encerrar_profiler(perfil[0], perfil[1])
+
+
 # =============================================
 # ROTAS PRINCIPAIS
 # =============================================
@@ -2305,11 +2792,7 @@ def login():
             flash('Credenciais inválidas! Verifique seu email e senha.', 'error')
     
     content = LOGIN_TEMPLATE.replace('{{ messages|safe }}', get_flashed_messages_html())
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', content)\
-                            .replace('{{ navbar|safe }}', '')\
-                            .replace('{{ sidebar|safe }}', '')
-    
-    return render_template_string(template)
+    return renderizar_pagina(content)
 
 
 @app.route('/cadastro', methods=['GET', 'POST'])
@@ -2335,20 +2818,19 @@ def cadastro():
         )
         
         db.session.add(usuario)
+        db.session.flush()
+        db.session.add(EstatisticasUsuario(usuario_id=usuario.id))
         db.session.commit()
         
         flash('Conta criada com sucesso! Agora você pode fazer login.', 'success')
         return redirect(url_for('login'))
     
     content = CADASTRO_TEMPLATE.replace('{{ messages|safe }}', get_flashed_messages_html())
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', content)\
-                            .replace('{{ navbar|safe }}', '')\
-                            .replace('{{ sidebar|safe }}', '')
-    
-    return render_template_string(template)
+    return renderizar_pagina(content)
 
 
 @app.route('/dashboard')
+@condicional
 def dashboard():
     if 'usuario_id' not in session:
         return redirect(url_for('login'))
@@ -2361,8 +2843,6 @@ def dashboard():
     
     personagens_html = ""
     for personagem in personagens_recentes:
-        objetivos_concluidos = sum(1 for obj in personagem.objetivos if obj.concluido)
-        objetivos_total = len(personagem.objetivos)
         
         personagens_html += f'''
         <div class="character-card slide-in">
@@ -2406,11 +2886,11 @@ def dashboard():
                 <div class="character-footer">
                     <div class="character-stats">
                         <div class="character-stat">
-                            <span class="stat-number">{len(personagem.objetivos)}</span>
+                            <span class="stat-number">{personagem.total_objetivos}</span>
                             <span class="stat-label">Objetivos</span>
                         </div>
                         <div class="character-stat">
-                            <span class="stat-number">{objetivos_concluidos}</span>
+                            <span class="stat-number">{personagem.objetivos_concluidos}</span>
                             <span class="stat-label">Concluídos</span>
                         </div>
                         <div class="character-stat">
@@ -2559,32 +3039,28 @@ def dashboard():
     </div>
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', dashboard_content)\
-                            .replace('{{ navbar|safe }}', create_navbar('dashboard'))\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(usuario.id, 'dashboard'))
-    
-    return render_template_string(template)
+    return renderizar_pagina(dashboard_content,
+                             navbar=create_navbar('dashboard'),
+                             sidebar=criar_menu_lateral(usuario.id, 'dashboard'))
 
 
 @app.route('/personagens')
+@condicional
 def listar_personagens():
     if 'usuario_id' not in session:
         return redirect(url_for('login'))
     
     usuario = Usuario.query.get(session['usuario_id'])
     tipo_filter = request.args.get('tipo', 'todos')
-    
-    query = Personagem.query.filter_by(usuario_id=usuario.id)
-    
-    if tipo_filter != 'todos':
-        query = query.filter_by(tipo=tipo_filter)
-    
-    personagens = query.order_by(Personagem.data_atualizacao.desc()).all()
+    tag_filter = request.args.get('tag', '').strip()
+    # "Ver todos": a biblioteca inteira em stream, em vez da primeira página
+    todos = request.args.get('todos') == '1'
     
     tipos = db.session.query(Personagem.tipo, db.func.count(Personagem.id)).filter_by(usuario_id=usuario.id).group_by(Personagem.tipo).all()
+    total_personagens = sum(quantidade for _, quantidade in tipos)
     
     filtro_html = '<div class="tags-cloud mb-4">'
-    filtro_html += f'<span class="tag {'active' if tipo_filter == 'todos' else ''}" onclick="window.location=\'/personagens?tipo=todos\'">Todos ({Personagem.query.filter_by(usuario_id=usuario.id).count()})</span>'
+    filtro_html += f'<span class="tag {'active' if tipo_filter == 'todos' else ''}" onclick="window.location=\'/personagens?tipo=todos\'">Todos ({total_personagens})</span>'
     
     for tipo, quantidade in tipos:
         active = 'active' if tipo_filter == tipo else ''
@@ -2592,75 +3068,20 @@ def listar_personagens():
     
     filtro_html += '</div>'
     
-    personagens_html = ""
-    for personagem in personagens:
-        objetivos_concluidos = sum(1 for obj in personagem.objetivos if obj.concluido)
-        objetivos_total = len(personagem.objetivos)
-        
-        personagens_html += f'''
-        <div class="character-card">
-            <div class="character-cover">
-                {'<img src="' + personagem.imagem_url + '">' if personagem.imagem_url else '<i class="fas fa-user-circle"></i>'}
-            </div>
-            <div class="character-body">
-                <div class="character-header">
-                    <h3 class="character-name">{personagem.nome}</h3>
-                    <div class="dropdown">
-                        <button class="btn btn-icon btn-secondary">
-                            <i class="fas fa-ellipsis-v"></i>
-                        </button>
-                        <div class="dropdown-menu">
-                            <a href="/detalhes_personagem/{personagem.id}" class="dropdown-item">
-                                <i class="fas fa-eye"></i> Ver Detalhes
-                            </a>
-                            <a href="/editar_personagem/{personagem.id}" class="dropdown-item">
-                                <i class="fas fa-edit"></i> Editar
-                            </a>
-                            <a href="/excluir_personagem/{personagem.id}" class="dropdown-item" 
-                               onclick="return confirmDelete('Excluir {personagem.nome}?')">
-                                <i class="fas fa-trash"></i> Excluir
-                            </a>
-                        </div>
-                    </div>
-                </div>
-                
-                <div class="character-meta">
-                    <span class="character-type">{personagem.tipo}</span>
-                    <span class="character-priority">
-                        <i class="fas fa-bolt"></i>
-                        Prioridade {personagem.prioridade}/10
-                    </span>
-                </div>
-                
-                <p class="character-description">
-                    {personagem.descricao[:150] if personagem.descricao else 'Sem descrição...'}
-                </p>
-                
-                <div class="priority-bar">
-                    <div class="priority-fill" style="width: {personagem.prioridade * 10}%"></div>
-                </div>
-                
-                <div class="character-footer">
-                    <div class="character-stats">
-                        <div class="character-stat">
-                            <span class="stat-number">{objetivos_total}</span>
-                            <span class="stat-label">Objetivos</span>
-                        </div>
-                        <div class="character-stat">
-                            <span class="stat-number">{objetivos_concluidos}</span>
-                            <span class="stat-label">Concluídos</span>
-                        </div>
-                    </div>
-                    <a href="/detalhes_personagem/{personagem.id}" class="btn btn-sm btn-primary">
-                        Ver Detalhes
-                    </a>
-                </div>
-            </div>
-        </div>
+    tags_html = ''.join(
+        f'<span class="tag {'active' if tag_filter == nome else ''}" '
+        f'onclick="window.location=\'/personagens?tag={quote_plus(nome)}\'">{nome} ({quantidade})</span>'
+        for nome, quantidade in contagem_tags(usuario.id)
+    )
+    if tags_html:
+        if tag_filter:
+            tags_html = '<span class="tag" onclick="window.location=\'/personagens\'"><i class="fas fa-times"></i> Limpar</span>' + tags_html
+        tags_html = f'''
+        <h5 class="card-title mb-3 mt-3"><i class="fas fa-tags text-blood"></i> Tags</h5>
+        <div class="tags-cloud mb-2">{tags_html}</div>
         '''
     
-    if not personagens_html:
-        personagens_html = '''
+    vazio_html = '''
         <div class="empty-state">
             <i class="fas fa-users-slash fa-3x"></i>
             <h4>Nenhum personagem encontrado</h4>
@@ -2671,7 +3092,7 @@ def listar_personagens():
         </div>
         '''
     
-    content = f'''
+    cabecalho_html = f'''
     <div class="page-header">
         <div class="page-title">
             <h1><i class="fas fa-users text-blood"></i> Meus Personagens</h1>
@@ -2689,19 +3110,70 @@ def listar_personagens():
         <div class="card-body">
             <h5 class="card-title mb-3"><i class="fas fa-filter text-blood"></i> Filtrar por Tipo</h5>
             {filtro_html}
+            {tags_html}
         </div>
     </div>
     
-    <div class="characters-grid">
+    <div class="characters-grid" id="listaPersonagens">
+    '''
+    
+    if todos:
+        def cards():
+            vazio = True
+            for lote in cards_personagens_em_lotes(usuario.id, tipo_filter, tag_filter):
+                vazio = False
+                yield lote
+            if vazio:
+                yield vazio_html
+        
+        return renderizar_pagina_em_stream(cabecalho_html, cards(), '</div>',
+                                           navbar=create_navbar('personagens'),
+                                           sidebar=criar_menu_lateral(usuario.id, 'personagens'))
+    
+    personagens, proximo_cursor = pagina_personagens(usuario.id, tipo_filter, tag=tag_filter)
+    personagens_html = ''.join(renderizar_card_personagem(personagem) for personagem in personagens) or vazio_html
+    
+    carregar_mais_html = f'''
+    <div class="text-center mt-4" id="carregarMais" data-cursor="{proximo_cursor}" data-tipo="{escape(tipo_filter)}" data-tag="{escape(tag_filter)}">
+        <button class="btn btn-outline" onclick="carregarMaisPersonagens()">
+            <i class="fas fa-chevron-down"></i> Carregar mais
+        </button>
+        <a href="/personagens?todos=1&tipo={quote_plus(tipo_filter)}&tag={quote_plus(tag_filter)}" class="btn btn-secondary">
+            <i class="fas fa-list"></i> Ver todos
+        </a>
+    </div>
+    ''' if proximo_cursor else ''
+    
+    content = cabecalho_html + f'''
         {personagens_html}
     </div>
+    
+    {carregar_mais_html}
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', content)\
-                            .replace('{{ navbar|safe }}', create_navbar('personagens'))\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(usuario.id, 'personagens'))
+    return renderizar_pagina(content,
+                             navbar=create_navbar('personagens'),
+                             sidebar=criar_menu_lateral(usuario.id, 'personagens'))
+
+
+@app.route('/personagens/pagina')
+def pagina_personagens_fragmento():
+    if 'usuario_id' not in session:
+        return jsonify({'success': False, 'message': 'Não autorizado'})
     
-    return render_template_string(template)
+    personagens, proximo_cursor = pagina_personagens(
+        session['usuario_id'],
+        request.args.get('tipo', 'todos'),
+        request.args.get('cursor'),
+        tag=request.args.get('tag', '').strip()
+    )
+    
+    return jsonify({
+        'success': True,
+        'html': ''.join(renderizar_card_personagem(personagem) for personagem in personagens),
+        'quantidade': len(personagens),
+        'proximo_cursor': proximo_cursor
+    })
 
 
 @app.route('/novo_personagem', methods=['GET', 'POST'])
@@ -2722,6 +3194,10 @@ def novo_personagem():
         imagem_url = request.form.get('imagem_url', '')
         tags = request.form.get('tags', '')
         
+        # Uma linha por objetivo, com ou sem "-" na frente
+        objetivos_linhas = [linha.strip().lstrip('-').strip() for linha in request.form.get('objetivos', '').split('\n')]
+        objetivos_linhas = [linha for linha in objetivos_linhas if linha]
+        
         personagem = Personagem(
             nome=nome,
             tipo=tipo,
@@ -2731,27 +3207,22 @@ def novo_personagem():
             habilidades=habilidades,
             notas=notas,
             imagem_url=imagem_url,
-            tags=tags,
-            usuario_id=session['usuario_id']
+            usuario_id=session['usuario_id'],
+            total_objetivos=len(objetivos_linhas)
         )
+        definir_tags(personagem, tags)
         
         db.session.add(personagem)
-        db.session.commit()
-        
-        objetivos_texto = request.form.get('objetivos', '')
-        if objetivos_texto:
-            objetivos_linhas = [obj.strip() for obj in objetivos_texto.split('\n') if obj.strip()]
-            for obj_text in objetivos_linhas:
-                if obj_text.startswith('-'):
-                    obj_text = obj_text[1:].strip()
-                
-                objetivo = Objetivo(
-                    descricao=obj_text,
-                    personagem_id=personagem.id
-                )
-                db.session.add(objetivo)
+        db.session.flush()
         
+        # Personagem, objetivos e estatísticas num único commit
+        agora = datetime.utcnow()
+        inserir_objetivos(personagem.id, [(linha, 5) for linha in objetivos_linhas], agora)
+        ajustar_estatisticas(session['usuario_id'], personagens=1, prioridade=prioridade,
+                             objetivos=[(agora, False, 1)] * len(objetivos_linhas))
         db.session.commit()
+        invalidar_menu_lateral(session['usuario_id'])
+        indice_autocompletar.adicionar(session['usuario_id'], personagem.id, nome, [tag.nome for tag in personagem.tags])
         
         flash(f'✅ Personagem Criado! {nome} foi adicionado com sucesso.', 'success')
         return redirect(url_for('detalhes_personagem', personagem_id=personagem.id))
@@ -2874,35 +3345,15 @@ def novo_personagem():
             </button>
         </div>
     </form>
-    
-    <script>
-        function validateCharacterForm() {{
-            const nome = document.querySelector('input[name="nome"]').value;
-            const tipo = document.querySelector('select[name="tipo"]').value;
-            
-            if (!nome.trim()) {{
-                alert('Por favor, preencha o nome do personagem.');
-                return false;
-            }}
-            
-            if (!tipo) {{
-                alert('Por favor, selecione um tipo para o personagem.');
-                return false;
-            }}
-            
-            return true;
-        }}
-    </script>
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', form_html)\
-                            .replace('{{ navbar|safe }}', create_navbar('novo_personagem'))\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(session['usuario_id'], 'novo_personagem'))
-    
-    return render_template_string(template)
+    return renderizar_pagina(form_html,
+                             navbar=create_navbar('novo_personagem'),
+                             sidebar=criar_menu_lateral(session['usuario_id'], 'novo_personagem'))
 
 
 @app.route('/detalhes_personagem/<int:personagem_id>')
+@condicional
 def detalhes_personagem(personagem_id):
     if 'usuario_id' not in session:
         return redirect(url_for('login'))
@@ -2915,10 +3366,9 @@ def detalhes_personagem(personagem_id):
     
     tags_html = ""
     if personagem.tags:
-        tags = [tag.strip() for tag in personagem.tags.split(',') if tag.strip()]
         tags_html = '<div class="tags-cloud">'
-        for tag in tags:
-            tags_html += f'<span class="tag">{tag}</span>'
+        for tag in personagem.tags:
+            tags_html += f'<span class="tag" onclick="window.location=\'/personagens?tag={quote_plus(tag.nome)}\'">{tag.nome}</span>'
         tags_html += '</div>'
     
     objetivos_html = ""
@@ -3010,7 +3460,7 @@ def detalhes_personagem(personagem_id):
                             <tr>
                                 <td><i class="fas fa-bullseye text-muted"></i></td>
                                 <td>Objetivos</td>
-                                <td class="text-right">{len(personagem.objetivos)}</td>
+                                <td class="text-right">{personagem.total_objetivos}</td>
                             </tr>
                         </table>
                     </div>
@@ -3037,7 +3487,7 @@ def detalhes_personagem(personagem_id):
                     <div class="d-flex justify-between align-center">
                         <h3 class="card-title"><i class="fas fa-bullseye text-blood"></i> Objetivos</h3>
                         <span class="badge bg-secondary">
-                            {len([o for o in personagem.objetivos if o.concluido])}/{len(personagem.objetivos)} concluídos
+                            {personagem.objetivos_concluidos}/{personagem.total_objetivos} concluídos
                         </span>
                     </div>
                 </div>
@@ -3097,27 +3547,11 @@ def detalhes_personagem(personagem_id):
             </div>
         </div>
     </div>
-    
-    <script>
-        function toggleObjetivo(objetivoId) {{
-            fetch('/toggle_objetivo/' + objetivoId, {{
-                method: 'POST'
-            }})
-            .then(response => response.json())
-            .then(data => {{
-                if (data.success) {{
-                    setTimeout(() => location.reload(), 300);
-                }}
-            }});
-        }}
-    </script>
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', detalhes_html)\
-                            .replace('{{ navbar|safe }}', create_navbar())\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(session['usuario_id']))
-    
-    return render_template_string(template)
+    return renderizar_pagina(detalhes_html,
+                             navbar=create_navbar(),
+                             sidebar=criar_menu_lateral(session['usuario_id']))
 
 
 @app.route('/adicionar_objetivo/<int:personagem_id>', methods=['POST'])
@@ -3141,12 +3575,65 @@ def adicionar_objetivo(personagem_id):
     )
     
     db.session.add(objetivo)
+    db.session.flush()
+    ajustar_contadores_objetivos(personagem_id, total=1)
+    ajustar_estatisticas(session['usuario_id'], objetivos=[(objetivo.data_criacao, False, 1)])
     db.session.commit()
+    invalidar_menu_lateral(session['usuario_id'])
     
     flash('Objetivo adicionado com sucesso!', 'success')
     return redirect(url_for('detalhes_personagem', personagem_id=personagem_id))
 
 
+@app.route('/adicionar_objetivos/<int:personagem_id>', methods=['POST'])
+def adicionar_objetivos(personagem_id):
+    """
+    Cria vários objetivos de uma vez. Corpo JSON: {"objetivos": [...]}, em que
+    cada item é um texto ou {"descricao": ..., "prioridade": 1-10}.
+    """
+    if 'usuario_id' not in session:
+        return jsonify({'success': False, 'message': 'Não autorizado'})
+    
+    personagem = Personagem.query.get_or_404(personagem_id)
+    
+    if personagem.usuario_id != session['usuario_id']:
+        return jsonify({'success': False, 'message': 'Acesso negado'})
+    
+    dados = request.get_json(silent=True) or {}
+    itens = dados.get('objetivos')
+    if not isinstance(itens, list) or not itens:
+        return jsonify({'success': False, 'message': 'Envie uma lista não vazia em "objetivos"'})
+    if len(itens) > app.config['OBJETIVOS_LOTE_MAX']:
+        return jsonify({'success': False, 'message': f"No máximo {app.config['OBJETIVOS_LOTE_MAX']} objetivos por vez"})
+    
+    objetivos = []
+    for posicao, item in enumerate(itens, 1):
+        if isinstance(item, str):
+            item = {'descricao': item}
+        descricao = item.get('descricao') if isinstance(item, dict) else None
+        descricao = descricao.strip() if isinstance(descricao, str) else ''
+        prioridade = item.get('prioridade', 5) if isinstance(item, dict) else None
+        if not descricao or len(descricao) > 500:
+            return jsonify({'success': False, 'message': f'Objetivo {posicao}: descrição vazia ou com mais de 500 caracteres'})
+        if not isinstance(prioridade, int) or isinstance(prioridade, bool) or not 1 <= prioridade <= 10:
+            return jsonify({'success': False, 'message': f'Objetivo {posicao}: prioridade deve ser um inteiro de 1 a 10'})
+        objetivos.append((descricao, prioridade))
+    
+    usuario_id = session['usuario_id']
+    
+    def criar():
+        agora = datetime.utcnow()
+        ids = inserir_objetivos(personagem_id, objetivos, agora, retornar_ids=True)
+        ajustar_contadores_objetivos(personagem_id, total=len(ids))
+        ajustar_estatisticas(usuario_id, objetivos=[(agora, False, 1)] * len(ids))
+        return ids
+    
+    ids = gravar(criar)
+    invalidar_menu_lateral(usuario_id)
+    
+    return jsonify({'success': True, 'criados': len(ids), 'ids': ids})
+
+
 @app.route('/toggle_objetivo/<int:objetivo_id>', methods=['POST'])
 def toggle_objetivo(objetivo_id):
     if 'usuario_id' not in session:
@@ -3158,15 +3645,24 @@ def toggle_objetivo(objetivo_id):
     if personagem.usuario_id != session['usuario_id']:
         return jsonify({'success': False, 'message': 'Acesso negado'})
     
-    objetivo.concluido = not objetivo.concluido
-    if objetivo.concluido:
-        objetivo.data_conclusao = datetime.utcnow()
-    else:
-        objetivo.data_conclusao = None
+    usuario_id = session['usuario_id']
     
-    db.session.commit()
+    def alternar():
+        linha = alternar_objetivo(objetivo_id)
+        if linha is None:
+            return None
+        concluido, data_criacao, personagem_id = linha
+        ajustar_contadores_objetivos(personagem_id, concluidos=1 if concluido else -1)
+        ajustar_estatisticas(usuario_id, objetivos=[(data_criacao, not concluido, -1),
+                                                    (data_criacao, concluido, 1)])
+        return concluido
     
-    return jsonify({'success': True, 'concluido': objetivo.concluido})
+    concluido = gravar(alternar)
+    if concluido is None:
+        return jsonify({'success': False, 'message': 'Objetivo não encontrado'})
+    invalidar_menu_lateral(session['usuario_id'])
+    
+    return jsonify({'success': True, 'concluido': concluido})
 
 
 @app.route('/salvar_nota_rapida', methods=['POST'])
@@ -3187,8 +3683,14 @@ def salvar_nota_rapida():
             usuario_id=session['usuario_id']
         )
         
-        db.session.add(nota)
-        db.session.commit()
+        usuario_id = session['usuario_id']
+        
+        def salvar():
+            db.session.add(nota)
+            ajustar_estatisticas(usuario_id)
+        
+        gravar(salvar)
+        invalidar_menu_lateral(usuario_id)
         
         return jsonify({'success': True, 'message': 'Nota salva com sucesso!'})
     except Exception as e:
@@ -3206,7 +3708,9 @@ def excluir_nota_rapida(nota_id):
         return jsonify({'success': False, 'message': 'Acesso negado'})
     
     db.session.delete(nota)
+    ajustar_estatisticas(session['usuario_id'])
     db.session.commit()
+    invalidar_menu_lateral(session['usuario_id'])
     
     return jsonify({'success': True, 'message': 'Nota excluída com sucesso!'})
 
@@ -3226,11 +3730,62 @@ def buscar():
         return redirect(url_for('login'))
     
     usuario = Usuario.query.get(session['usuario_id'])
+    termo = request.args.get('q', '').strip()
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = app.config['BUSCA_RESULTADOS_POR_PAGINA']
+    
+    resultados, total = buscar_textos(usuario.id, termo, pagina) if termo else ([], 0)
+    
+    icones = {'personagem': 'fa-user-ninja', 'objetivo': 'fa-bullseye', 'nota_rapida': 'fa-sticky-note'}
+    rotulos = {'personagem': 'Personagem', 'objetivo': 'Objetivo', 'nota_rapida': 'Nota Rápida'}
+    
+    resultados_html = ""
+    for resultado in resultados:
+        link = f"/detalhes_personagem/{resultado['personagem_id']}" if resultado['personagem_id'] else '#'
+        resultados_html += f'''
+        <a href="{link}" class="recent-item mb-2">
+            <div class="recent-avatar">
+                <i class="fas {icones[resultado['origem']]}"></i>
+            </div>
+            <div class="recent-info">
+                <span class="recent-title">{resultado['titulo']}</span>
+                <span class="recent-subtitle">{rotulos[resultado['origem']]}{' • ' + resultado['trecho'] if resultado['trecho'] else ''}</span>
+            </div>
+        </a>
+        '''
+    
+    if termo and not resultados_html:
+        resultados_html = f'''
+        <div class="empty-state">
+            <i class="fas fa-search fa-3x"></i>
+            <h4>Nenhum resultado para "{escape(termo)}"</h4>
+            <p class="text-muted">Tente outras palavras ou apenas o começo de um nome.</p>
+        </div>
+        '''
+    elif not termo:
+        resultados_html = '''
+        <div class="empty-state">
+            <i class="fas fa-search fa-3x"></i>
+            <h4>Buscar no Grimório</h4>
+            <p class="text-muted">Busque personagens por nome, tipo, tags, história, habilidades, objetivos ou notas rápidas.</p>
+        </div>
+        '''
+    
+    paginacao_html = ""
+    if total > por_pagina:
+        total_paginas = (total + por_pagina - 1) // por_pagina
+        termo_url = quote_plus(termo)
+        paginacao_html = '<div class="d-flex justify-between align-center mt-4">'
+        paginacao_html += f'<a href="/buscar?q={termo_url}&pagina={pagina - 1}" class="btn btn-sm btn-outline"><i class="fas fa-arrow-left"></i> Anterior</a>' if pagina > 1 else '<span></span>'
+        paginacao_html += f'<span class="text-muted">Página {pagina} de {total_paginas}</span>'
+        paginacao_html += f'<a href="/buscar?q={termo_url}&pagina={pagina + 1}" class="btn btn-sm btn-outline">Próxima <i class="fas fa-arrow-right"></i></a>' if pagina < total_paginas else '<span></span>'
+        paginacao_html += '</div>'
     
     content = f'''
     <div class="page-header">
         <div class="page-title">
             <h1><i class="fas fa-search text-blood"></i> Buscar</h1>
+            {f'<span class="text-muted">{total} resultado(s)</span>' if termo else ''}
         </div>
         <div class="page-actions">
             <a href="/personagens" class="btn btn-outline">
@@ -3249,8 +3804,10 @@ def buscar():
             <form method="GET" action="/buscar" class="mb-4">
                 <div class="row">
                     <div class="col-md-8 mb-3">
-                        <input type="text" class="form-control" name="q" 
+                        <input type="text" class="form-control" name="q" value="{escape(termo)}"
+                               id="campoBusca" autocomplete="off"
                                placeholder="Digite o nome do personagem, tipo ou tags...">
+                        <div class="recent-list mt-2" id="sugestoesBusca"></div>
                     </div>
                     <div class="col-md-4 mb-3">
                         <button type="submit" class="btn btn-primary w-100">
@@ -3260,24 +3817,35 @@ def buscar():
                 </div>
             </form>
             
-            <div class="empty-state">
-                <i class="fas fa-search fa-3x"></i>
-                <h4>Funcionalidade de Busca</h4>
-                <p class="text-muted">Em desenvolvimento...</p>
-                <p class="text-muted">Aqui você poderá buscar personagens por nome, tipo, tags ou objetivos.</p>
-                <a href="/personagens" class="btn btn-primary mt-3">
-                    <i class="fas fa-arrow-left"></i> Voltar para Personagens
-                </a>
+            <div class="recent-list">
+                {resultados_html}
             </div>
+            
+            {paginacao_html}
         </div>
     </div>
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', content)\
-                            .replace('{{ navbar|safe }}', create_navbar('buscar'))\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(usuario.id, 'buscar'))
+    return renderizar_pagina(content,
+                             navbar=create_navbar('buscar'),
+                             sidebar=criar_menu_lateral(usuario.id, 'buscar'))
+
+
+@app.route('/autocompletar')
+def autocompletar():
+    if 'usuario_id' not in session:
+        return jsonify({'success': False, 'message': 'Não autorizado'})
     
-    return render_template_string(template)
+    limite = min(max(request.args.get('limite', 8, type=int), 1), 20)
+    sugestoes = indice_autocompletar.sugerir(session['usuario_id'], request.args.get('q', ''), limite)
+    
+    for sugestao in sugestoes:
+        if sugestao['tipo'] == 'personagem':
+            sugestao['url'] = f"/detalhes_personagem/{sugestao['referencia']}"
+        else:
+            sugestao['url'] = f"/personagens?tag={quote_plus(sugestao['texto'])}"
+    
+    return jsonify({'success': True, 'sugestoes': sugestoes})
 
 
 @app.route('/configuracoes')
@@ -3377,11 +3945,9 @@ def configuracoes():
     </div>
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', content)\
-                            .replace('{{ navbar|safe }}', create_navbar())\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(usuario.id))
-    
-    return render_template_string(template)
+    return renderizar_pagina(content,
+                             navbar=create_navbar(),
+                             sidebar=criar_menu_lateral(usuario.id))
 
 
 @app.route('/relatorio/<tipo>')
@@ -3416,11 +3982,9 @@ def relatorio(tipo):
     </div>
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', content)\
-                            .replace('{{ navbar|safe }}', create_navbar())\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(usuario.id))
-    
-    return render_template_string(template)
+    return renderizar_pagina(content,
+                             navbar=create_navbar(),
+                             sidebar=criar_menu_lateral(usuario.id))
 
 
 @app.route('/logout')
@@ -3441,8 +4005,12 @@ def excluir_personagem(personagem_id):
         flash('Acesso negado! Este personagem não pertence a você.', 'error')
         return redirect(url_for('dashboard'))
     
+    ajustar_estatisticas(session['usuario_id'], personagens=-1, prioridade=-(personagem.prioridade or 0),
+                         objetivos_do_personagem=personagem.id)
     db.session.delete(personagem)
     db.session.commit()
+    invalidar_menu_lateral(session['usuario_id'])
+    indice_autocompletar.remover(session['usuario_id'], personagem_id)
     
     flash(f'Personagem "{personagem.nome}" excluído com sucesso!', 'success')
     return redirect(url_for('listar_personagens'))
@@ -3460,8 +4028,13 @@ def excluir_objetivo(objetivo_id):
         flash('Acesso negado!', 'error')
         return redirect(url_for('dashboard'))
     
-    db.session.delete(objetivo)
+    linha = apagar_objetivo(objetivo_id)
+    if linha is not None:
+        concluido, data_criacao, _ = linha
+        ajustar_contadores_objetivos(personagem.id, total=-1, concluidos=-1 if concluido else 0)
+        ajustar_estatisticas(session['usuario_id'], objetivos=[(data_criacao, concluido, -1)])
     db.session.commit()
+    invalidar_menu_lateral(session['usuario_id'])
     
     flash('Objetivo excluído com sucesso!', 'success')
     return redirect(url_for('detalhes_personagem', personagem_id=personagem.id))
@@ -3484,14 +4057,21 @@ def editar_personagem(personagem_id):
         personagem.nome = request.form['nome']
         personagem.tipo = request.form['tipo']
         personagem.descricao = request.form.get('descricao', '')
-        personagem.prioridade = int(request.form.get('prioridade', 5))
         personagem.historia = request.form.get('historia', '')
         personagem.habilidades = request.form.get('habilidades', '')
         personagem.notas = request.form.get('notas', '')
         personagem.imagem_url = request.form.get('imagem_url', '')
-        personagem.tags = request.form.get('tags', '')
+        definir_tags(personagem, request.form.get('tags', ''))
+        # Mudança só nas tags não gera UPDATE na linha; a data aparece nos detalhes e ordena a listagem
+        personagem.data_atualizacao = datetime.utcnow()
+        # A prioridade vai à parte, depois do flush dos outros campos (prioridade não
+        # está nas colunas da busca, então o índice é refeito uma vez só)
+        variacao = trocar_prioridade(personagem.id, int(request.form.get('prioridade', 5)))
+        ajustar_estatisticas(session['usuario_id'], prioridade=variacao)
         
         db.session.commit()
+        invalidar_menu_lateral(session['usuario_id'])
+        indice_autocompletar.atualizar(session['usuario_id'], personagem.id, personagem.nome, [tag.nome for tag in personagem.tags])
         
         flash(f'✅ Personagem atualizado! {personagem.nome} foi modificado com sucesso.', 'success')
         return redirect(url_for('detalhes_personagem', personagem_id=personagem.id))
@@ -3587,7 +4167,7 @@ def editar_personagem(personagem_id):
                     <div class="col-md-6 mb-3">
                         <label class="form-label">Tags</label>
                         <input type="text" class="form-control" name="tags" 
-                               value="{personagem.tags or ''}">
+                               value="{', '.join(tag.nome for tag in personagem.tags)}">
                     </div>
                 </div>
             </div>
@@ -3604,20 +4184,132 @@ def editar_personagem(personagem_id):
     </form>
     '''
     
-    template = BASE_TEMPLATE.replace('{{ content|safe }}', form_html)\
-                            .replace('{{ navbar|safe }}', create_navbar('personagens'))\
-                            .replace('{{ sidebar|safe }}', criar_menu_lateral(session['usuario_id']))
-    
-    return render_template_string(template)
+    return renderizar_pagina(form_html,
+                             navbar=create_navbar('personagens'),
+                             sidebar=criar_menu_lateral(session['usuario_id']))
 
 
 # =============================================
 # INICIALIZAÇÃO
 # =============================================
 
+def preparar_banco():
+    db.create_all()
+    # create_all não adiciona índices novos a tabelas que já existem
+    for tabela in db.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(db.engine, checkfirst=True)
+    migrou_tags = migrar_tags()
+    # Antes dos contadores: a correção deles já sobe a versão das estatísticas
+    migrar_versao_estatisticas()
+    migrar_contadores_objetivos()
+    criar_indice_busca(reconstruir=migrou_tags)
+    if EstatisticasUsuario.query.first() is None:
+        # Tabela nova num banco que já tinha usuários
+        reconstruir_estatisticas()
+
+
+def migrar_tags():
+    """
+    Migra a antiga coluna personagem.tags (texto separado por vírgulas) para
+    as tabelas tag/personagem_tag. Esvazia a coluna ao final, então rodar de
+    novo não faz nada. Retorna True se algo foi migrado.
+    """
+    colunas = [coluna['name'] for coluna in db.inspect(db.engine).get_columns('personagem')]
+    if 'tags' not in colunas:
+        return False
+    
+    linhas = db.session.execute(db.text(
+        "SELECT id, usuario_id, tags FROM personagem WHERE tags IS NOT NULL AND tags != ''"
+    )).all()
+    if not linhas:
+        return False
+    
+    nomes_por_usuario = {}
+    for _, usuario_id, tags in linhas:
+        nomes_por_usuario.setdefault(usuario_id, set()).update(separar_tags(tags))
+    
+    ids_tags = {}
+    for usuario_id, nomes in nomes_por_usuario.items():
+        for tag in Tag.query.filter(Tag.usuario_id == usuario_id, Tag.nome.in_(nomes)):
+            ids_tags[(usuario_id, tag.nome)] = tag.id
+        novas = [Tag(nome=nome, usuario_id=usuario_id) for nome in nomes if (usuario_id, nome) not in ids_tags]
+        db.session.add_all(novas)
+        db.session.flush()
+        for tag in novas:
+            ids_tags[(usuario_id, tag.nome)] = tag.id
+    
+    existentes = set(db.session.query(personagem_tag.c.personagem_id, personagem_tag.c.tag_id).all())
+    associacoes = []
+    for personagem_id, usuario_id, tags in linhas:
+        for nome in dict.fromkeys(separar_tags(tags)):
+            par = (personagem_id, ids_tags[(usuario_id, nome)])
+            if par not in existentes:
+                existentes.add(par)
+                associacoes.append({'personagem_id': par[0], 'tag_id': par[1]})
+    if associacoes:
+        db.session.execute(personagem_tag.insert(), associacoes)
+    
+    db.session.execute(db.text("UPDATE personagem SET tags = NULL WHERE tags IS NOT NULL"))
+    db.session.commit()
+    return True
+
+
+@app.cli.command('preparar-banco')
+def preparar_banco_comando():
+    """Cria tabelas, índices e o índice de busca (fase de release, antes dos workers)."""
+    preparar_banco()
+    print(f"Banco pronto: {db.engine.url.render_as_string(hide_password=True)}")
+
+
+@app.cli.command('reconstruir-estatisticas')
+def reconstruir_estatisticas_comando():
+    """Recalcula as estatísticas materializadas de todos os usuários."""
+    corrigidos = reconstruir_estatisticas()
+    print(f"{len(corrigidos)} usuário(s) com estatísticas ausentes ou divergentes corrigido(s)")
+    if corrigidos:
+        print(', '.join(map(str, corrigidos[:100])) + (' ...' if len(corrigidos) > 100 else ''))
+
+
+def migrar_contadores_objetivos():
+    # create_all não adiciona colunas a tabelas existentes
+    colunas = [coluna['name'] for coluna in db.inspect(db.engine).get_columns('personagem')]
+    novas = [nome for nome in ('total_objetivos', 'objetivos_concluidos') if nome not in colunas]
+    for nome in novas:
+        db.session.execute(db.text(f"ALTER TABLE personagem ADD COLUMN {nome} INTEGER NOT NULL DEFAULT 0"))
+    if novas:
+        verificar_contadores_objetivos(corrigir=True)
+    db.session.commit()
+
+
+def migrar_versao_estatisticas():
+    # Colunas do ETag; linhas antigas começam na versão 0 e sem data
+    colunas = [coluna['name'] for coluna in db.inspect(db.engine).get_columns('estatisticas_usuario')]
+    if 'versao' not in colunas:
+        db.session.execute(db.text("ALTER TABLE estatisticas_usuario ADD COLUMN versao INTEGER NOT NULL DEFAULT 0"))
+    if 'atualizado_em' not in colunas:
+        db.session.execute(db.text("ALTER TABLE estatisticas_usuario ADD COLUMN atualizado_em TIMESTAMP"))
+    db.session.commit()
+
+
+@app.cli.command('verificar-contadores')
+@click.option('--corrigir', is_flag=True, help='Regrava os contadores divergentes.')
+def verificar_contadores_comando(corrigir):
+    """Confere os contadores de objetivos dos personagens com a contagem real."""
+    divergentes = verificar_contadores_objetivos(corrigir)
+    for personagem_id, total, concluidos, total_real, concluidos_real in divergentes[:100]:
+        print(f"personagem {personagem_id}: {total}/{concluidos} gravados, {total_real}/{concluidos_real} reais")
+    if len(divergentes) > 100:
+        print(f"... e mais {len(divergentes) - 100}")
+    acao = 'corrigido(s)' if corrigir else 'divergente(s) (use --corrigir)'
+    print(f"{len(divergentes)} personagem(ns) {acao}")
+    if divergentes and not corrigir:
+        sys.exit(1)
+
+
 def init_database():
     with app.app_context():
-        db.create_all()
+        preparar_banco()
         print("=" * 80)
         print("⚔️  GRIMÓRIO BERSERK - Sistema de Anotações de Personagens")
         print("🎨 VERSÃO: Premium - Design Moderno")
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Ferramentas de benchmark do Grimório Berserk.
+Execute a partir da raiz do projeto, por exemplo: python -m benchmarks.indices
+"""
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da compressão: renderiza páginas reais de um banco populado e mede,
+para cada codificação e nível, os bytes enviados e o tempo de CPU por resposta.
+Também mostra o tamanho das variantes pré-comprimidas dos assets estáticos.
+
+    python -m benchmarks.compressao --personagens 200 --repeticoes 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.dados import carregar_app, popular
+
+
+NIVEIS = {
+    'gzip': [1, 4, 6, 9],
+    'br': [1, 4, 5, 6, 9, 11],
+}
+
+
+def paginas(modulo, cliente, usuario_id):
+    with modulo.app.app_context():
+        personagem_id = modulo.Personagem.query.filter_by(usuario_id=usuario_id).first().id
+
+    corpos = {}
+    for url in ['/dashboard', '/personagens', f'/detalhes_personagem/{personagem_id}', '/buscar?q=espada']:
+        # Accept-Encoding: identity para pegar o corpo original, sem passar pelo middleware
+        resposta = cliente.get(url, headers={'Accept-Encoding': 'identity'})
+        corpos[url] = resposta.get_data()
+    for nome in ['css/grimorio.css', 'js/grimorio.js']:
+        with open(os.path.join(modulo.app.static_folder, nome), 'rb') as arquivo:
+            corpos[f'/assets/{nome}'] = arquivo.read()
+    return corpos
+
+
+def medir_cpu(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.process_time()
+        funcao()
+        tempos.append((time.process_time() - t0) * 1000)
+    return statistics.median(tempos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--personagens', type=int, default=200, help='personagens do usuário medido')
+    parser.add_argument('--objetivos', type=int, default=5)
+    parser.add_argument('--notas', type=int, default=20)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    modulo = carregar_app()
+    usuario_id = popular(modulo, 1, args.personagens, args.objetivos, args.notas)[0]
+
+    cliente = modulo.app.test_client()
+    cliente.post('/login', data={'email': f'benchmark{usuario_id}@grimorio.local', 'senha': 'benchmark'})
+    corpos = paginas(modulo, cliente, usuario_id)
+
+    codificacoes = modulo.codificacoes_disponiveis()
+    if 'br' not in codificacoes:
+        print('Pacote brotli não instalado: medindo só gzip')
+
+    for url, corpo in corpos.items():
+        print()
+        print(f'{url}: {len(corpo)} bytes sem compressão')
+        print(f'  {"codificação":12} {"nível":>5} {"bytes":>8} {"razão":>7} {"CPU (ms)":>9}')
+        for codificacao in codificacoes:
+            for nivel in NIVEIS[codificacao]:
+                comprimido = modulo.comprimir(corpo, codificacao, nivel)
+                cpu = medir_cpu(lambda: modulo.comprimir(corpo, codificacao, nivel), args.repeticoes)
+                print(f'  {codificacao:12} {nivel:>5} {len(comprimido):>8} '
+                      f'{len(corpo) / len(comprimido):>6.1f}x {cpu:>9.3f}')
+
+    print()
+    print(f'Níveis atuais: gzip {modulo.app.config["COMPRESSAO_NIVEL_GZIP"]}, '
+          f'brotli {modulo.app.config["COMPRESSAO_NIVEL_BROTLI"]} '
+          f'(respostas com menos de {modulo.app.config["COMPRESSAO_MIN_BYTES"]} bytes não são comprimidas). '
+          f'Assets estáticos usam gzip 9 / brotli 11 pré-comprimidos (flask comprimir-assets).')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite contra PostgreSQL sob escrita concorrente: roda benchmarks.suite com um
+gunicorn de vários workers para cada backend, no mesmo roteiro e com a mesma
+carga, e compara vazão, latência das escritas e respostas com erro (no SQLite,
+tipicamente "database is locked" quando a fila de escrita passa do timeout).
+
+O PostgreSQL é indicado por uma URL de servidor; o benchmark cria um banco
+descartável nele e apaga ao final. Sem --postgres, mede só o SQLite. Com
+--perfis-sqlite, o SQLite é medido sem os pragmas (journal padrão), com WAL e
+pragmas, e com WAL mais a fila de escrita.
+
+    python -m benchmarks.concorrencia --postgres postgresql://postgres@localhost/postgres
+    python -m benchmarks.concorrencia --perfis-sqlite --roteiro misto
+    python -m benchmarks.concorrencia --postgres ... --gunicorn 4 --concorrencia 32 --roteiro misto
+"""
+
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+
+from sqlalchemy import create_engine, make_url, text
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROTAS = ('toggle_objetivo', 'salvar_nota_rapida', 'dashboard')
+
+PERFIS_SQLITE = {
+    'sqlite': {'SQLITE_OTIMIZADO': '0', 'SQLITE_FILA_ESCRITA': '0'},
+    'sqlite wal': {'SQLITE_OTIMIZADO': '1', 'SQLITE_FILA_ESCRITA': '0'},
+    'sqlite wal+fila': {'SQLITE_OTIMIZADO': '1', 'SQLITE_FILA_ESCRITA': '1'},
+}
+
+
+def criar_banco_postgres(url_servidor):
+    url = make_url(url_servidor)
+    if url.drivername == 'postgres':
+        url = url.set(drivername='postgresql')
+    nome = f'grimorio_bench_{secrets.token_hex(4)}'
+    # CREATE/DROP DATABASE não rodam dentro de transação
+    engine = create_engine(url.set(drivername='postgresql+psycopg2'), isolation_level='AUTOCOMMIT')
+    with engine.connect() as conexao:
+        conexao.execute(text(f'CREATE DATABASE {nome}'))
+
+    def apagar():
+        with engine.connect() as conexao:
+            conexao.execute(text(f'DROP DATABASE IF EXISTS {nome} WITH (FORCE)'))
+        engine.dispose()
+
+    return url.set(database=nome).render_as_string(hide_password=False), apagar
+
+
+def rodar_suite(database_url, args, ambiente=None):
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as arquivo:
+        saida = arquivo.name
+    comando = [
+        sys.executable, '-m', 'benchmarks.suite',
+        '--gunicorn', str(args.gunicorn), '--concorrencia', str(args.concorrencia),
+        '--roteiro', args.roteiro, '--rodadas', str(args.rodadas),
+        '--usuarios', str(args.usuarios), '--personagens', str(args.personagens),
+        '--saida', saida,
+    ]
+    if database_url:
+        comando += ['--database-url', database_url]
+    # A suíte sai com 1 quando há respostas com erro; aqui isso é resultado, não falha
+    subprocess.run(comando, cwd=RAIZ, stdout=subprocess.DEVNULL, env=dict(os.environ, **(ambiente or {})))
+    try:
+        with open(saida, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    finally:
+        os.unlink(saida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--postgres', help='URL de um servidor PostgreSQL onde criar o banco descartável')
+    parser.add_argument('--perfis-sqlite', action='store_true', help='mede o SQLite antes e depois do WAL e da fila')
+    parser.add_argument('--gunicorn', type=int, default=4, metavar='WORKERS')
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--roteiro', choices=['escrita', 'misto'], default='escrita')
+    parser.add_argument('--rodadas', type=int, default=20)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--personagens', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.perfis_sqlite:
+        resultados = {nome: rodar_suite(None, args, ambiente) for nome, ambiente in PERFIS_SQLITE.items()}
+    else:
+        resultados = {'sqlite': rodar_suite(None, args)}
+    if args.postgres:
+        database_url, apagar = criar_banco_postgres(args.postgres)
+        try:
+            resultados['postgresql'] = rodar_suite(database_url, args)
+        finally:
+            apagar()
+    else:
+        print('Sem --postgres: medindo só o SQLite', file=sys.stderr)
+
+    print()
+    print(f'{args.gunicorn} workers, {args.concorrencia} clientes, roteiro {args.roteiro}')
+    print(f'{"backend":16} {"req/s":>8} {"erros":>6}  ' + '  '.join(f'{rota + " p50/p95":>30}' for rota in ROTAS))
+    falhou = False
+    for backend, resultado in resultados.items():
+        if resultado is None:
+            print(f'{backend:16} (a suíte não gerou resultado)')
+            falhou = True
+            continue
+        rotas = resultado['rotas']
+        erros = sum(dados['erros'] for dados in rotas.values())
+        colunas = []
+        for rota in ROTAS:
+            dados = rotas.get(rota)
+            colunas.append(f'{dados["p50_ms"]:>10.1f} / {dados["p95_ms"]:>8.1f} ms' if dados else f'{"-":>30}')
+        print(f'{backend:16} {resultado["vazao_rps"]:>8.1f} {erros:>6}  ' + '  '.join(f'{c:>30}' for c in colunas))
+    return 1 if falhou else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
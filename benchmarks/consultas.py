@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Orçamento de consultas SQL por rota. Para cada tamanho de biblioteca, cria um
+usuário com esse número de personagens e visita as rotas principais com o
+cache do menu lateral vazio (o pior caso), conferindo que:
+
+  * cada rota fica dentro do limite fixado em LIMITES;
+  * o número de consultas é o mesmo em todos os tamanhos (sem lazy load por linha);
+  * nenhum comando se repete mais de --limite vezes na mesma requisição (N+1).
+
+Sai com código 1 se alguma verificação falhar. As consultas lentas são só listadas.
+As mesmas verificações rodam no pytest (tests/test_consultas.py).
+
+    python -m benchmarks.consultas --tamanhos 10 1000 10000
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+from benchmarks.dados import carregar_app, popular
+
+
+# Máximo de comandos SQL por requisição. Ao mexer numa rota, ajuste aqui de
+# propósito: o número só deve subir junto com uma explicação no commit.
+LIMITES = {
+    'dashboard': 6,
+    'personagens': 8,
+    'personagens (tipo)': 8,
+    'personagens (tag)': 8,
+    'personagens (todos)': 7,
+    'personagens/pagina': 1,
+    'detalhes_personagem': 7,
+    'editar_personagem': 6,
+    'toggle_objetivo': 5,
+    'adicionar_objetivos': 4,
+    'salvar_nota_rapida': 2,
+    'buscar': 7,
+    'autocompletar': 2,
+    'configuracoes': 5,
+    'relatorio': 5,
+}
+
+CONSULTAS = re.compile(r'sql;dur=[\d.]+;desc="(\d+) consultas"')
+
+
+def rotas(modulo, usuario_id):
+    with modulo.app.app_context():
+        personagem_id = modulo.Personagem.query.filter_by(usuario_id=usuario_id).first().id
+        objetivo_id = modulo.Objetivo.query.filter_by(personagem_id=personagem_id).first().id
+        _, cursor = modulo.pagina_personagens(usuario_id)
+    return [
+        ('dashboard', 'GET', '/dashboard', None),
+        ('personagens', 'GET', '/personagens', None),
+        ('personagens (tipo)', 'GET', '/personagens?tipo=Vilão', None),
+        ('personagens (tag)', 'GET', '/personagens?tag=espada', None),
+        ('personagens (todos)', 'GET', '/personagens?todos=1', None),
+        ('personagens/pagina', 'GET', f'/personagens/pagina?cursor={cursor}', None),
+        ('detalhes_personagem', 'GET', f'/detalhes_personagem/{personagem_id}', None),
+        ('editar_personagem', 'GET', f'/editar_personagem/{personagem_id}', None),
+        ('toggle_objetivo', 'POST', f'/toggle_objetivo/{objetivo_id}', None),
+        ('adicionar_objetivos', 'POST', f'/adicionar_objetivos/{personagem_id}',
+         {'objetivos': ['Primeiro', {'descricao': 'Segundo', 'prioridade': 8}, 'Terceiro']}),
+        ('salvar_nota_rapida', 'POST', '/salvar_nota_rapida', {'titulo': 'Nota', 'conteudo': 'Texto'}),
+        ('buscar', 'GET', '/buscar?q=espada', None),
+        ('autocompletar', 'GET', '/autocompletar?q=gu', None),
+        ('configuracoes', 'GET', '/configuracoes', None),
+        ('relatorio', 'GET', '/relatorio/personagens', None),
+    ]
+
+
+def contar_consultas(modulo, usuario_id):
+    cliente = modulo.app.test_client()
+    cliente.post('/login', data={'email': f'benchmark{usuario_id}@grimorio.local', 'senha': 'benchmark'})
+    contagens = {}
+    for rota, metodo, url, corpo in rotas(modulo, usuario_id):
+        modulo.cache_menu_lateral.limpar()
+        resposta = cliente.open(url, method=metodo, json=corpo)
+        resposta.get_data()
+        resposta.close()  # o diagnóstico da requisição é fechado quando a resposta termina
+        if resposta.status_code >= 400:
+            raise SystemExit(f'{url}: HTTP {resposta.status_code}')
+        contagens[rota] = int(CONSULTAS.search(resposta.headers['Server-Timing']).group(1))
+    return contagens
+
+
+def configurar_diagnostico(limite=5, lento_ms=50):
+    # A configuração é lida na importação do app
+    os.environ['SQL_DIAGNOSTICO'] = '1'
+    os.environ['SQL_REPETICOES_LIMITE'] = str(limite)
+    os.environ['SQL_LENTO_MS'] = str(lento_ms)
+    os.environ['SERVER_TIMING'] = '1'
+    os.environ.setdefault('LOG_DESEMPENHO', '0')
+
+
+def medir(modulo, tamanhos, objetivos=5, notas=20):
+    """Retorna {tamanho: {rota: consultas}}, com um usuário novo por tamanho."""
+    resultados = {}
+    for tamanho in tamanhos:
+        modulo.app.config['SQL_DIAGNOSTICO'] = False  # a carga inicial não entra no relatório
+        usuario_id = popular(modulo, 1, tamanho, objetivos, notas)[0]
+        modulo.app.config['SQL_DIAGNOSTICO'] = True
+        resultados[tamanho] = contar_consultas(modulo, usuario_id)
+    return resultados
+
+
+def problemas_da_rota(rota, contagens):
+    problemas = []
+    if max(contagens) > LIMITES[rota]:
+        problemas.append('acima do limite')
+    if len(set(contagens)) > 1:
+        problemas.append('cresce com o tamanho')
+    return problemas
+
+
+def repeticoes(modulo):
+    # Comandos repetidos acima do limite numa mesma requisição (N+1), por endpoint
+    return [
+        f'{endpoint}: N+1 ({vezes}x) {sql[:160]}'
+        for endpoint, relatorio in sorted(modulo.relatorio_sql.items())
+        for sql, vezes in relatorio['repetidas'].items()
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10, 1000], help='personagens do usuário')
+    parser.add_argument('--objetivos', type=int, default=5)
+    parser.add_argument('--notas', type=int, default=20)
+    parser.add_argument('--limite', type=int, default=5, help='repetições do mesmo comando por requisição')
+    parser.add_argument('--lento-ms', type=float, default=50)
+    args = parser.parse_args(argv)
+
+    configurar_diagnostico(args.limite, args.lento_ms)
+    modulo = carregar_app()
+    resultados = medir(modulo, args.tamanhos, args.objetivos, args.notas)
+
+    falhas = []
+    print()
+    print(f'{"rota":24} {"limite":>6} ' + ' '.join(f'{tamanho:>7}' for tamanho in args.tamanhos))
+    for rota, limite in LIMITES.items():
+        contagens = [resultados[tamanho][rota] for tamanho in args.tamanhos]
+        problemas = problemas_da_rota(rota, contagens)
+        print(f'{rota:24} {limite:>6} ' + ' '.join(f'{c:>7}' for c in contagens) + '  ' + ', '.join(problemas))
+        falhas += [f'{rota}: {problema}' for problema in problemas]
+
+    falhas += repeticoes(modulo)
+    for endpoint, relatorio in sorted(modulo.relatorio_sql.items()):
+        for sql, lenta in relatorio['lentas'].items():
+            print(f'lenta em {endpoint}: {sql[:160]} {json.dumps(lenta)}')
+
+    print()
+    if falhas:
+        print('Falhas:')
+        for falha in falhas:
+            print(f'  {falha}')
+        return 1
+    print('Todas as rotas dentro do orçamento e com número de consultas constante.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Gerador de dados sintéticos para os benchmarks.
+"""
+
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+
+PALAVRAS = (
+    'guts griffith casca espada dragão eclipse marca sacrifício bando falcão '
+    'apóstolo demônio behelit cavaleiro caveira sangue sombra grimório vilão '
+    'aliado criatura monstro deus profecia guerra castelo ruína tempestade '
+    'vingança destino lâmina armadura berserker bruxa floresta abismo luz '
+    'trevas juramento traição memória cicatriz batalha campanha jornada'
+).split()
+
+TIPOS = ['Personagem', 'NPC', 'Vilão', 'Aliado', 'Criatura', 'Monstro', 'Deus', 'Outro']
+CORES = ['#8B0000', '#5A0000', '#B22222', '#2a2a2a']
+
+
+def carregar_app(database_url=None):
+    """
+    Importa o app apontando para um banco descartável.
+    Sem database_url, cria um SQLite novo num diretório temporário.
+    """
+    if database_url is None:
+        pasta = tempfile.mkdtemp(prefix='grimorio-bench-')
+        database_url = f"sqlite:///{os.path.join(pasta, 'benchmark.db')}"
+    os.environ['DATABASE_URL'] = database_url
+
+    import app as modulo
+
+    with modulo.app.app_context():
+        modulo.preparar_banco()
+    return modulo
+
+
+def texto(rng, minimo, maximo):
+    tamanho = rng.randint(minimo, maximo)
+    partes = []
+    total = 0
+    while total < tamanho:
+        palavra = rng.choice(PALAVRAS)
+        partes.append(palavra)
+        total += len(palavra) + 1
+    return ' '.join(partes)[:tamanho].capitalize()
+
+
+def popular(modulo, usuarios=10, personagens=100, objetivos=5, notas=10, semente=42, lote=1000):
+    """
+    Insere usuarios × personagens × objetivos × notas com textos de tamanho
+    realista. Retorna a lista de ids dos usuários criados (senha: 'benchmark').
+    """
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(semente)
+    db = modulo.db
+    agora = datetime.utcnow()
+    senha = generate_password_hash('benchmark')
+
+    def inserir(model, linhas):
+        for inicio in range(0, len(linhas), lote):
+            db.session.execute(db.insert(model), linhas[inicio:inicio + lote])
+
+    with modulo.app.app_context():
+        primeiro_usuario = (db.session.query(db.func.max(modulo.Usuario.id)).scalar() or 0) + 1
+        usuario_ids = list(range(primeiro_usuario, primeiro_usuario + usuarios))
+        inserir(modulo.Usuario, [{
+            'id': usuario_id,
+            'email': f'benchmark{usuario_id}@grimorio.local',
+            'senha': senha,
+            'nome': f'Criador {usuario_id}',
+            'data_criacao': agora,
+        } for usuario_id in usuario_ids])
+
+        proximo_personagem = (db.session.query(db.func.max(modulo.Personagem.id)).scalar() or 0) + 1
+        proxima_tag = (db.session.query(db.func.max(modulo.Tag.id)).scalar() or 0) + 1
+        linhas_personagens = []
+        linhas_objetivos = []
+        linhas_notas = []
+        linhas_tags = []
+        linhas_associacoes = []
+        for usuario_id in usuario_ids:
+            tags_usuario = list(range(proxima_tag, proxima_tag + len(PALAVRAS)))
+            linhas_tags += [{'id': tag_id, 'nome': nome, 'usuario_id': usuario_id}
+                            for tag_id, nome in zip(tags_usuario, PALAVRAS)]
+            proxima_tag += len(PALAVRAS)
+            for _ in range(personagens):
+                criado = agora - timedelta(days=rng.uniform(0, 365))
+                linhas_personagens.append({
+                    'id': proximo_personagem,
+                    'nome': texto(rng, 6, 30),
+                    'tipo': rng.choice(TIPOS),
+                    'descricao': texto(rng, 100, 600),
+                    'prioridade': rng.randint(1, 10),
+                    'historia': texto(rng, 500, 3000),
+                    'habilidades': texto(rng, 100, 500),
+                    'notas': texto(rng, 50, 400),
+                    'imagem_url': '',
+                    'usuario_id': usuario_id,
+                    'data_criacao': criado,
+                    'data_atualizacao': criado + timedelta(days=rng.uniform(0, 30)),
+                })
+                linhas_associacoes += [{'personagem_id': proximo_personagem, 'tag_id': tag_id}
+                                       for tag_id in rng.sample(tags_usuario, rng.randint(0, 4))]
+                concluidos = 0
+                for _ in range(objetivos):
+                    concluido = rng.random() < 0.4
+                    concluidos += concluido
+                    criado_objetivo = agora - timedelta(days=rng.uniform(0, 60))
+                    linhas_objetivos.append({
+                        'descricao': texto(rng, 20, 200),
+                        'concluido': concluido,
+                        'prioridade': rng.randint(1, 10),
+                        'personagem_id': proximo_personagem,
+                        'data_criacao': criado_objetivo,
+                        'data_conclusao': criado_objetivo + timedelta(days=1) if concluido else None,
+                    })
+                linhas_personagens[-1].update(total_objetivos=objetivos, objetivos_concluidos=concluidos)
+                proximo_personagem += 1
+            for _ in range(notas):
+                criado = agora - timedelta(days=rng.uniform(0, 90))
+                linhas_notas.append({
+                    'titulo': texto(rng, 5, 40),
+                    'conteudo': texto(rng, 20, 500),
+                    'cor': rng.choice(CORES),
+                    'usuario_id': usuario_id,
+                    'data_criacao': criado,
+                    'data_atualizacao': criado,
+                })
+
+        inserir(modulo.Personagem, linhas_personagens)
+        inserir(modulo.Tag, linhas_tags)
+        inserir(modulo.personagem_tag, linhas_associacoes)
+        inserir(modulo.Objetivo, linhas_objetivos)
+        inserir(modulo.NotaRapida, linhas_notas)
+        if db.engine.dialect.name == 'postgresql':
+            # Os ids foram passados explicitamente; as sequências precisam acompanhar
+            for model in (modulo.Usuario, modulo.Personagem, modulo.Tag):
+                tabela = model.__tablename__
+                db.session.execute(db.text(
+                    f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT max(id) FROM {tabela}))"
+                ))
+        db.session.commit()
+        # Como se os dados tivessem entrado pelas rotas, que mantêm as estatísticas
+        modulo.reconstruir_estatisticas(usuario_ids)
+
+    return usuario_ids
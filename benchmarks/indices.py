@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Verificação dos índices: popula um banco grande, executa as consultas
+quentes do app e imprime o EXPLAIN QUERY PLAN e o tempo de cada uma.
+
+    python -m benchmarks.indices --personagens 5000 --objetivos 8
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from sqlalchemy import event
+
+from benchmarks.dados import carregar_app, popular
+
+
+def consultas_quentes(modulo, usuario_id):
+    db = modulo.db
+    Personagem = modulo.Personagem
+    NotaRapida = modulo.NotaRapida
+
+    return {
+        'calcular_estatisticas': lambda: modulo.calcular_estatisticas(usuario_id),
+        'pagina_personagens': lambda: modulo.pagina_personagens(usuario_id),
+        'pagina_personagens (tipo)': lambda: modulo.pagina_personagens(usuario_id, 'Vilão'),
+        'contagem por tipo': lambda: db.session.query(Personagem.tipo, db.func.count(Personagem.id))
+            .filter_by(usuario_id=usuario_id).group_by(Personagem.tipo).all(),
+        'notas recentes': lambda: NotaRapida.query.filter_by(usuario_id=usuario_id)
+            .order_by(NotaRapida.data_atualizacao.desc()).limit(3).all(),
+        'filtro por tag': lambda: modulo.pagina_personagens(usuario_id, tag='espada'),
+        'nuvem de tags': lambda: modulo.contagem_tags(usuario_id),
+        'menu lateral': lambda: modulo.renderizar_menu_lateral(usuario_id),
+    }
+
+
+def capturar_sql(modulo, funcao):
+    capturadas = []
+
+    def antes(conn, cursor, statement, parameters, context, executemany):
+        capturadas.append((statement, parameters))
+
+    event.listen(modulo.db.engine, 'before_cursor_execute', antes)
+    try:
+        funcao()
+    finally:
+        event.remove(modulo.db.engine, 'before_cursor_execute', antes)
+
+    unicas = []
+    for statement, parameters in capturadas:
+        if statement not in [s for s, _ in unicas]:
+            unicas.append((statement, parameters))
+    return len(capturadas), unicas
+
+
+def plano(modulo, statement, parameters):
+    conexao = modulo.db.session.connection()
+    if conexao.dialect.name == 'sqlite':
+        linhas = conexao.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        return [linha[-1] for linha in linhas]
+    return [linha[0] for linha in conexao.exec_driver_sql('EXPLAIN ' + statement, parameters).all()]
+
+
+def varredura_completa(modulo, linhas_plano):
+    tabelas = set(modulo.db.metadata.tables)
+    problemas = []
+    for linha in linhas_plano:
+        partes = linha.split()
+        # SQLite: "SCAN tabela" sem índice percorre a tabela inteira
+        if len(partes) >= 2 and partes[0] == 'SCAN' and partes[1] in tabelas and 'INDEX' not in linha:
+            problemas.append(linha)
+        # PostgreSQL
+        if 'Seq Scan on' in linha:
+            problemas.append(linha.strip())
+    return problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='banco vazio a usar (padrão: SQLite temporário)')
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--personagens', type=int, default=2000, help='personagens por usuário')
+    parser.add_argument('--objetivos', type=int, default=8, help='objetivos por personagem')
+    parser.add_argument('--notas', type=int, default=50, help='notas rápidas por usuário')
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    modulo = carregar_app(args.database_url)
+
+    inicio = time.perf_counter()
+    usuario_ids = popular(modulo, args.usuarios, args.personagens, args.objetivos, args.notas)
+    print(f'Banco populado em {time.perf_counter() - inicio:.1f}s '
+          f'({args.usuarios} usuários × {args.personagens} personagens × {args.objetivos} objetivos)')
+
+    com_varredura = []
+    with modulo.app.app_context():
+        for nome, funcao in consultas_quentes(modulo, usuario_ids[0]).items():
+            total_sql, unicas = capturar_sql(modulo, funcao)
+
+            tempos = []
+            for _ in range(args.repeticoes):
+                t0 = time.perf_counter()
+                funcao()
+                tempos.append((time.perf_counter() - t0) * 1000)
+                modulo.db.session.expunge_all()
+
+            print()
+            print('=' * 80)
+            print(f'{nome}: mediana {statistics.median(tempos):.2f} ms, '
+                  f'máx {max(tempos):.2f} ms, {total_sql} comando(s) SQL')
+            for statement, parameters in unicas:
+                print('-' * 80)
+                print(' '.join(statement.split()))
+                linhas_plano = plano(modulo, statement, parameters)
+                for linha in linhas_plano:
+                    print(f'    {linha}')
+                problemas = varredura_completa(modulo, linhas_plano)
+                if problemas:
+                    com_varredura.append((nome, problemas))
+
+    print()
+    if com_varredura:
+        print('Varreduras completas encontradas:')
+        for nome, problemas in com_varredura:
+            for problema in problemas:
+                print(f'  {nome}: {problema}')
+        return 1
+    print('Nenhuma consulta quente faz varredura completa de tabela.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Listagem completa em stream (/personagens?todos=1) contra a mesma página montada
+inteira na memória: tempo até o primeiro byte, tempo total e pico de memória
+alocada (tracemalloc) para bibliotecas de tamanhos diferentes.
+
+    python -m benchmarks.stream --tamanhos 500 2000 5000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from benchmarks.dados import carregar_app, popular
+
+
+def medir(funcao):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    primeiro_byte = funcao()
+    total = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (primeiro_byte - t0) * 1000, total * 1000, pico / 1024 / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[500, 2000, 5000])
+    parser.add_argument('--objetivos', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    modulo = carregar_app()
+
+    def em_stream(cliente):
+        resposta = cliente.get('/personagens?todos=1', headers={'Accept-Encoding': 'identity'}, buffered=False)
+        primeiro_byte = None
+        for _ in resposta.response:
+            primeiro_byte = primeiro_byte or time.perf_counter()
+        resposta.close()
+        return primeiro_byte
+
+    def inteira(usuario_id):
+        with modulo.app.test_request_context('/personagens?todos=1'):
+            personagens = modulo.consulta_personagens(usuario_id)\
+                .order_by(modulo.Personagem.data_atualizacao.desc(), modulo.Personagem.id.desc()).all()
+            content = ''.join(modulo.renderizar_card_personagem(personagem) for personagem in personagens)
+            modulo.renderizar_pagina(content, navbar=modulo.create_navbar('personagens'),
+                                     sidebar=modulo.renderizar_menu_lateral(usuario_id))
+            return time.perf_counter()
+
+    print(f'{"personagens":>11}  {"modo":10} {"1º byte (ms)":>13} {"total (ms)":>11} {"pico (MiB)":>11}')
+    for tamanho in args.tamanhos:
+        usuario_id = popular(modulo, 1, tamanho, args.objetivos, 10)[0]
+        cliente = modulo.app.test_client()
+        cliente.post('/login', data={'email': f'benchmark{usuario_id}@grimorio.local', 'senha': 'benchmark'})
+        em_stream(cliente)  # aquece cache do menu lateral e do SQLite
+
+        for modo, funcao in (('stream', lambda: em_stream(cliente)), ('inteira', lambda: inteira(usuario_id))):
+            primeiro_byte, total, pico = medir(funcao)
+            print(f'{tamanho:>11}  {modo:10} {primeiro_byte:>13.1f} {total:>11.1f} {pico:>11.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
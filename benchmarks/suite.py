@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark ponta a ponta: popula um banco novo com N usuários × M personagens ×
+K objetivos × J notas e percorre todas as rotas principais, pelo test client do
+Flask ou por um gunicorn local. Gera JSON com p50/p95/p99, vazão e número de
+consultas SQL por rota (lido do cabeçalho Server-Timing) e, com --baseline,
+falha se alguma rota ficou mais lenta ou passou a fazer mais consultas.
+
+    python -m benchmarks.suite --usuarios 20 --personagens 500 --saida base.json
+    python -m benchmarks.suite --usuarios 20 --personagens 500 --baseline base.json
+    python -m benchmarks.suite --gunicorn 4 --concorrencia 8
+    python -m benchmarks.suite --gunicorn 4 --concorrencia 16 --roteiro escrita --database-url postgresql://...
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks.dados import PALAVRAS, carregar_app, popular
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONSULTAS_SERVER_TIMING = re.compile(r'sql;dur=[\d.]+;desc="(\d+) consultas"')
+
+
+# =============================================
+# CLIENTES (test client ou HTTP)
+# =============================================
+
+class ClienteTeste:
+    def __init__(self, modulo):
+        self.cliente = modulo.app.test_client()
+
+    def requisitar(self, metodo, url, dados=None, json_=None):
+        resposta = self.cliente.open(url, method=metodo, data=dados, json=json_,
+                                     headers={'Accept-Encoding': 'gzip, br'})
+        resposta.get_data()
+        resposta.close()
+        return resposta.status_code, resposta.headers.get('Server-Timing', '')
+
+
+class SemRedirecionamento(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHttp:
+    def __init__(self, base):
+        self.base = base
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), SemRedirecionamento()
+        )
+
+    def requisitar(self, metodo, url, dados=None, json_=None):
+        corpo = None
+        cabecalhos = {'Accept-Encoding': 'gzip, br'}
+        if dados is not None:
+            corpo = urllib.parse.urlencode(dados).encode('utf-8')
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+        if json_ is not None:
+            corpo = json.dumps(json_).encode('utf-8')
+            cabecalhos['Content-Type'] = 'application/json'
+        pedido = urllib.request.Request(self.base + url, data=corpo, method=metodo, headers=cabecalhos)
+        try:
+            with self.abridor.open(pedido, timeout=60) as resposta:
+                resposta.read()
+                return resposta.status, resposta.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as erro:
+            erro.read()
+            return erro.code, erro.headers.get('Server-Timing', '')
+
+
+def porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_gunicorn(workers, database_url):
+    porta = porta_livre()
+    ambiente = dict(os.environ, DATABASE_URL=database_url, LOG_DESEMPENHO='0')
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{porta}', 'app:app'],
+        cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f'http://127.0.0.1:{porta}'
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            urllib.request.urlopen(base + '/login', timeout=1).read()
+            return processo, base
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError('gunicorn não respondeu em 30s')
+
+
+# =============================================
+# ROTEIRO
+# =============================================
+
+def preparar_usuarios(modulo, usuario_ids):
+    # Ids de personagens/objetivos e o cursor da segunda página de cada usuário
+    usuarios = {}
+    with modulo.app.app_context():
+        for usuario_id in usuario_ids:
+            personagens = [p for (p,) in modulo.db.session.query(modulo.Personagem.id).filter_by(usuario_id=usuario_id)]
+            objetivos = [o for (o,) in modulo.db.session.query(modulo.Objetivo.id)
+                         .join(modulo.Personagem).filter(modulo.Personagem.usuario_id == usuario_id)]
+            _, cursor = modulo.pagina_personagens(usuario_id)
+            usuarios[usuario_id] = {'personagens': personagens, 'objetivos': objetivos, 'cursor': cursor or ''}
+    return usuarios
+
+
+def roteiro(usuario_id, dados, rng):
+    """Uma rodada: (rota, método, url, form, json) por rota principal."""
+    palavra = rng.choice(PALAVRAS)
+    return [
+        ('login', 'POST', '/login', {'email': f'benchmark{usuario_id}@grimorio.local', 'senha': 'benchmark'}, None),
+        ('dashboard', 'GET', '/dashboard', None, None),
+        ('personagens', 'GET', '/personagens', None, None),
+        ('personagens_pagina', 'GET', f"/personagens/pagina?cursor={urllib.parse.quote(dados['cursor'])}", None, None),
+        ('detalhes_personagem', 'GET', f"/detalhes_personagem/{rng.choice(dados['personagens'])}", None, None),
+        ('toggle_objetivo', 'POST', f"/toggle_objetivo/{rng.choice(dados['objetivos'])}", None, None),
+        ('salvar_nota_rapida', 'POST', '/salvar_nota_rapida', None,
+         {'titulo': f'Nota {palavra}', 'conteudo': ' '.join(rng.choices(PALAVRAS, k=30))}),
+        ('buscar', 'GET', f'/buscar?q={urllib.parse.quote(palavra)}', None, None),
+        ('autocompletar', 'GET', f'/autocompletar?q={urllib.parse.quote(palavra[:2])}', None, None),
+        ('relatorio', 'GET', '/relatorio/personagens', None, None),
+    ]
+
+
+def roteiro_escrita(usuario_id, dados, rng):
+    """Uma rodada com escritas curtas seguidas, para medir a contenção no banco."""
+    passos = [('login', 'POST', '/login', {'email': f'benchmark{usuario_id}@grimorio.local', 'senha': 'benchmark'}, None)]
+    for _ in range(4):
+        passos.append(('toggle_objetivo', 'POST', f"/toggle_objetivo/{rng.choice(dados['objetivos'])}", None, None))
+        passos.append(('salvar_nota_rapida', 'POST', '/salvar_nota_rapida', None,
+                       {'titulo': f'Nota {rng.choice(PALAVRAS)}', 'conteudo': ' '.join(rng.choices(PALAVRAS, k=30))}))
+    passos.append(('dashboard', 'GET', '/dashboard', None, None))
+    return passos
+
+
+ROTEIROS = {'misto': roteiro, 'escrita': roteiro_escrita}
+
+
+def executar(criar_cliente, usuarios, rodadas, concorrencia, semente, aquecimento=0, gerar_roteiro=roteiro):
+    medicoes = []
+    inicios = []
+    lock = threading.Lock()
+    ids = sorted(usuarios)
+
+    def trabalhador(indice):
+        rng = random.Random(semente + indice)
+        clientes = {}
+        locais = []
+        # As rodadas de aquecimento (caches, índice do autocompletar, páginas do SQLite) não entram na medição
+        for rodada in range(aquecimento + rodadas):
+            if rodada == aquecimento:
+                with lock:
+                    inicios.append(time.perf_counter())
+            usuario_id = rng.choice(ids)
+            cliente = clientes.setdefault(usuario_id, criar_cliente())
+            for rota, metodo, url, form, json_ in gerar_roteiro(usuario_id, usuarios[usuario_id], rng):
+                t0 = time.perf_counter()
+                status, server_timing = cliente.requisitar(metodo, url, form, json_)
+                duracao = (time.perf_counter() - t0) * 1000
+                consultas = CONSULTAS_SERVER_TIMING.search(server_timing)
+                if rodada >= aquecimento:
+                    locais.append((rota, status, duracao, int(consultas.group(1)) if consultas else None))
+        with lock:
+            medicoes.extend(locais)
+
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A vazão conta só a fase medida, a partir do primeiro trabalhador que saiu do aquecimento
+    return medicoes, time.perf_counter() - min(inicios)
+
+
+# =============================================
+# RELATÓRIO E COMPARAÇÃO
+# =============================================
+
+def percentil(valores, p):
+    # Nearest-rank sobre a lista ordenada
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def resumir(medicoes, duracao_total, configuracao):
+    rotas = {}
+    for rota in dict.fromkeys(rota for rota, *_ in medicoes):
+        linhas = [m for m in medicoes if m[0] == rota]
+        tempos = sorted(duracao for _, _, duracao, _ in linhas)
+        consultas = sorted(c for *_, c in linhas if c is not None)
+        rotas[rota] = {
+            'n': len(linhas),
+            'erros': sum(1 for _, status, _, _ in linhas if status >= 400),
+            'p50_ms': round(percentil(tempos, 50), 3),
+            'p95_ms': round(percentil(tempos, 95), 3),
+            'p99_ms': round(percentil(tempos, 99), 3),
+            'media_ms': round(sum(tempos) / len(tempos), 3),
+            'max_ms': round(tempos[-1], 3),
+            'consultas_p50': percentil(consultas, 50) if consultas else None,
+            'consultas_max': consultas[-1] if consultas else None,
+        }
+    return {
+        'configuracao': configuracao,
+        'total_requisicoes': len(medicoes),
+        'duracao_s': round(duracao_total, 3),
+        'vazao_rps': round(len(medicoes) / duracao_total, 1),
+        'rotas': rotas,
+    }
+
+
+def comparar(resultado, baseline, tolerancia, folga_ms):
+    regressoes = []
+    print()
+    print(f'{"rota":22} {"p95 base":>9} {"p95 agora":>10} {"variação":>9} {"SQL base":>9} {"SQL agora":>10}')
+    for rota, atual in resultado['rotas'].items():
+        base = baseline['rotas'].get(rota)
+        if base is None:
+            print(f'{rota:22} (nova rota, sem baseline)')
+            continue
+        variacao = (atual['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0
+        marcas = []
+        if atual['p95_ms'] > base['p95_ms'] * (1 + tolerancia) and atual['p95_ms'] - base['p95_ms'] > folga_ms:
+            marcas.append('LATÊNCIA')
+        if (atual['consultas_max'] or 0) > (base['consultas_max'] or 0):
+            marcas.append('CONSULTAS')
+        print(f'{rota:22} {base["p95_ms"]:>9.2f} {atual["p95_ms"]:>10.2f} {variacao:>+8.0%} '
+              f'{str(base["consultas_max"]):>9} {str(atual["consultas_max"]):>10}  {" ".join(marcas)}')
+        if marcas:
+            regressoes.append((rota, marcas))
+    vazao_base = baseline.get('vazao_rps')
+    if vazao_base:
+        print(f'vazão: {vazao_base} -> {resultado["vazao_rps"]} req/s')
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='banco vazio a usar (padrão: SQLite temporário)')
+    parser.add_argument('--usuarios', type=int, default=10)
+    parser.add_argument('--personagens', type=int, default=200, help='personagens por usuário')
+    parser.add_argument('--objetivos', type=int, default=5, help='objetivos por personagem')
+    parser.add_argument('--notas', type=int, default=20, help='notas rápidas por usuário')
+    parser.add_argument('--rodadas', type=int, default=30, help='rodadas por trabalhador (cada uma visita todas as rotas)')
+    parser.add_argument('--aquecimento', type=int, default=5, help='rodadas iniciais não medidas, por trabalhador')
+    parser.add_argument('--concorrencia', type=int, default=1, help='trabalhadores simultâneos')
+    parser.add_argument('--gunicorn', type=int, metavar='WORKERS', help='sobe um gunicorn local em vez do test client')
+    parser.add_argument('--roteiro', choices=sorted(ROTEIROS), default='misto', help='misto: todas as rotas; escrita: só escritas curtas')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='grava o resultado JSON neste arquivo')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='aumento de p95 tolerado (0.25 = 25%%)')
+    parser.add_argument('--folga-ms', type=float, default=5.0, help='diferença absoluta mínima de p95 para contar como regressão')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('LOG_DESEMPENHO', '0')
+    modulo = carregar_app(args.database_url)
+    inicio = time.perf_counter()
+    usuario_ids = popular(modulo, args.usuarios, args.personagens, args.objetivos, args.notas, semente=args.semente)
+    print(f'Banco populado em {time.perf_counter() - inicio:.1f}s', file=sys.stderr)
+    usuarios = preparar_usuarios(modulo, usuario_ids)
+
+    processo = None
+    if args.gunicorn:
+        processo, base = iniciar_gunicorn(args.gunicorn, modulo.app.config['SQLALCHEMY_DATABASE_URI'])
+        criar_cliente = lambda: ClienteHttp(base)
+    else:
+        criar_cliente = lambda: ClienteTeste(modulo)
+
+    try:
+        medicoes, duracao_total = executar(criar_cliente, usuarios, args.rodadas, args.concorrencia,
+                                            args.semente, args.aquecimento, ROTEIROS[args.roteiro])
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+    configuracao = {chave: getattr(args, chave) for chave in
+                    ('usuarios', 'personagens', 'objetivos', 'notas', 'rodadas', 'aquecimento', 'concorrencia', 'gunicorn', 'roteiro')}
+    resultado = resumir(medicoes, duracao_total, configuracao)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+
+    falhou = False
+    erros = {rota: dados['erros'] for rota, dados in resultado['rotas'].items() if dados['erros']}
+    if erros:
+        print(f'\nRespostas com erro: {erros}', file=sys.stderr)
+        falhou = True
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+        if baseline.get('configuracao') != configuracao:
+            print('Aviso: a baseline foi gerada com outra configuração', file=sys.stderr)
+        regressoes = comparar(resultado, baseline, args.tolerancia, args.folga_ms)
+        if regressoes:
+            print('\nREGRESSÕES: ' + ', '.join(f'{rota} ({"/".join(marcas)})' for rota, marcas in regressoes),
+                  file=sys.stderr)
+            falhou = True
+        else:
+            print('\nSem regressões em relação à baseline.')
+
+    return 1 if falhou else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark da renderização do template base: compara o caminho antigo
+(BASE_TEMPLATE.replace + render_template_string a cada requisição) com o
+template compilado uma vez (renderizar_pagina).
+
+    python -m benchmarks.templates --cards 24 --repeticoes 200
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+from flask import render_template_string
+
+from benchmarks.dados import carregar_app
+
+
+def conteudo_exemplo(modulo, cards):
+    personagens = [SimpleNamespace(
+        id=i,
+        nome=f'Personagem {i}',
+        tipo='Vilão',
+        descricao='Descrição longa do personagem ' * 8,
+        prioridade=i % 10 + 1,
+        imagem_url='',
+        total_objetivos=8,
+        objetivos_concluidos=3,
+    ) for i in range(cards)]
+    return ''.join(modulo.renderizar_card_personagem(p) for p in personagens)
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return tempos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=24)
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    modulo = carregar_app()
+    content = conteudo_exemplo(modulo, args.cards)
+    navbar = '<nav class="navbar"></nav>'
+    sidebar = '<aside class="sidebar"></aside>'
+
+    def antes():
+        template = modulo.BASE_TEMPLATE.replace('{{ content|safe }}', content)\
+                                       .replace('{{ navbar|safe }}', navbar)\
+                                       .replace('{{ sidebar|safe }}', sidebar)
+        return render_template_string(template)
+
+    def depois():
+        return modulo.renderizar_pagina(content, navbar=navbar, sidebar=sidebar)
+
+    with modulo.app.test_request_context('/'):
+        resultados = {
+            'replace + render_template_string': medir(antes, args.repeticoes),
+            'template compilado': medir(depois, args.repeticoes),
+        }
+
+    print(f'{args.cards} cards, {args.repeticoes} repetições')
+    for nome, tempos in resultados.items():
+        tempos.sort()
+        p95 = tempos[int(len(tempos) * 0.95) - 1]
+        print(f'  {nome:35} mediana {statistics.median(tempos):7.3f} ms   p95 {p95:7.3f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
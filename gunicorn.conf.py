@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração do gunicorn (lida automaticamente de ./gunicorn.conf.py).
+Prepara o diretório compartilhado das métricas Prometheus entre os workers.
+"""
+
+import os
+import shutil
+import tempfile
+
+# Precisa estar no ambiente antes de os workers importarem o app
+diretorio_metricas = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'grimorio-metricas')
+)
+
+
+def on_starting(server):
+    # Arquivos de uma execução anterior somariam contadores antigos
+    shutil.rmtree(diretorio_metricas, ignore_errors=True)
+    os.makedirs(diretorio_metricas, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,252 @@
+// Funções globais
+function toggleSidebar() {
+    const sidebar = document.querySelector('.sidebar');
+    const toggle = document.querySelector('.sidebar-toggle');
+    sidebar.classList.toggle('active');
+
+    if (sidebar.classList.contains('active')) {
+        toggle.innerHTML = '<i class="fas fa-times"></i>';
+    } else {
+        toggle.innerHTML = '<i class="fas fa-bars"></i>';
+    }
+}
+
+function toggleNavbar() {
+    const menu = document.getElementById('navbarMenu');
+    menu.classList.toggle('active');
+}
+
+function toggleDarkMode() {
+    const toggle = document.getElementById('darkModeToggle');
+    document.body.classList.toggle('light-mode', !toggle.checked);
+}
+
+function novaNotaRapida() {
+    const titulo = prompt('Título da nota:');
+    if (titulo) {
+        const conteudo = prompt('Conteúdo da nota:');
+        if (conteudo !== null) {
+            fetch('/salvar_nota_rapida', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    titulo: titulo,
+                    conteudo: conteudo,
+                    cor: '#8B0000'
+                })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    showToast('Nota salva com sucesso!', 'success');
+                    setTimeout(() => location.reload(), 1000);
+                } else {
+                    showToast('Erro ao salvar nota: ' + data.message, 'error');
+                }
+            });
+        }
+    }
+}
+
+function editarNota(notaId) {
+    const novoTitulo = prompt('Novo título:');
+    if (novoTitulo) {
+        const novoConteudo = prompt('Novo conteúdo:');
+        if (novoConteudo !== null) {
+            alert('Funcionalidade de edição em desenvolvimento!');
+        }
+    }
+}
+
+function excluirNota(notaId) {
+    if (confirm('Tem certeza que deseja excluir esta nota?')) {
+        fetch('/excluir_nota_rapida/' + notaId, {
+            method: 'DELETE'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showToast('Nota excluída com sucesso!', 'success');
+                setTimeout(() => location.reload(), 1000);
+            } else {
+                showToast('Erro ao excluir nota: ' + data.message, 'error');
+            }
+        });
+    }
+}
+
+function toggleObjetivoSidebar(objetivoId) {
+    fetch('/toggle_objetivo/' + objetivoId, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            setTimeout(() => location.reload(), 300);
+        }
+    });
+}
+
+function gerarRelatorio() {
+    fetch('/gerar_relatorio')
+    .then(() => {
+        showToast('Relatório gerado com sucesso!', 'success');
+        setTimeout(() => location.reload(), 1000);
+    });
+}
+
+function updatePriorityBars() {
+    const prioridade = document.getElementById('prioridade')?.value || 5;
+    const bar = document.getElementById('prioridade-bar');
+    if (bar) {
+        bar.style.width = (prioridade * 10) + '%';
+    }
+}
+
+function showToast(message, type = 'info') {
+    // Implementação simplificada de toast
+    alert(`${type.toUpperCase()}: ${message}`);
+}
+
+function confirmDelete(message) {
+    return confirm(message || 'Tem certeza que deseja excluir?');
+}
+
+// Inicialização
+document.addEventListener('DOMContentLoaded', function() {
+    updatePriorityBars();
+
+    // Fechar alertas
+    document.querySelectorAll('.alert-close').forEach(button => {
+        button.addEventListener('click', function() {
+            this.closest('.alert').style.display = 'none';
+        });
+    });
+
+    // Fechar sidebar ao clicar fora (mobile)
+    document.addEventListener('click', function(event) {
+        const sidebar = document.querySelector('.sidebar');
+        const toggle = document.querySelector('.sidebar-toggle');
+
+        if (window.innerWidth <= 992 && 
+            sidebar.classList.contains('active') &&
+            !sidebar.contains(event.target) &&
+            !toggle.contains(event.target)) {
+            toggleSidebar();
+        }
+    });
+
+    // Adicionar animações de entrada
+    const cards = document.querySelectorAll('.card, .character-card, .stat-card');
+    cards.forEach((card, index) => {
+        card.style.animationDelay = `${index * 0.1}s`;
+        card.classList.add('fade-in');
+    });
+});
+
+// Formulário de personagem
+function validateCharacterForm() {
+    const nome = document.querySelector('input[name="nome"]').value;
+    const tipo = document.querySelector('select[name="tipo"]').value;
+
+    if (!nome.trim()) {
+        alert('Por favor, preencha o nome do personagem.');
+        return false;
+    }
+
+    if (!tipo) {
+        alert('Por favor, selecione um tipo para o personagem.');
+        return false;
+    }
+
+    return true;
+}
+
+// Detalhes do personagem
+function toggleObjetivo(objetivoId) {
+    fetch('/toggle_objetivo/' + objetivoId, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            setTimeout(() => location.reload(), 300);
+        }
+    });
+}
+
+// Listagem de personagens: carregamento por rolagem
+let carregandoPersonagens = false;
+
+function carregarMaisPersonagens() {
+    const sentinela = document.getElementById('carregarMais');
+    if (!sentinela || carregandoPersonagens) return;
+    carregandoPersonagens = true;
+
+    const params = new URLSearchParams({
+        cursor: sentinela.dataset.cursor,
+        tipo: sentinela.dataset.tipo,
+        tag: sentinela.dataset.tag
+    });
+
+    fetch('/personagens/pagina?' + params.toString())
+    .then(response => response.json())
+    .then(data => {
+        document.getElementById('listaPersonagens').insertAdjacentHTML('beforeend', data.html);
+        if (data.proximo_cursor) {
+            sentinela.dataset.cursor = data.proximo_cursor;
+        } else {
+            sentinela.remove();
+        }
+    })
+    .finally(() => { carregandoPersonagens = false; });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const sentinela = document.getElementById('carregarMais');
+    if (sentinela && 'IntersectionObserver' in window) {
+        new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) carregarMaisPersonagens();
+        }, { rootMargin: '400px' }).observe(sentinela);
+    }
+});
+
+// Busca: sugestões do autocompletar enquanto o usuário digita
+let temporizadorBusca = null;
+
+function ativarAutocompletar(campo, lista) {
+    campo.addEventListener('input', function() {
+        const termo = this.value.trim();
+        clearTimeout(temporizadorBusca);
+        if (!termo) {
+            lista.innerHTML = '';
+            return;
+        }
+        temporizadorBusca = setTimeout(() => {
+            fetch('/autocompletar?q=' + encodeURIComponent(termo))
+            .then(response => response.json())
+            .then(data => {
+                lista.innerHTML = '';
+                (data.sugestoes || []).forEach(sugestao => {
+                    const item = document.createElement('a');
+                    item.className = 'recent-item';
+                    item.href = sugestao.url;
+                    const icone = document.createElement('i');
+                    icone.className = 'fas ' + (sugestao.tipo === 'tag' ? 'fa-tag' : 'fa-user-ninja') + ' me-2';
+                    item.appendChild(icone);
+                    item.appendChild(document.createTextNode(sugestao.texto));
+                    lista.appendChild(item);
+                });
+            });
+        }, 120);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const campo = document.getElementById('campoBusca');
+    if (campo) {
+        ativarAutocompletar(campo, document.getElementById('sugestoesBusca'));
+    }
+});
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy import event
+
+from benchmarks.consultas import configurar_diagnostico
+from benchmarks.dados import carregar_app
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'lento: bibliotecas grandes (dezenas de segundos); pule com -m "not lento"')
+
+
+@pytest.fixture(scope='session')
+def modulo():
+    configurar_diagnostico()
+    return carregar_app()
+
+
+@pytest.fixture
+def contar_comandos(modulo):
+    """Executa funcao no contexto do app e devolve (resultado, comandos SQL enviados)."""
+    def contar(funcao):
+        comandos = []
+        registrar = lambda *args: comandos.append(args[2])  # noqa: E731
+        with modulo.app.app_context():
+            event.listen(modulo.db.engine, 'before_cursor_execute', registrar)
+            try:
+                resultado = funcao()
+            finally:
+                event.remove(modulo.db.engine, 'before_cursor_execute', registrar)
+        return resultado, comandos
+    return contar
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Orçamento de consultas SQL por rota (o mesmo de benchmarks/consultas.py): cada
+rota fica dentro de LIMITES, não cresce da biblioteca de 10 personagens para as
+de 1000 e 10000 e não repete o mesmo comando por linha (N+1). A leitura de
+calcular_estatisticas é contada à parte.
+
+    python -m pytest -q
+    python -m pytest -q -m "not lento"   # sem a biblioteca de 10000
+"""
+
+import pytest
+
+from benchmarks.consultas import LIMITES, medir, problemas_da_rota, repeticoes
+from benchmarks.dados import popular
+
+
+BASE = 10
+GRANDES = (1000, pytest.param(10000, marks=pytest.mark.lento))
+
+
+@pytest.fixture(scope='module')
+def base(modulo):
+    return medir(modulo, [BASE])[BASE]
+
+
+@pytest.fixture(scope='module', params=GRANDES, ids=lambda tamanho: f'{tamanho}p')
+def grande(request, modulo):
+    return medir(modulo, [request.param])[request.param]
+
+
+@pytest.mark.parametrize('rota', LIMITES)
+def test_rota_dentro_do_orcamento(base, grande, rota):
+    contagens = [base[rota], grande[rota]]
+    assert problemas_da_rota(rota, contagens) == [], f'{rota}: {contagens} consultas (limite {LIMITES[rota]})'
+
+
+def test_sem_n_mais_um(modulo, base, grande):
+    assert repeticoes(modulo) == []
+
+
+def test_estatisticas_com_consultas_constantes(modulo, contar_comandos):
+    contagens = []
+    for tamanho in (10, 500):
+        usuario_id = popular(modulo, 1, tamanho, 5, 5)[0]
+        estatisticas, comandos = contar_comandos(lambda: modulo.calcular_estatisticas(usuario_id))
+        assert estatisticas['total_personagens'] == tamanho
+        assert estatisticas['total_objetivos'] == tamanho * 5
+        contagens.append(len(comandos))
+    assert contagens[0] == contagens[1] <= 1, contagens
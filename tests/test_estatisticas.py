@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Agregação de calcular_estatisticas: quando a linha de EstatisticasUsuario
+precisa ser refeita, os seis números saem de consultas GROUP BY / SUM
+condicional, em número fixo, e batem com a contagem feita objetivo a objetivo.
+
+    python -m pytest -q tests/test_estatisticas.py
+"""
+
+from datetime import datetime, timedelta
+
+from benchmarks.dados import popular
+
+
+TAMANHOS = (10, 1000)
+
+
+def contar_em_python(modulo, usuario_id):
+    # A conta do jeito antigo: carrega tudo e percorre os objetivos
+    data_limite = datetime.utcnow() - timedelta(days=7)
+    with modulo.app.app_context():
+        personagens = modulo.Personagem.query.filter_by(usuario_id=usuario_id).all()
+        objetivos = [objetivo for personagem in personagens for objetivo in personagem.objetivos]
+    concluidos = [objetivo for objetivo in objetivos if objetivo.concluido]
+    return {
+        'total_personagens': len(personagens),
+        'total_objetivos': len(objetivos),
+        'objetivos_ativos': len(objetivos) - len(concluidos),
+        'objetivos_concluidos': len(concluidos),
+        'objetivos_atrasados': sum(1 for objetivo in objetivos
+                                   if not objetivo.concluido and objetivo.data_criacao < data_limite),
+        'prioridade_media': round(sum(personagem.prioridade for personagem in personagens) / len(personagens), 1),
+    }
+
+
+def test_agregacao_com_consultas_constantes(modulo, contar_comandos):
+    contagens = []
+    for tamanho in TAMANHOS:
+        usuario_id = popular(modulo, 1, tamanho, 5, 5)[0]
+        with modulo.app.app_context():
+            # Sem a linha materializada, a leitura refaz a agregação
+            modulo.EstatisticasUsuario.query.filter_by(usuario_id=usuario_id).delete()
+            modulo.db.session.commit()
+        estatisticas, comandos = contar_comandos(lambda: modulo.calcular_estatisticas(usuario_id))
+        assert estatisticas == contar_em_python(modulo, usuario_id)
+        contagens.append(len(comandos))
+    assert contagens[0] == contagens[1], contagens
+
+
+def test_recontagem_de_atrasados_com_consultas_constantes(modulo, contar_comandos):
+    contagens = []
+    for tamanho in TAMANHOS:
+        usuario_id = popular(modulo, 1, tamanho, 5, 5)[0]
+        with modulo.app.app_context():
+            modulo.calcular_estatisticas(usuario_id)
+            # Um pendente que completou 7 dias desde a última contagem
+            modulo.EstatisticasUsuario.query.filter_by(usuario_id=usuario_id)\
+                .update({'proximo_atraso': datetime.utcnow() - timedelta(days=30)})
+            modulo.db.session.commit()
+        estatisticas, comandos = contar_comandos(lambda: modulo.calcular_estatisticas(usuario_id))
+        assert estatisticas == contar_em_python(modulo, usuario_id)
+        contagens.append(len(comandos))
+    assert contagens[0] == contagens[1], contagens
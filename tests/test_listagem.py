@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+A listagem completa (/personagens?todos=1) renderiza todos os cards com o
+mesmo número de comandos SQL, seja a biblioteca de 10 ou de 500 personagens.
+
+    python -m pytest -q tests/test_listagem.py
+"""
+
+from benchmarks.dados import popular
+
+
+TAMANHOS = (10, 500)
+
+
+def test_listagem_completa_com_consultas_constantes(modulo, contar_comandos):
+    # A listagem em stream consulta enquanto gera o corpo, depois do Server-Timing:
+    # aqui os comandos são contados até o último byte
+    contagens = []
+    for tamanho in TAMANHOS:
+        usuario_id = popular(modulo, 1, tamanho, 5, 5)[0]
+        cliente = modulo.app.test_client()
+        cliente.post('/login', data={'email': f'benchmark{usuario_id}@grimorio.local', 'senha': 'benchmark'})
+        modulo.cache_menu_lateral.limpar()
+        corpo, comandos = contar_comandos(lambda: cliente.get('/personagens?todos=1').get_data(as_text=True))
+        assert corpo.count('class="character-card"') == tamanho
+        contagens.append(len(comandos))
+    assert contagens[0] == contagens[1], contagens
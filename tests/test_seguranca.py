@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Parâmetros da URL que voltam no HTML da página precisam sair escapados.
+
+    python -m pytest -q tests/test_seguranca.py
+"""
+
+import re
+
+import pytest
+from markupsafe import escape
+
+from benchmarks.dados import carregar_app, popular
+
+
+PAYLOAD = '"><script>alert(1)</script>'
+
+
+@pytest.fixture(scope='module')
+def modulo():
+    return carregar_app()
+
+
+def test_filtro_de_tipo_escapado_no_carregar_mais(modulo, monkeypatch):
+    usuario_id = popular(modulo, 1, 3, 0, 0)[0]
+    with modulo.app.app_context():
+        # O botão "Carregar mais" só aparece se o filtro tem mais de uma página
+        modulo.Personagem.query.filter_by(usuario_id=usuario_id).update({'tipo': PAYLOAD})
+        modulo.db.session.commit()
+    monkeypatch.setitem(modulo.app.config, 'PERSONAGENS_POR_PAGINA', 2)
+
+    cliente = modulo.app.test_client()
+    cliente.post('/login', data={'email': f'benchmark{usuario_id}@grimorio.local', 'senha': 'benchmark'})
+    corpo = cliente.get('/personagens', query_string={'tipo': PAYLOAD}).get_data(as_text=True)
+
+    carregar_mais = re.search(r'<div[^>]*id="carregarMais"[^>]*>', corpo)
+    assert carregar_mais is not None
+    assert f'data-tipo="{escape(PAYLOAD)}"' in carregar_mais.group(0)
+    assert '<script>' not in carregar_mais.group(0)